@@ -68,6 +68,15 @@ def create_app(env="backend.config.EnvironmentConfig"):
     def index_redirect():
         return redirect(format_url("system/heartbeat/"), code=302)
 
+    # Request scoped caches and the query profiler
+    from backend.services.cache_service import CacheService
+    from backend.services.profiler_service import ProfilerService
+
+    app.before_request(CacheService.reset_request_caches)
+    app.before_request(ProfilerService.start_request)
+    app.after_request(ProfilerService.report_request)
+    app.teardown_request(ProfilerService.end_request)
+
     # Add paths to API endpoints
     add_api_endpoints(app)
 
@@ -106,14 +115,6 @@ def initialise_logger(app):
     app.logger.setLevel(log_level)
 
 
-def initialise_counters(app):
-    """ Initialise homepage counters so that users don't see 0 users on first load of application"""
-    from backend.services.stats_service import StatsService
-
-    with app.app_context():
-        StatsService.get_homepage_stats()
-
-
 def add_api_endpoints(app):
     """
     Define the routes the API exposes using Flask-Restful.
@@ -126,6 +127,7 @@ def add_api_endpoints(app):
         ProjectsRestAPI,
         ProjectsAllAPI,
         ProjectsQueriesBboxAPI,
+        ProjectsQueriesMapResultsAPI,
         ProjectsQueriesOwnerAPI,
         ProjectsQueriesTouchedAPI,
         ProjectsQueriesSummaryAPI,
@@ -165,6 +167,8 @@ def add_api_endpoints(app):
     from backend.api.tasks.resources import (
         TasksRestAPI,
         TasksQueriesJsonAPI,
+        TasksQueriesChangesAPI,
+        TasksQueriesEventsAPI,
         TasksQueriesXmlAPI,
         TasksQueriesGpxAPI,
         TasksQueriesAoiAPI,
@@ -238,6 +242,7 @@ def add_api_endpoints(app):
         NotificationsAllAPI,
         NotificationsQueriesCountUnreadAPI,
         NotificationsQueriesPostUnreadAPI,
+        NotificationsQueriesEventsAPI,
     )
     from backend.api.notifications.actions import NotificationsActionsDeleteMultipleAPI
 
@@ -277,7 +282,10 @@ def add_api_endpoints(app):
         SystemLanguagesAPI,
         SystemContactAdminRestAPI,
     )
-    from backend.api.system.statistics import SystemStatisticsAPI
+    from backend.api.system.statistics import (
+        SystemStatisticsAPI,
+        SystemCacheStatisticsAPI,
+    )
     from backend.api.system.authentication import (
         SystemAuthenticationEmailAPI,
         SystemAuthenticationLoginAPI,
@@ -302,6 +310,9 @@ def add_api_endpoints(app):
 
     # Projects queries endoints (TODO: Refactor them into the REST endpoints)
     api.add_resource(ProjectsQueriesBboxAPI, format_url("projects/queries/bbox/"))
+    api.add_resource(
+        ProjectsQueriesMapResultsAPI, format_url("projects/queries/map-results/")
+    )
     api.add_resource(
         ProjectsQueriesOwnerAPI, format_url("projects/queries/myself/owner/")
     )
@@ -457,6 +468,12 @@ def add_api_endpoints(app):
         format_url("projects/<int:project_id>/tasks/"),
         methods=["GET", "DELETE"],
     )
+    api.add_resource(
+        TasksQueriesChangesAPI, format_url("projects/<int:project_id>/tasks/changes/")
+    )
+    api.add_resource(
+        TasksQueriesEventsAPI, format_url("projects/<int:project_id>/tasks/events/")
+    )
     api.add_resource(
         TasksQueriesXmlAPI, format_url("projects/<int:project_id>/tasks/queries/xml/")
     )
@@ -704,6 +721,10 @@ def add_api_endpoints(app):
         format_url("notifications/queries/own/post-unread/"),
         methods=["POST"],
     )
+    api.add_resource(
+        NotificationsQueriesEventsAPI,
+        format_url("notifications/queries/own/events/"),
+    )
     # Notifications Actions endpoints
     api.add_resource(
         NotificationsActionsDeleteMultipleAPI,
@@ -787,6 +808,7 @@ def add_api_endpoints(app):
     api.add_resource(SystemHeartbeatAPI, format_url("system/heartbeat/"))
     api.add_resource(SystemLanguagesAPI, format_url("system/languages/"))
     api.add_resource(SystemStatisticsAPI, format_url("system/statistics/"))
+    api.add_resource(SystemCacheStatisticsAPI, format_url("system/statistics/caches/"))
     api.add_resource(
         SystemAuthenticationLoginAPI, format_url("system/authentication/login/")
     )
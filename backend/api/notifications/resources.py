@@ -1,3 +1,4 @@
+from flask import Response, jsonify
 from flask_restful import Resource, request, current_app
 from backend.services.messaging.message_service import (
     MessageService,
@@ -5,6 +6,8 @@ from backend.services.messaging.message_service import (
     MessageServiceError,
 )
 from backend.services.notification_service import NotificationService
+from backend.services.event_stream_service import user_channel
+from backend.api.utils import event_stream_response
 from backend.services.users.authentication_service import token_auth, tm
 
 
@@ -163,6 +166,17 @@ class NotificationsAllAPI(Resource):
               name: pageSize
               description: Size of page, defaults to 10
               type: integer
+            - in: query
+              name: cursor
+              description:
+                Opt in to cursor pagination, pass it empty for the first page and then the nextCursor of the
+                previous page. The page parameter is ignored.
+              type: string
+            - in: query
+              name: withTotal
+              description: Count the total number of messages in cursor pagination
+              type: boolean
+              default: false
         responses:
             200:
                 description: Messages found
@@ -194,8 +208,12 @@ class NotificationsAllAPI(Resource):
                 project,
                 task_id,
                 status,
+                request.args.get("cursor"),
+                request.args.get("withTotal") == "true",
             )
             return user_messages.to_primitive(), 200
+        except ValueError as e:
+            return {"Error": str(e), "SubCode": "InvalidData"}, 400
         except Exception as e:
             error_msg = f"Messages GET all - unhandled error: {str(e)}"
             current_app.logger.critical(error_msg)
@@ -223,9 +241,16 @@ class NotificationsQueriesCountUnreadAPI(Resource):
               required: true
               type: string
               default: Token sessionTokenHere==
+            - in: header
+              name: If-None-Match
+              description: ETag of a previous response, the count is only returned if it changed since
+              required: false
+              type: string
         responses:
             200:
                 description: Message info
+            304:
+                description: Count not modified
             500:
                 description: Internal Server Error
         """
@@ -233,7 +258,15 @@ class NotificationsQueriesCountUnreadAPI(Resource):
             unread_count = MessageService.has_user_new_messages(
                 token_auth.current_user()
             )
-            return unread_count, 200
+            etag = f"unread-{unread_count['unread']}"
+            if request.if_none_match.contains(etag):
+                # Polling clients don't get the count again until it changes
+                response = Response(status=304)
+            else:
+                response = jsonify(unread_count)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
         except Exception as e:
             error_msg = f"User GET - unhandled error: {str(e)}"
             current_app.logger.critical(error_msg)
@@ -243,6 +276,41 @@ class NotificationsQueriesCountUnreadAPI(Resource):
             }, 500
 
 
+class NotificationsQueriesEventsAPI(Resource):
+    @tm.pm_only(False)
+    @token_auth.login_required
+    def get(self):
+        """
+        Streams the changes of the unread messages count as server-sent events
+        ---
+        tags:
+          - notifications
+        produces:
+          - text/event-stream
+        parameters:
+            - in: header
+              name: Authorization
+              description: Base64 encoded session token
+              required: true
+              type: string
+              default: Token sessionTokenHere==
+        responses:
+            200:
+                description: A messages event with the new count whenever it changes
+            500:
+                description: Internal Server Error
+        """
+        try:
+            return event_stream_response(user_channel(token_auth.current_user()))
+        except Exception as e:
+            error_msg = f"NotificationsQueriesEventsAPI - unhandled error: {str(e)}"
+            current_app.logger.critical(error_msg)
+            return {
+                "Error": "Unable to stream messages count",
+                "SubCode": "InternalServerError",
+            }, 500
+
+
 class NotificationsQueriesPostUnreadAPI(Resource):
     @tm.pm_only(False)
     @token_auth.login_required
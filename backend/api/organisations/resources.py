@@ -6,7 +6,6 @@ from backend.models.dtos.organisation_dto import (
     NewOrganisationDTO,
     UpdateOrganisationDTO,
 )
-from backend.models.postgis.user import User
 from backend.services.organisation_service import (
     OrganisationService,
     OrganisationServiceError,
@@ -14,6 +13,7 @@ from backend.services.organisation_service import (
 )
 from backend.models.postgis.statuses import OrganisationType
 from backend.services.users.authentication_service import token_auth
+from backend.services.users.user_service import UserService
 
 
 class OrganisationsBySlugRestAPI(Resource):
@@ -129,7 +129,7 @@ class OrganisationsRestAPI(Resource):
             500:
                 description: Internal Server Error
         """
-        request_user = User.get_by_id(token_auth.current_user())
+        request_user = UserService.get_user_principal(token_auth.current_user())
         if request_user.role != 1:
             return {
                 "Error": "Only admin users can create organisations.",
@@ -336,7 +336,7 @@ class OrganisationsRestAPI(Resource):
             organisation_dto = UpdateOrganisationDTO(request.get_json())
             organisation_dto.organisation_id = organisation_id
             # Don't update organisation type and subscription_tier if request user is not an admin
-            if User.get_by_id(token_auth.current_user()).role != 1:
+            if not UserService.is_user_an_admin(token_auth.current_user()):
                 org = OrganisationService.get_organisation_by_id(organisation_id)
                 organisation_dto.type = OrganisationType(org.type).name
                 organisation_dto.subscription_tier = org.subscription_tier
@@ -1,5 +1,3 @@
-import threading
-
 from flask_restful import Resource, request, current_app
 from schematics.exceptions import DataError
 
@@ -9,6 +7,7 @@ from backend.services.project_service import ProjectService, NotFound
 from backend.services.project_admin_service import ProjectAdminService
 from backend.services.grid.grid_service import GridService
 from backend.services.messaging.message_service import MessageService
+from backend.api.utils import run_in_background
 from backend.services.users.authentication_service import token_auth, tm
 from backend.services.interests_service import InterestService
 from backend.models.postgis.utils import InvalidGeoJson
@@ -137,10 +136,9 @@ class ProjectsActionsMessageContributorsAPI(Resource):
             ProjectAdminService.is_user_action_permitted_on_project(
                 authenticated_user_id, project_id
             )
-            threading.Thread(
-                target=MessageService.send_message_to_all_contributors,
-                args=(project_id, message_dto),
-            ).start()
+            run_in_background(
+                MessageService.send_message_to_all_contributors, project_id, message_dto
+            )
 
             return {"Success": "Messages started"}, 200
         except ValueError:
@@ -1,6 +1,7 @@
 import geojson
+import hashlib
 import io
-from flask import send_file
+from flask import send_file, Response
 from flask_restful import Resource, current_app, request
 from schematics.exceptions import DataError
 from distutils.util import strtobool
@@ -124,12 +125,6 @@ class ProjectsRestAPI(Resource):
                 "Error": "Unable to fetch project",
                 "SubCode": "InternalServerError",
             }, 500
-        finally:
-            # this will try to unlock tasks that have been locked too long
-            try:
-                ProjectService.auto_unlock_tasks(project_id)
-            except Exception as e:
-                current_app.logger.critical(str(e))
 
     @token_auth.login_required
     def post(self):
@@ -516,6 +511,8 @@ class ProjectSearchBase(Resource):
         search_dto.page = (
             int(request.args.get("page")) if request.args.get("page") else 1
         )
+        search_dto.cursor = request.args.get("cursor")
+        search_dto.count_total = strtobool(request.args.get("withTotal", "false"))
         search_dto.text_search = request.args.get("textSearch")
         search_dto.omit_map_results = strtobool(
             request.args.get("omitMapResults", "false")
@@ -622,6 +619,17 @@ class ProjectsAllAPI(ProjectSearchBase):
               description: Page of results user requested
               type: integer
               default: 1
+            - in: query
+              name: cursor
+              description:
+                Opt in to cursor pagination, pass it empty for the first page and then the nextCursor of
+                the previous page. The page parameter is ignored.
+              type: string
+            - in: query
+              name: withTotal
+              description: Count the total number of projects in cursor pagination
+              type: boolean
+              default: false
             - in: query
               name: textSearch
               description: Text to search
@@ -721,6 +729,88 @@ class ProjectsAllAPI(ProjectSearchBase):
             }, 500
 
 
+class ProjectsQueriesMapResultsAPI(ProjectSearchBase):
+    @token_auth.login_required(optional=True)
+    def get(self):
+        """
+        Get the centroids of all projects matching a search, to show them on a map
+        ---
+        tags:
+            - projects
+        produces:
+            - application/json
+        description:
+            Accepts the same filters as the project search (GET /projects/), paging and ordering
+            parameters are ignored. Results are cached and served with an ETag.
+        parameters:
+            - in: header
+              name: Authorization
+              description: Base64 encoded session token
+              type: string
+              default: Token sessionTokenHere==
+            - in: header
+              name: Accept-Language
+              description: Language user is requesting
+              type: string
+              default: en
+            - in: query
+              name: mapperLevel
+              type: string
+            - in: query
+              name: mappingTypes
+              type: string
+            - in: query
+              name: organisationId
+              description: Organisation ID to search for
+              type: integer
+            - in: query
+              name: campaign
+              description: Campaign name to search for
+              type: string
+            - in: query
+              name: textSearch
+              description: Text to search
+              type: string
+            - in: query
+              name: projectStatuses
+              description: Authenticated PMs can search for archived or draft statuses
+              type: string
+        responses:
+            200:
+                description: GeoJSON FeatureCollection of project centroids
+            304:
+                description: Map results haven't changed
+            400:
+                description: Client Error - Invalid Request
+            500:
+                description: Internal Server Error
+        """
+        try:
+            user = None
+            user_id = token_auth.current_user()
+            if user_id:
+                user = UserService.get_user_by_id(user_id)
+            search_dto = self.setup_search_dto()
+            map_results = ProjectSearchService.get_projects_map_results(
+                search_dto, user
+            )
+
+            response = Response(map_results, mimetype="application/json")
+            response.set_etag(hashlib.md5(map_results.encode("utf-8")).hexdigest())
+            response.headers["Cache-Control"] = "no-cache"
+            return response.make_conditional(request)
+        except (KeyError, ValueError) as e:
+            error_msg = f"Projects map results GET - {str(e)}"
+            return {"Error": error_msg}, 400
+        except Exception as e:
+            error_msg = f"Projects map results GET - unhandled error: {str(e)}"
+            current_app.logger.critical(error_msg)
+            return {
+                "Error": "Unable to fetch projects map results",
+                "SubCode": "InternalServerError",
+            }, 500
+
+
 class ProjectsQueriesBboxAPI(Resource):
     @token_auth.login_required
     def get(self):
@@ -1041,12 +1131,6 @@ class ProjectsQueriesNoGeometriesAPI(Resource):
                 "Error": "Unable to fetch project",
                 "SubCode": "InternalServerError",
             }, 500
-        finally:
-            # this will try to unlock tasks that have been locked too long
-            try:
-                ProjectService.auto_unlock_tasks(project_id)
-            except Exception as e:
-                current_app.logger.critical(str(e))
 
 
 class ProjectsQueriesNoTasksAPI(Resource):
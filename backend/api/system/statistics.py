@@ -1,5 +1,8 @@
 from flask_restful import Resource, current_app
 from backend.services.stats_service import StatsService
+from backend.services.cache_service import CacheService
+from backend.services.users.authentication_service import token_auth
+from backend.services.users.user_service import UserService
 from flask_restful import request
 from distutils.util import strtobool
 
@@ -41,3 +44,47 @@ class SystemStatisticsAPI(Resource):
                 "Error": "Unable to fetch summary statistics",
                 "SubCode": "InternalServerError",
             }, 500
+
+
+class SystemCacheStatisticsAPI(Resource):
+    @token_auth.login_required
+    def get(self):
+        """
+        Get the backend, hit and miss counters and sizes of the application caches
+        ---
+        tags:
+          - system
+        produces:
+          - application/json
+        parameters:
+            - in: header
+              name: Authorization
+              description: Base64 encoded session token
+              required: true
+              type: string
+              default: Token sessionTokenHere==
+        responses:
+            200:
+                description: Cache statistics
+            401:
+                description: Unauthorized - Invalid credentials
+            403:
+                description: Forbidden
+            500:
+                description: Internal Server Error
+        """
+        try:
+            if not UserService.is_user_an_admin(token_auth.current_user()):
+                return {
+                    "Error": "This endpoint action is restricted to ADMIN users.",
+                    "SubCode": "OnlyAdminAccess",
+                }, 403
+
+            return CacheService.get_cache_stats(), 200
+        except Exception as e:
+            error_msg = f"Unhandled error: {str(e)}"
+            current_app.logger.critical(error_msg)
+            return {
+                "Error": "Unable to fetch cache statistics",
+                "SubCode": "InternalServerError",
+            }, 500
@@ -1,7 +1,9 @@
 import io
+from datetime import timezone
 from distutils.util import strtobool
 
-from flask import send_file, Response
+from dateutil.parser import parse as date_parse
+from flask import send_file, Response, stream_with_context
 from flask_restful import Resource, current_app, request
 from schematics.exceptions import DataError
 
@@ -14,8 +16,9 @@ from backend.services.validator_service import ValidatorService
 
 from backend.services.project_service import ProjectService, ProjectServiceError
 from backend.services.grid.grid_service import GridService
-from backend.models.postgis.statuses import UserRole
 from backend.models.postgis.utils import InvalidGeoJson
+from backend.api.utils import event_stream_response
+from backend.services.event_stream_service import project_channel
 
 
 class TasksRestAPI(Resource):
@@ -96,9 +99,21 @@ class TasksQueriesJsonAPI(Resource):
               type: boolean
               description: Set to true if file download preferred
               default: True
+            - in: query
+              name: stream
+              type: boolean
+              description: Set to true to stream the GeoJSON as it is built by the database, for large projects
+              default: False
+            - in: header
+              name: If-None-Match
+              description: ETag of a previous response, tasks are only returned if they changed since
+              required: false
+              type: string
         responses:
             200:
                 description: Project found
+            304:
+                description: Tasks not modified
             403:
                 description: Forbidden
             404:
@@ -113,19 +128,49 @@ class TasksQueriesJsonAPI(Resource):
                 if request.args.get("as_file")
                 else True
             )
+            stream = (
+                strtobool(request.args.get("stream"))
+                if request.args.get("stream")
+                else False
+            )
 
-            tasks_json = ProjectService.get_project_tasks(int(project_id), tasks)
+            if stream:
+                tasks_stream = ProjectService.stream_project_tasks(
+                    int(project_id), tasks
+                )
+                response = Response(
+                    stream_with_context(tasks_stream), mimetype="application/json"
+                )
+                if as_file:
+                    response.headers[
+                        "Content-Disposition"
+                    ] = f"attachment; filename={str(project_id)}-tasks.geojson"
+                return response
+
+            etag = ProjectService.get_project_tasks_etag(int(project_id), tasks)
+            if request.if_none_match.contains(etag):
+                # Tasks haven't changed since the client last fetched them
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            tasks_json = ProjectService.get_project_tasks_as_geojson_string(
+                int(project_id), tasks
+            )
 
             if as_file:
-                tasks_json = str(tasks_json).encode("utf-8")
-                return send_file(
-                    io.BytesIO(tasks_json),
+                response = send_file(
+                    io.BytesIO(tasks_json.encode("utf-8")),
                     mimetype="application/json",
                     as_attachment=True,
                     attachment_filename=f"{str(project_id)}-tasks.geojson",
                 )
+            else:
+                response = Response(tasks_json, mimetype="application/json")
 
-            return tasks_json, 200
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
         except NotFound:
             return {"Error": "Project or Task Not Found", "SubCode": "NotFound"}, 404
         except ProjectServiceError as e:
@@ -183,8 +228,7 @@ class TasksQueriesJsonAPI(Resource):
                 description: Internal Server Error
         """
         user_id = token_auth.current_user()
-        user = UserService.get_user_by_id(user_id)
-        if user.role != UserRole.ADMIN.value:
+        if not UserService.is_user_an_admin(user_id):
             return {
                 "Error": "This endpoint action is restricted to ADMIN users.",
                 "SubCode": "OnlyAdminAccess",
@@ -217,6 +261,109 @@ class TasksQueriesJsonAPI(Resource):
             }, 500
 
 
+class TasksQueriesChangesAPI(Resource):
+    def get(self, project_id):
+        """
+        Get the tasks of a project whose status or lock changed since a cursor
+        ---
+        tags:
+            - tasks
+        produces:
+            - application/json
+        parameters:
+            - name: project_id
+              in: path
+              description: Project ID the tasks are associated with
+              required: true
+              type: integer
+              default: 1
+            - in: query
+              name: since
+              type: string
+              description: Cursor returned by a previous call or an ISO 8601 date, blank to get the current cursor
+              default: 0
+        responses:
+            200:
+                description: Changed tasks and current cursor, refetch is true if tasks were added or removed
+            400:
+                description: Client Error - Invalid cursor
+            404:
+                description: Project not found
+            500:
+                description: Internal Server Error
+        """
+        try:
+            since = request.args.get("since")
+            since_version = None
+            since_date = None
+            if since:
+                try:
+                    since_version = int(since)
+                except ValueError:
+                    since_date = date_parse(since)
+                    if since_date.tzinfo:
+                        # Task history dates are stored as naive UTC
+                        since_date = since_date.astimezone(timezone.utc).replace(
+                            tzinfo=None
+                        )
+
+            changes_dto = ProjectService.get_task_state_changes(
+                project_id, since_version, since_date
+            )
+            return changes_dto.to_primitive(), 200
+        except ValueError:
+            return {"Error": "Invalid since cursor", "SubCode": "InvalidData"}, 400
+        except NotFound:
+            return {"Error": "Project Not Found", "SubCode": "NotFound"}, 404
+        except Exception as e:
+            error_msg = f"TasksQueriesChangesAPI - unhandled error: {str(e)}"
+            current_app.logger.critical(error_msg)
+            return {
+                "Error": "Unable to fetch task changes",
+                "SubCode": "InternalServerError",
+            }, 500
+
+
+class TasksQueriesEventsAPI(Resource):
+    def get(self, project_id):
+        """
+        Streams the changes of the tasks of a project as server-sent events
+        ---
+        tags:
+            - tasks
+        produces:
+            - text/event-stream
+        parameters:
+            - name: project_id
+              in: path
+              description: Project ID the tasks are associated with
+              required: true
+              type: integer
+              default: 1
+        responses:
+            200:
+                description: A tasks event per change, with the changes endpoint cursor and refetch flag. It
+                    holds the state of the task when a single task changed, otherwise clients fetch the
+                    changes since their cursor
+            404:
+                description: Project not found
+            500:
+                description: Internal Server Error
+        """
+        try:
+            ProjectService.exists(project_id)
+            return event_stream_response(project_channel(project_id))
+        except NotFound:
+            return {"Error": "Project Not Found", "SubCode": "NotFound"}, 404
+        except Exception as e:
+            error_msg = f"TasksQueriesEventsAPI - unhandled error: {str(e)}"
+            current_app.logger.critical(error_msg)
+            return {
+                "Error": "Unable to stream task changes",
+                "SubCode": "InternalServerError",
+            }, 500
+
+
 class TasksQueriesXmlAPI(Resource):
     def get(self, project_id):
         """
@@ -1,10 +1,10 @@
 from flask_restful import Resource, request, current_app
 from schematics.exceptions import DataError
-import threading
 
 from backend.models.dtos.message_dto import MessageDTO
 from backend.services.team_service import TeamService, NotFound, TeamJoinNotAllowed
 from backend.services.users.authentication_service import token_auth, tm
+from backend.api.utils import run_in_background
 from backend.models.postgis.user import User
 
 
@@ -331,10 +331,12 @@ class TeamsActionsMessageMembersAPI(Resource):
             }, 403
 
         try:
-            threading.Thread(
-                target=TeamService.send_message_to_all_team_members,
-                args=(team_id, team.name, message_dto),
-            ).start()
+            run_in_background(
+                TeamService.send_message_to_all_team_members,
+                team_id,
+                team.name,
+                message_dto,
+            )
 
             return {"Success": "Message sent successfully"}, 200
         except ValueError as e:
@@ -72,6 +72,17 @@ class UsersTasksAPI(Resource):
               name: page_size
               description: Size of page, defaults to 10
               type: integer
+            - in: query
+              name: cursor
+              description:
+                    Opt in to cursor pagination, pass it empty for the first page and then the nextCursor of
+                    the previous page. The page parameter is ignored.
+              type: string
+            - in: query
+              name: withTotal
+              description: Count the total number of tasks in cursor pagination
+              type: boolean
+              default: false
         responses:
             200:
                 description: Mapped projects found
@@ -107,6 +118,8 @@ class UsersTasksAPI(Resource):
                 page=request.args.get("page", None, type=int),
                 page_size=request.args.get("page_size", 10, type=int),
                 sort_by=sort_by,
+                cursor=request.args.get("cursor"),
+                count_total=request.args.get("withTotal") == "true",
             )
             return tasks.to_primitive(), 200
         except ValueError:
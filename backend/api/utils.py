@@ -1,6 +1,12 @@
+import threading
 from functools import wraps
 from datetime import date, datetime
 
+from flask import current_app, Response
+
+from backend import db
+from backend.services.event_stream_service import EventStreamService
+
 
 class TMAPIDecorators:
     """ Class for Tasking Manager custom API decorators """
@@ -34,3 +40,31 @@ def validate_date_input(input_date):
         return input_date
     except (TypeError, ValueError):
         raise ValueError("Invalid date value")
+
+
+def run_in_background(target, *args):
+    """
+    Runs target on its own thread, in the app context of the current request so the thread doesn't need to
+    create an app of its own
+    """
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            target(*args)
+
+    threading.Thread(target=run).start()
+
+
+def event_stream_response(channel: str) -> Response:
+    """
+    Streams the server-sent events of the channel. The database session of the request is released first, so
+    open streams don't hold connections
+    """
+    events = EventStreamService.stream(channel)
+    db.session.remove()
+    response = Response(events, mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    # Stops proxies from buffering the events
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
@@ -91,6 +91,21 @@ class EnvironmentConfig:
 
     # Time to wait until task auto-unlock (e.g. '2h' or '7d' or '30m' or '1h30m')
     TASK_AUTOUNLOCK_AFTER = os.getenv("TM_TASK_AUTOUNLOCK_AFTER", "2h")
+    # How often the background scheduler checks for expired task locks
+    TASK_AUTOUNLOCK_CHECK_INTERVAL = os.getenv(
+        "TM_TASK_AUTOUNLOCK_CHECK_INTERVAL", "5m"
+    )
+    # How often the background scheduler rebuilds the homepage stats, to catch changes made by bulk operations
+    GLOBAL_STATS_REFRESH_INTERVAL = os.getenv("TM_GLOBAL_STATS_REFRESH_INTERVAL", "15m")
+
+    # Backend of the API caches: "memory" (per worker), "shared" (shared by all workers of the host through a
+    # memory mapped store) or "redis" (shared by all hosts, requires the redis package)
+    CACHE_BACKEND = os.getenv("TM_CACHE_BACKEND", "memory")
+    CACHE_SHARED_PATH = os.getenv("TM_CACHE_SHARED_PATH", None)
+    CACHE_REDIS_URL = os.getenv("TM_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    # Report the number of queries and the duration of each request in its X-Query-Count and Server-Timing
+    # headers and the log
+    PROFILE_QUERIES = os.getenv("TM_PROFILE_QUERIES", "0") == "1"
 
     # Configuration for sending emails
     SMTP_SETTINGS = {
@@ -98,7 +113,12 @@ class EnvironmentConfig:
         "smtp_user": os.getenv("TM_SMTP_USER", None),
         "smtp_port": os.getenv("TM_SMTP_PORT", 25),
         "smtp_password": os.getenv("TM_SMTP_PASSWORD", None),
+        # Set TM_SMTP_STARTTLS=0 for local relays and debugging servers without TLS
+        "smtp_starttls": os.getenv("TM_SMTP_STARTTLS", "1") != "0",
     }
+    # Queued emails are sent by a background job at most this often, and at most this many per second
+    EMAIL_SEND_INTERVAL = os.getenv("TM_EMAIL_SEND_INTERVAL", "10s")
+    EMAIL_RATE_LIMIT = float(os.getenv("TM_EMAIL_RATE_LIMIT", 10))
 
     # Languages offered by the Tasking Manager
     # Please note that there must be exactly the same number of Codes as languages.
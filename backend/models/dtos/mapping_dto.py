@@ -1,6 +1,6 @@
 from schematics import Model
 from schematics.exceptions import ValidationError
-from schematics.types import StringType, IntType, UTCDateTimeType
+from schematics.types import StringType, IntType, UTCDateTimeType, BooleanType
 from schematics.types.compound import ListType, ModelType
 from backend.models.postgis.statuses import TaskStatus
 from backend.models.dtos.mapping_issues_dto import TaskMappingIssueDTO
@@ -99,6 +99,26 @@ class TaskDTOs(Model):
     tasks = ListType(ModelType(TaskDTO))
 
 
+class TaskStateChangeDTO(Model):
+    """ Describes the current state of a task that changed since a cursor """
+
+    task_id = IntType(serialized_name="taskId")
+    task_status = StringType(serialized_name="taskStatus")
+    locked_by = IntType(serialized_name="lockedBy")
+
+
+class TaskStateChangesDTO(Model):
+    """ Describes the tasks of a project that changed state since a cursor """
+
+    def __init__(self):
+        super().__init__()
+        self.tasks = []
+
+    cursor = IntType()
+    refetch = BooleanType(default=False)
+    tasks = ListType(ModelType(TaskStateChangeDTO))
+
+
 class TaskCommentDTO(Model):
     """ Describes the model used to add a standalone comment to a task outside of mapping/validation """
 
@@ -34,8 +34,12 @@ class ProjectContributionsDTO(Model):
 class Pagination(Model):
     """ Properties for paginating results """
 
-    def __init__(self, paginated_result):
-        """ Instantiate from a Flask-SQLAlchemy paginated result"""
+    def __init__(self, paginated_result=None, **kwargs):
+        """ Instantiate from a Flask-SQLAlchemy paginated result, or from its primitive when imported"""
+        if paginated_result is None or isinstance(paginated_result, dict):
+            super().__init__(paginated_result, **kwargs)
+            return
+
         super().__init__()
 
         self.has_next = paginated_result.has_next
@@ -46,6 +50,7 @@ class Pagination(Model):
         self.prev_num = paginated_result.prev_num
         self.per_page = paginated_result.per_page
         self.total = paginated_result.total
+        self.next_cursor = getattr(paginated_result, "next_cursor", None)
 
     has_next = BooleanType(serialized_name="hasNext")
     has_prev = BooleanType(serialized_name="hasPrev")
@@ -55,6 +60,7 @@ class Pagination(Model):
     prev_num = IntType(serialized_name="prevNum")
     per_page = IntType(serialized_name="perPage")
     total = IntType()
+    next_cursor = StringType(serialized_name="nextCursor")
 
 
 class ProjectActivityDTO(Model):
@@ -1,5 +1,6 @@
 from backend import db
 from backend.models.dtos.campaign_dto import CampaignDTO, CampaignListDTO
+from backend.services.event_service import EventService, CampaignUpdated
 
 
 campaign_projects = db.Table(
@@ -34,14 +35,18 @@ class Campaign(db.Model):
     def create(self):
         """ Creates and saves the current model to the DB """
         db.session.add(self)
+        db.session.flush()
+        EventService.publish(CampaignUpdated(self.id))
         db.session.commit()
 
     def delete(self):
         """ Deletes the current model from the DB """
         db.session.delete(self)
+        EventService.publish(CampaignUpdated(self.id))
         db.session.commit()
 
     def save(self):
+        EventService.publish(CampaignUpdated(self.id))
         db.session.commit()
 
     def update(self, dto: CampaignDTO):
@@ -50,6 +55,7 @@ class Campaign(db.Model):
         self.logo = dto.logo if dto.logo else self.logo
         self.url = dto.url if dto.url else self.url
         self.description = dto.description if dto.description else self.description
+        EventService.publish(CampaignUpdated(self.id))
         db.session.commit()
 
     @classmethod
@@ -0,0 +1,179 @@
+import datetime
+
+from sqlalchemy import text
+
+from backend import db
+from backend.models.postgis.statuses import EmailStatus
+from backend.models.postgis.utils import timestamp
+
+
+class OutboxEmail(db.Model):
+    """
+    Email waiting to be sent by the outbox sender. Emails are queued in the transaction that produces them, so
+    they are only sent if it commits and are never lost if the sender is down
+    """
+
+    __tablename__ = "email_outbox"
+
+    id = db.Column(db.BigInteger, primary_key=True)
+    to_address = db.Column(db.String, nullable=False)
+    subject = db.Column(db.String, nullable=False)
+    html_message = db.Column(db.String, nullable=False)
+    text_message = db.Column(db.String)
+    status = db.Column(db.Integer, nullable=False, default=EmailStatus.PENDING.value)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt = db.Column(db.DateTime, nullable=False, default=timestamp)
+    last_error = db.Column(db.String)
+    created = db.Column(db.DateTime, nullable=False, default=timestamp)
+    sent = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Only holds the emails still to send, so the sender finds the due ones cheaply
+        db.Index(
+            "idx_email_outbox_pending",
+            "next_attempt",
+            postgresql_where=db.text(f"status = {EmailStatus.PENDING.value}"),
+        ),
+        {},
+    )
+
+    @staticmethod
+    def enqueue(
+        to_address: str, subject: str, html_message: str, text_message: str = None
+    ):
+        """ Queues the email in the caller's transaction, it is sent once the transaction commits """
+        email = OutboxEmail(
+            to_address=to_address,
+            subject=subject,
+            html_message=html_message,
+            text_message=text_message,
+        )
+        db.session.add(email)
+        return email
+
+    @staticmethod
+    def enqueue_many(to_addresses: list, subject: str, html_messages: list):
+        """
+        Queues an email with the same subject to each address in a single statement, in the caller's
+        transaction
+        :param html_messages: list of the message of each address
+        """
+        if not to_addresses:
+            return
+
+        db.session.execute(
+            text(
+                """
+                INSERT INTO email_outbox (to_address, subject, html_message, status, attempts,
+                                          next_attempt, created)
+                     SELECT e.to_address, :subject, e.html_message, :pending, 0, :now, :now
+                       FROM UNNEST(CAST(:to_addresses AS VARCHAR[]),
+                                   CAST(:html_messages AS VARCHAR[])) AS e(to_address, html_message)
+                """
+            ),
+            dict(
+                to_addresses=list(to_addresses),
+                subject=subject,
+                html_messages=list(html_messages),
+                pending=EmailStatus.PENDING.value,
+                now=timestamp(),
+            ),
+        )
+
+    @staticmethod
+    def claim_due(batch_size: int, lease: datetime.timedelta) -> list:
+        """
+        Claims a batch of the emails that are due, pushing their next attempt back by the lease so other
+        senders skip them while they are sent. Commits the claim
+        :return: list of the claimed emails rows, oldest first
+        """
+        now = timestamp()
+        emails = db.session.execute(
+            text(
+                """
+                UPDATE email_outbox
+                   SET next_attempt = :leased_until
+                 WHERE id IN (SELECT id
+                                FROM email_outbox
+                               WHERE status = :pending AND next_attempt <= :now
+                            ORDER BY next_attempt
+                               LIMIT :batch_size
+                                 FOR UPDATE SKIP LOCKED)
+             RETURNING id, to_address, subject, html_message, text_message, attempts
+                """
+            ),
+            dict(
+                pending=EmailStatus.PENDING.value,
+                now=now,
+                leased_until=now + lease,
+                batch_size=batch_size,
+            ),
+        ).fetchall()
+        db.session.commit()
+        return sorted(emails, key=lambda email: email.id)
+
+    @staticmethod
+    def mark_sent(email_ids: list):
+        """ Records the emails as sent. Runs in the caller's transaction and doesn't commit """
+        if not email_ids:
+            return
+
+        db.session.execute(
+            text(
+                """
+                UPDATE email_outbox
+                   SET status = :sent, sent = :now, attempts = attempts + 1, last_error = NULL
+                 WHERE id = ANY(:email_ids)
+                """
+            ),
+            dict(sent=EmailStatus.SENT.value, now=timestamp(), email_ids=email_ids),
+        )
+
+    @staticmethod
+    def postpone(email_ids: list, retry_at: datetime.datetime):
+        """
+        Puts off the next attempt of the emails without counting an attempt, when they couldn't be sent for
+        reasons of the sender. Runs in the caller's transaction and doesn't commit
+        """
+        if not email_ids:
+            return
+
+        db.session.execute(
+            text(
+                """
+                UPDATE email_outbox
+                   SET next_attempt = :retry_at
+                 WHERE id = ANY(:email_ids)
+                """
+            ),
+            dict(retry_at=retry_at, email_ids=email_ids),
+        )
+
+    @staticmethod
+    def mark_failed(email_id: int, error: str, retry_at: datetime.datetime = None):
+        """
+        Records a failed attempt to send the email. Runs in the caller's transaction and doesn't commit
+        :param retry_at: When to attempt it again, None if the email can't be sent
+        """
+        db.session.execute(
+            text(
+                """
+                UPDATE email_outbox
+                   SET status = :status,
+                       attempts = attempts + 1,
+                       next_attempt = COALESCE(:retry_at, next_attempt),
+                       last_error = :error
+                 WHERE id = :email_id
+                """
+            ),
+            dict(
+                status=(
+                    EmailStatus.PENDING.value
+                    if retry_at is not None
+                    else EmailStatus.FAILED.value
+                ),
+                retry_at=retry_at,
+                error=error,
+                email_id=email_id,
+            ),
+        )
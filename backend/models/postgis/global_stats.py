@@ -0,0 +1,251 @@
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from backend import db
+from backend.models.dtos.stats_dto import (
+    CampaignStatsDTO,
+    HomePageStatsDTO,
+    OrganizationListStatsDTO,
+)
+from backend.models.postgis.statuses import TaskStatus
+from backend.models.postgis.utils import timestamp
+
+GLOBAL_STATS_ID = 1
+
+# Statuses counted as mapped and validated on the homepage
+MAPPED_STATUSES = (TaskStatus.MAPPED.name, TaskStatus.VALIDATED.name)
+VALIDATED_STATUSES = (TaskStatus.VALIDATED.name,)
+
+# Attributes left out of the abbreviated homepage stats
+ABBREVIATED_ATTRS = (
+    "total_validators",
+    "tasks_validated",
+    "total_area",
+    "total_mapped_area",
+    "total_validated_area",
+    "campaigns",
+    "total_campaigns",
+    "organisations",
+    "total_organisations",
+)
+
+# Row of zero counters the refresh counts into, the columns have no database defaults
+ZERO_ROW = """
+    INSERT INTO global_stats (id, total_projects, total_area, total_mappers, mappers_online, tasks_mapped,
+                              tasks_validated, total_validators, total_mapped_area, total_validated_area,
+                              total_campaigns, total_organisations, projects_without_campaign,
+                              organisations_without_project, campaigns, organisations, last_updated)
+    VALUES (:id, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, '[]', '[]', :now)
+    ON CONFLICT DO NOTHING
+"""
+
+# Project counters, without the area of the projects which is only summed by the scheduled refresh
+PROJECT_COUNTERS = """
+    UPDATE global_stats
+       SET (total_projects, total_campaigns, total_organisations,
+            projects_without_campaign, organisations_without_project, campaigns, organisations) =
+           (SELECT (SELECT COUNT(*) FROM projects),
+                   (SELECT COUNT(*) FROM campaigns),
+                   (SELECT COUNT(*) FROM organisations),
+                   (SELECT COUNT(*) FROM projects p
+                     WHERE NOT EXISTS (SELECT 1 FROM campaign_projects cp WHERE cp.project_id = p.id)),
+                   (SELECT COUNT(*) FROM organisations o
+                     WHERE NOT EXISTS (SELECT 1 FROM projects p WHERE p.organisation_id = o.id)),
+                   (SELECT COALESCE(jsonb_agg(jsonb_build_array(c.name, c.projects) ORDER BY c.name), '[]')
+                      FROM (SELECT c.name, COUNT(*) AS projects
+                              FROM campaigns c
+                              JOIN campaign_projects cp ON cp.campaign_id = c.id
+                          GROUP BY c.id) c),
+                   (SELECT COALESCE(jsonb_agg(jsonb_build_array(o.name, o.projects) ORDER BY o.name), '[]')
+                      FROM (SELECT o.name, COUNT(*) AS projects
+                              FROM organisations o
+                              JOIN projects p ON p.organisation_id = o.id
+                          GROUP BY o.id) o)),
+           last_updated = :now
+     WHERE id = :id
+"""
+
+PROJECT_AREA = """
+    UPDATE global_stats
+       SET total_area = (SELECT COALESCE(SUM(ST_Area(geometry, true)), 0) / 1000000 FROM projects),
+           last_updated = :now
+     WHERE id = :id
+"""
+
+TASK_COUNTERS = """
+    UPDATE global_stats
+       SET (total_mappers, mappers_online, tasks_mapped, tasks_validated, total_validators,
+            total_mapped_area, total_validated_area) =
+           (SELECT (SELECT COUNT(*) FROM users),
+                   (SELECT COUNT(DISTINCT locked_by) FROM tasks WHERE locked_by IS NOT NULL),
+                   COUNT(*),
+                   COUNT(*) FILTER (WHERE task_status = :validated),
+                   COUNT(DISTINCT validated_by) FILTER (WHERE task_status = :validated),
+                   COALESCE(SUM(ST_Area(geometry, true)) FILTER (WHERE task_status = :mapped), 0) / 1000000,
+                   COALESCE(SUM(ST_Area(geometry, true)) FILTER (WHERE task_status = :validated), 0) / 1000000
+              FROM tasks
+             WHERE task_status IN (:mapped, :validated)),
+           last_updated = :now
+     WHERE id = :id
+"""
+
+
+class GlobalStats(db.Model):
+    """
+    Totals of all the projects shown on the homepage, kept in a single row so homepage stats are one read
+    shared by all workers. Task counters are updated from task state changes and project counters from
+    projects being created or deleted and campaign and organisation changes. refresh rebuilds them all from
+    the source tables, to catch the changes made by bulk operations and the area of the projects
+    """
+
+    __tablename__ = "global_stats"
+
+    id = db.Column(db.Integer, primary_key=True, default=GLOBAL_STATS_ID)
+    total_projects = db.Column(db.Integer, nullable=False, default=0)
+    total_area = db.Column(db.Float, nullable=False, default=0)
+    total_mappers = db.Column(db.Integer, nullable=False, default=0)
+    mappers_online = db.Column(db.Integer, nullable=False, default=0)
+    tasks_mapped = db.Column(db.Integer, nullable=False, default=0)
+    tasks_validated = db.Column(db.Integer, nullable=False, default=0)
+    total_validators = db.Column(db.Integer, nullable=False, default=0)
+    # Areas in km2
+    total_mapped_area = db.Column(db.Float, nullable=False, default=0)
+    total_validated_area = db.Column(db.Float, nullable=False, default=0)
+    total_campaigns = db.Column(db.Integer, nullable=False, default=0)
+    total_organisations = db.Column(db.Integer, nullable=False, default=0)
+    projects_without_campaign = db.Column(db.Integer, nullable=False, default=0)
+    organisations_without_project = db.Column(db.Integer, nullable=False, default=0)
+    # Number of projects of each campaign and organisation, as [name, projects] pairs
+    campaigns = db.Column(JSONB, nullable=False, default=list)
+    organisations = db.Column(JSONB, nullable=False, default=list)
+    last_updated = db.Column(db.DateTime, nullable=False, default=timestamp)
+
+    @staticmethod
+    def record_task_state_change(
+        project_id: int, task_id: int, last_state: str, new_state: str
+    ):
+        """
+        Moves the task between the mapped and validated counters. Runs in its own short transaction, so the
+        row isn't locked for the whole transaction of each mapper
+        :param last_state: Name of the task status before the change
+        :param new_state: Name of the task status after the change
+        """
+        mapped = int(new_state in MAPPED_STATUSES) - int(last_state in MAPPED_STATUSES)
+        validated = int(new_state in VALIDATED_STATUSES) - int(
+            last_state in VALIDATED_STATUSES
+        )
+        mapped_area = int(new_state == TaskStatus.MAPPED.name) - int(
+            last_state == TaskStatus.MAPPED.name
+        )
+        if not (mapped or validated or mapped_area):
+            return
+
+        with db.engine.begin() as connection:
+            connection.execute(
+                text(
+                    """
+                    UPDATE global_stats
+                       SET tasks_mapped = tasks_mapped + :mapped,
+                           tasks_validated = tasks_validated + :validated,
+                           total_mapped_area = total_mapped_area + :mapped_area * t.area,
+                           total_validated_area = total_validated_area + :validated * t.area,
+                           last_updated = :now
+                      FROM (SELECT COALESCE(SUM(ST_Area(geometry, true)), 0) / 1000000 AS area
+                              FROM tasks
+                             WHERE id = :task_id AND project_id = :project_id) t
+                     WHERE global_stats.id = :id
+                    """
+                ),
+                dict(
+                    id=GLOBAL_STATS_ID,
+                    project_id=project_id,
+                    task_id=task_id,
+                    mapped=mapped,
+                    validated=validated,
+                    mapped_area=mapped_area,
+                    now=timestamp(),
+                ),
+            )
+
+    @staticmethod
+    def refresh_mappers_online():
+        """ Recounts the users holding task locks, from the partial index of locked tasks """
+        with db.engine.begin() as connection:
+            connection.execute(
+                text(
+                    """
+                    UPDATE global_stats
+                       SET mappers_online = (SELECT COUNT(DISTINCT locked_by)
+                                               FROM tasks
+                                              WHERE locked_by IS NOT NULL),
+                           last_updated = :now
+                     WHERE id = :id
+                    """
+                ),
+                dict(id=GLOBAL_STATS_ID, now=timestamp()),
+            )
+
+    @staticmethod
+    def refresh_project_counters():
+        """ Recounts the projects and the projects of each campaign and organisation """
+        with db.engine.begin() as connection:
+            connection.execute(
+                text(PROJECT_COUNTERS), dict(id=GLOBAL_STATS_ID, now=timestamp())
+            )
+
+    @staticmethod
+    def refresh():
+        """ Rebuilds all the counters from the source tables """
+        with db.engine.begin() as connection:
+            params = dict(
+                id=GLOBAL_STATS_ID,
+                mapped=TaskStatus.MAPPED.value,
+                validated=TaskStatus.VALIDATED.value,
+                now=timestamp(),
+            )
+            connection.execute(text(ZERO_ROW), params)
+            connection.execute(text(PROJECT_COUNTERS), params)
+            connection.execute(text(PROJECT_AREA), params)
+            connection.execute(text(TASK_COUNTERS), params)
+
+    @staticmethod
+    def get_homepage_stats_dto(abbrev=True) -> HomePageStatsDTO:
+        """ Reads the homepage stats, building the counters the first time they are needed """
+        stats = GlobalStats.query.get(GLOBAL_STATS_ID)
+        if stats is None:
+            GlobalStats.refresh()
+            stats = GlobalStats.query.get(GLOBAL_STATS_ID)
+
+        dto = HomePageStatsDTO()
+        dto.total_projects = stats.total_projects
+        dto.mappers_online = stats.mappers_online
+        dto.total_mappers = stats.total_mappers
+        dto.tasks_mapped = stats.tasks_mapped
+        if abbrev:
+            # Clear null attributes for abbreviated call
+            for attr in ABBREVIATED_ATTRS:
+                delattr(dto, attr)
+            return dto
+
+        dto.total_validators = stats.total_validators
+        dto.tasks_validated = stats.tasks_validated
+        dto.total_area = stats.total_area
+        dto.total_mapped_area = stats.total_mapped_area
+        dto.total_validated_area = stats.total_validated_area
+        dto.total_campaigns = stats.total_campaigns
+        dto.total_organisations = stats.total_organisations
+        dto.campaigns = [CampaignStatsDTO(row) for row in stats.campaigns]
+        if stats.projects_without_campaign:
+            dto.campaigns.append(
+                CampaignStatsDTO(("Unassociated", stats.projects_without_campaign))
+            )
+        dto.organisations = [
+            OrganizationListStatsDTO(row) for row in stats.organisations
+        ]
+        if stats.organisations_without_project:
+            dto.organisations.append(
+                OrganizationListStatsDTO(
+                    ("Unassociated", stats.organisations_without_project)
+                )
+            )
+        return dto
@@ -1,9 +1,11 @@
+from sqlalchemy import text
 from sqlalchemy.sql.expression import false
 
 from backend import db
 from flask import current_app
 from enum import Enum
 from backend.models.dtos.message_dto import MessageDTO, MessagesDTO
+from backend.models.postgis.notification import Notification
 from backend.models.postgis.user import User
 from backend.models.postgis.task import Task
 from backend.models.postgis.project import Project
@@ -100,9 +102,66 @@ class Message(db.Model):
 
     def save(self):
         """ Save """
+        if self.id is None:
+            Notification.increment_unread([self.to_user_id])
         db.session.add(self)
         db.session.commit()
 
+    @staticmethod
+    def broadcast(
+        to_user_ids: list,
+        from_user_id: int,
+        subject: str,
+        message: str,
+        message_type: MessageType,
+        project_id: int = None,
+    ) -> list:
+        """
+        Stores the same message for all the recipients in a single statement and counts it as unread, in the
+        caller's transaction. Recipients that opted out of project broadcasts don't get it, the ones that opted
+        out of team broadcasts get it without an email alert
+        :return: list of (id, to_user_id, email_address) of the messages whose recipients are alerted by email
+        """
+        if message_type == MessageType.BROADCAST:
+            stored, notified = "u.projects_notifications", "TRUE"
+        else:
+            stored, notified = "TRUE", "u.teams_notifications"
+
+        recipients = db.session.execute(
+            text(
+                f"""
+                WITH recipients AS (
+                    SELECT u.id, u.email_address,
+                           {notified} AND u.is_email_verified IS TRUE AND u.email_address != '' AS notified
+                      FROM users u
+                     WHERE u.id = ANY(:to_user_ids) AND {stored}
+                ), inserted AS (
+                    INSERT INTO messages (message, subject, from_user_id, to_user_id, project_id,
+                                          message_type, date, read)
+                         SELECT :message, :subject, :from_user_id, r.id, :project_id,
+                                :message_type, :date, FALSE
+                           FROM recipients r
+                      RETURNING id, to_user_id
+                )
+                SELECT i.id, i.to_user_id, r.email_address, r.notified
+                  FROM inserted i
+                  JOIN recipients r ON r.id = i.to_user_id
+              ORDER BY i.id
+                """
+            ),
+            dict(
+                to_user_ids=list(to_user_ids),
+                message=message,
+                subject=subject,
+                from_user_id=from_user_id,
+                project_id=project_id,
+                message_type=message_type.value,
+                date=timestamp(),
+            ),
+        ).fetchall()
+        Notification.increment_unread([row.to_user_id for row in recipients])
+        return [row for row in recipients if row.notified]
+
     @staticmethod
     def get_all_contributors(project_id: int):
         """ Get all contributors to a project """
@@ -121,6 +180,8 @@ class Message(db.Model):
 
     def mark_as_read(self):
         """ Mark the message in scope as Read """
+        if not self.read:
+            Notification.decrement_unread([self.id])
         self.read = True
         db.session.commit()
 
@@ -148,6 +209,7 @@ class Message(db.Model):
     @staticmethod
     def delete_multiple_messages(message_ids: list, user_id: int):
         """ Deletes the specified messages to the user """
+        Notification.decrement_unread(message_ids, user_id)
         Message.query.filter(
             Message.to_user_id == user_id, Message.id.in_(message_ids)
         ).delete(synchronize_session=False)
@@ -155,5 +217,6 @@ class Message(db.Model):
 
     def delete(self):
         """ Deletes the current model from the DB """
+        Notification.decrement_unread([self.id])
         db.session.delete(self)
         db.session.commit()
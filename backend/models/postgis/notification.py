@@ -1,13 +1,33 @@
+from sqlalchemy import text
+
 from backend import db
 from backend.models.postgis.user import User
-from backend.models.postgis.message import Message
 from backend.models.postgis.utils import timestamp
 from backend.models.dtos.notification_dto import NotificationDTO
+from backend.services.event_stream_service import (
+    EVENT_STREAM_CHANNEL,
+    EventStreamService,
+    user_channel,
+)
 from datetime import datetime, timedelta
 
+# Pushes the unread counts RETURNING by a counted CTE to the event streams of the users, in the same shape as
+# MessageService.has_user_new_messages
+NOTIFY_UNREAD_COUNTS = """
+    SELECT COUNT(pg_notify(:channel, json_build_object(
+               'channel', 'user:' || user_id,
+               'event', 'messages',
+               'data', json_build_object('newMessages', unread_count > 0, 'unread', unread_count)
+           )::text))
+      FROM counted
+"""
+
 
 class Notification(db.Model):
-    """ Describes a Notification for a user """
+    """
+    Describes a Notification for a user. unread_count is the number of unread messages the user received since
+    the notification date, maintained as messages are sent, read and deleted so polling it doesn't count messages
+    """
 
     __tablename__ = "notifications"
 
@@ -15,7 +35,7 @@ class Notification(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.BigInteger, db.ForeignKey("users.id"), index=True)
-    unread_count = db.Column(db.Integer)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
     date = db.Column(db.DateTime, default=timestamp)
 
     # Relationships
@@ -36,6 +56,10 @@ class Notification(db.Model):
 
     def update(self):
         self.date = timestamp()
+        self.unread_count = 0
+        EventStreamService.publish(
+            user_channel(self.user_id), "messages", dict(newMessages=False, unread=0)
+        )
         db.session.commit()
 
     @staticmethod
@@ -45,20 +69,87 @@ class Notification(db.Model):
             Notification.user_id == user_id
         ).first()
 
-        # Create if does not exist.
+        # Create if does not exist, counting the messages once, the count is maintained from then on.
         if notifications is None:
             # In case users are new but have not logged in previously.
             date_value = datetime.today() - timedelta(days=30)
+            count = db.session.execute(
+                text(
+                    """
+                    SELECT COUNT(*)
+                      FROM messages
+                     WHERE to_user_id = :user_id AND date > :date AND read IS NOT TRUE
+                    """
+                ),
+                dict(user_id=user_id, date=date_value),
+            ).scalar()
             notifications = Notification(
-                user_id=user_id, unread_count=0, date=date_value
+                user_id=user_id, unread_count=count, date=date_value
             )
             notifications.save()
 
-        # Count messages that the user has received after last check.
-        count = (
-            Message.query.filter(Message.to_user_id == user_id)
-            .filter(Message.date > notifications.date)
-            .count()
+        return notifications.unread_count
+
+    @staticmethod
+    def increment_unread(user_ids: list):
+        """
+        Counts new messages sent to the users, a user appears once per message. Users that have no notification
+        yet are counted when it is created. Runs in the caller's transaction and doesn't commit
+        """
+        if len(user_ids) == 0:
+            return
+
+        db.session.execute(
+            text(
+                f"""
+                WITH counted AS (
+                    UPDATE notifications n
+                       SET unread_count = n.unread_count + m.count
+                      FROM (SELECT user_id, COUNT(*) AS count
+                              FROM UNNEST(CAST(:user_ids AS BIGINT[])) user_id
+                          GROUP BY user_id) m
+                     WHERE n.user_id = m.user_id
+                 RETURNING n.user_id, n.unread_count
+                )
+                {NOTIFY_UNREAD_COUNTS}
+                """
+            ),
+            dict(user_ids=list(user_ids), channel=EVENT_STREAM_CHANNEL),
         )
 
-        return count
+    @staticmethod
+    def decrement_unread(message_ids: list, user_id: int = None):
+        """
+        Uncounts the messages that are about to be read or deleted, if they were counted as unread. Runs in the
+        caller's transaction and doesn't commit
+        :param user_id: Only uncount the messages sent to this user, all the messages if None
+        """
+        if len(message_ids) == 0:
+            return
+
+        db.session.execute(
+            text(
+                f"""
+                WITH counted AS (
+                    UPDATE notifications n
+                       SET unread_count = GREATEST(n.unread_count - d.count, 0)
+                      FROM (SELECT u.id AS notification_id, COUNT(*) AS count
+                              FROM messages m
+                              JOIN notifications u ON u.user_id = m.to_user_id
+                             WHERE m.id = ANY(:message_ids)
+                               AND (:user_id IS NULL OR m.to_user_id = :user_id)
+                               AND m.read IS NOT TRUE
+                               AND m.date > u.date
+                          GROUP BY u.id) d
+                     WHERE n.id = d.notification_id
+                 RETURNING n.user_id, n.unread_count
+                )
+                {NOTIFY_UNREAD_COUNTS}
+                """
+            ),
+            dict(
+                message_ids=list(message_ids),
+                user_id=user_id,
+                channel=EVENT_STREAM_CHANNEL,
+            ),
+        )
@@ -10,6 +10,11 @@ from backend.models.postgis.user import User
 from backend.models.postgis.campaign import Campaign, campaign_organisations
 from backend.models.postgis.utils import NotFound
 from backend.models.postgis.statuses import OrganisationType
+from backend.services.event_service import (
+    EventService,
+    MembershipChanged,
+    OrganisationUpdated,
+)
 
 
 # Secondary table defining many-to-many relationship between organisations and managers
@@ -55,6 +60,9 @@ class Organisation(db.Model):
     def create(self):
         """ Creates and saves the current model to the DB """
         db.session.add(self)
+        db.session.flush()
+        EventService.publish(OrganisationUpdated(self.id))
+        EventService.publish(MembershipChanged(organisation_id=self.id))
         db.session.commit()
 
     @classmethod
@@ -110,11 +118,16 @@ class Organisation(db.Model):
 
                 self.managers.append(new_manager)
 
+            EventService.publish(MembershipChanged(organisation_id=self.id))
+
+        EventService.publish(OrganisationUpdated(self.id))
         db.session.commit()
 
     def delete(self):
         """ Deletes the current model from the DB """
         db.session.delete(self)
+        EventService.publish(OrganisationUpdated(self.id))
+        EventService.publish(MembershipChanged(organisation_id=self.id))
         db.session.commit()
 
     def can_be_deleted(self) -> bool:
@@ -1,15 +1,13 @@
 import json
 import re
-from typing import Optional
-from cachetools import TTLCache, cached
+from typing import Dict, List, Optional
 
 import geojson
-import datetime
 from flask import current_app
 from geoalchemy2 import Geometry
 from geoalchemy2.shape import to_shape
-from sqlalchemy.sql.expression import cast, or_
-from sqlalchemy import text, desc, func, Time, orm, literal
+from sqlalchemy.sql.expression import or_
+from sqlalchemy import desc, func, orm, literal, distinct, text
 from shapely.geometry import shape
 from sqlalchemy.dialects.postgresql import ARRAY
 import requests
@@ -21,7 +19,6 @@ from backend.models.dtos.project_dto import (
     DraftProjectDTO,
     ProjectSummary,
     PMDashboardDTO,
-    ProjectStatsDTO,
     ProjectUserStatsDTO,
     ProjectSearchDTO,
     ProjectTeamDTO,
@@ -59,6 +56,12 @@ from backend.models.postgis.utils import (
     ST_Centroid,
     NotFound,
 )
+from backend.services.cache_service import Cache
+from backend.services.event_service import (
+    EventService,
+    ProjectUpdated,
+    TaskStateChanged,
+)
 from backend.services.grid.grid_service import GridService
 from backend.models.postgis.interests import Interest, project_interests
 
@@ -95,20 +98,44 @@ class ProjectTeams(db.Model):
     def create(self):
         """Creates and saves the current model to the DB"""
         db.session.add(self)
+        EventService.publish(ProjectUpdated(self.project_id))
         db.session.commit()
 
     def save(self):
         """Save changes to db"""
+        EventService.publish(ProjectUpdated(self.project_id))
         db.session.commit()
 
     def delete(self):
         """Deletes the current model from the DB"""
         db.session.delete(self)
+        EventService.publish(ProjectUpdated(self.project_id))
         db.session.commit()
 
 
-# cache mapper counts for 30 seconds
-active_mappers_cache = TTLCache(maxsize=1024, ttl=30)
+# Mapper counts by project, evicted whenever the project's tasks change
+active_mappers_cache = Cache("active_mappers", maxsize=1024, ttl=3600, local_ttl=30)
+
+
+@EventService.subscribe(TaskStateChanged, ProjectUpdated)
+def evict_active_mappers(event):
+    active_mappers_cache.evict(event.project_id)
+
+
+# Task counters of projects, recounted by Project.refresh_task_counters
+TASK_COUNTERS = ("total_tasks", "tasks_mapped", "tasks_validated", "tasks_bad_imagery")
+TASK_COUNTS = """
+    SELECT p.id AS project_id,
+           COUNT(t.id) AS total_tasks,
+           COUNT(t.id) FILTER (WHERE t.task_status = :mapped) AS tasks_mapped,
+           COUNT(t.id) FILTER (WHERE t.task_status = :validated) AS tasks_validated,
+           COUNT(t.id) FILTER (WHERE t.task_status = :bad_imagery) AS tasks_bad_imagery
+      FROM projects p
+      LEFT JOIN tasks t ON t.project_id = p.id
+     WHERE (:first_id IS NULL OR p.id >= :first_id)
+       AND (:last_id IS NULL OR p.id <= :last_id)
+  GROUP BY p.id
+"""
 
 
 class Project(db.Model):
@@ -197,6 +224,18 @@ class Project(db.Model):
     tasks_mapped = db.Column(db.Integer, default=0, nullable=False)
     tasks_validated = db.Column(db.Integer, default=0, nullable=False)
     tasks_bad_imagery = db.Column(db.Integer, default=0, nullable=False)
+    # Maintained from task history through project_contributors
+    total_contributors = db.Column(
+        db.Integer, default=0, server_default="0", nullable=False
+    )
+    # Bumped on every task change so cached task grids can be invalidated. The geometry version is the task
+    # state version at which tasks were last added or removed (split/delete)
+    task_state_version = db.Column(
+        db.BigInteger, default=0, server_default="0", nullable=False
+    )
+    task_geometry_version = db.Column(
+        db.BigInteger, default=0, server_default="0", nullable=False
+    )
 
     # Mapped Objects
     tasks = db.relationship(
@@ -276,10 +315,13 @@ class Project(db.Model):
     def create(self):
         """Creates and saves the current model to the DB"""
         db.session.add(self)
+        db.session.flush()
+        EventService.publish(ProjectUpdated(self.id, created=True))
         db.session.commit()
 
     def save(self):
         """Save changes to db"""
+        EventService.publish(ProjectUpdated(self.id))
         db.session.commit()
 
     @staticmethod
@@ -350,6 +392,68 @@ class Project(db.Model):
 
         return new_proj
 
+    @staticmethod
+    def get_id_range() -> tuple:
+        """ Gets the lowest and highest project ids, (None, None) if there are no projects """
+        return db.session.query(func.min(Project.id), func.max(Project.id)).one()
+
+    @staticmethod
+    def refresh_task_counters(
+        first_id: int = None, last_id: int = None, dry_run: bool = False
+    ) -> list:
+        """
+        Recounts the tasks of the projects by status in a single scan, and updates the counters that drifted
+        :param first_id: Only refresh projects from this id, all projects if None
+        :param last_id: Only refresh projects up to this id, all projects if None
+        :param dry_run: Only report the counters that drifted, without updating them
+        :return: Drifted projects, as dicts of the project id and the (stored, counted) value of each counter
+        """
+        params = dict(
+            first_id=first_id,
+            last_id=last_id,
+            mapped=TaskStatus.MAPPED.value,
+            validated=TaskStatus.VALIDATED.value,
+            bad_imagery=TaskStatus.BADIMAGERY.value,
+        )
+        drifted = f"""
+            ({", ".join(f"p.{c}" for c in TASK_COUNTERS)})
+            IS DISTINCT FROM ({", ".join(f"c.{c}" for c in TASK_COUNTERS)})
+        """
+        if dry_run:
+            query = f"""
+                SELECT p.id AS project_id,
+                       {", ".join(f"p.{c} AS stored_{c}, c.{c}" for c in TASK_COUNTERS)}
+                  FROM projects p
+                  JOIN ({TASK_COUNTS}) c ON c.project_id = p.id
+                 WHERE {drifted}
+              ORDER BY p.id
+            """
+        else:
+            # The second reference to projects sees the rows as they were before the update
+            query = f"""
+                UPDATE projects p
+                   SET {", ".join(f"{c} = c.{c}" for c in TASK_COUNTERS)}
+                  FROM ({TASK_COUNTS}) c, projects stored
+                 WHERE c.project_id = p.id
+                   AND stored.id = p.id
+                   AND {drifted}
+             RETURNING p.id AS project_id,
+                       {", ".join(f"stored.{c} AS stored_{c}, c.{c}" for c in TASK_COUNTERS)}
+            """
+        rows = db.session.execute(text(query), params).fetchall()
+        drifted_projects = [
+            dict(
+                project_id=row["project_id"],
+                **{c: (row[f"stored_{c}"], row[c]) for c in TASK_COUNTERS},
+            )
+            for row in rows
+        ]
+        if not dry_run:
+            for project in drifted_projects:
+                EventService.publish(TaskStateChanged(project["project_id"]))
+            db.session.commit()
+        return sorted(drifted_projects, key=lambda project: project["project_id"])
+
     @staticmethod
     def get(project_id: int):
         """
@@ -498,13 +602,32 @@ class Project(db.Model):
         if not self.country:
             self.set_country_info()
 
+        EventService.publish(ProjectUpdated(self.id))
         db.session.commit()
 
     def delete(self):
         """Deletes the current model from the DB"""
         db.session.delete(self)
+        EventService.publish(ProjectUpdated(self.id, deleted=True))
         db.session.commit()
 
+    @staticmethod
+    def get_task_versions(project_id: int):
+        """
+        Gets the task state and task geometry versions of the project
+        :raises NotFound
+        :return: tuple of (task_state_version, task_geometry_version)
+        """
+        versions = (
+            db.session.query(Project.task_state_version, Project.task_geometry_version)
+            .filter(Project.id == project_id)
+            .one_or_none()
+        )
+        if versions is None:
+            raise NotFound()
+
+        return versions.task_state_version, versions.task_geometry_version
+
     @staticmethod
     def exists(project_id):
         query = Project.query.filter(Project.id == project_id).exists()
@@ -534,12 +657,14 @@ class Project(db.Model):
         if self.featured is True:
             raise ValueError("AlreadyFeatured- Project is already featured")
         self.featured = True
+        EventService.publish(ProjectUpdated(self.id))
         db.session.commit()
 
     def unset_as_featured(self):
         if self.featured is False:
             raise ValueError("NotFeatured- Project is not featured")
         self.featured = False
+        EventService.publish(ProjectUpdated(self.id))
         db.session.commit()
 
     def can_be_deleted(self) -> bool:
@@ -595,11 +720,7 @@ class Project(db.Model):
         stats_dto.total_time_spent = 0
 
         total_mapping_time = (
-            db.session.query(
-                func.sum(
-                    cast(func.to_timestamp(TaskHistory.action_text, "HH24:MI:SS"), Time)
-                )
-            )
+            db.session.query(func.sum(TaskHistory.lock_duration))
             .filter(
                 or_(
                     TaskHistory.action == "LOCKED_FOR_MAPPING",
@@ -618,7 +739,7 @@ class Project(db.Model):
         query = (
             TaskHistory.query.with_entities(
                 func.date_trunc("minute", TaskHistory.action_date).label("trn"),
-                func.max(TaskHistory.action_text).label("tm"),
+                func.max(TaskHistory.lock_duration).label("tm"),
             )
             .filter(TaskHistory.user_id == user_id)
             .filter(TaskHistory.project_id == self.id)
@@ -626,9 +747,7 @@ class Project(db.Model):
             .group_by("trn")
             .subquery()
         )
-        total_validation_time = db.session.query(
-            func.sum(cast(func.to_timestamp(query.c.tm, "HH24:MI:SS"), Time))
-        ).all()
+        total_validation_time = db.session.query(func.sum(query.c.tm)).all()
 
         for time in total_validation_time:
             total_validation_time = time[0]
@@ -638,182 +757,6 @@ class Project(db.Model):
 
         return stats_dto
 
-    def get_project_stats(self) -> ProjectStatsDTO:
-        """Create Project Stats model for postgis project object"""
-        project_stats = ProjectStatsDTO()
-        project_stats.project_id = self.id
-        project_area_sql = "select ST_Area(geometry, true)/1000000 as area from public.projects where id = :id"
-        project_area_result = db.engine.execute(text(project_area_sql), id=self.id)
-
-        project_stats.area = project_area_result.fetchone()["area"]
-        project_stats.total_mappers = (
-            db.session.query(User).filter(User.projects_mapped.any(self.id)).count()
-        )
-        project_stats.total_tasks = self.total_tasks
-        project_stats.total_comments = (
-            db.session.query(ProjectChat)
-            .filter(ProjectChat.project_id == self.id)
-            .count()
-        )
-        project_stats.percent_mapped = Project.calculate_tasks_percent(
-            "mapped",
-            self.total_tasks,
-            self.tasks_mapped,
-            self.tasks_validated,
-            self.tasks_bad_imagery,
-        )
-        project_stats.percent_validated = Project.calculate_tasks_percent(
-            "validated",
-            self.total_tasks,
-            self.tasks_mapped,
-            self.tasks_validated,
-            self.tasks_bad_imagery,
-        )
-        project_stats.percent_bad_imagery = Project.calculate_tasks_percent(
-            "bad_imagery",
-            self.total_tasks,
-            self.tasks_mapped,
-            self.tasks_validated,
-            self.tasks_bad_imagery,
-        )
-        centroid_geojson = db.session.scalar(self.centroid.ST_AsGeoJSON())
-        project_stats.aoi_centroid = geojson.loads(centroid_geojson)
-        project_stats.total_time_spent = 0
-        project_stats.total_mapping_time = 0
-        project_stats.total_validation_time = 0
-        project_stats.average_mapping_time = 0
-        project_stats.average_validation_time = 0
-
-        total_mapping_time, total_mapping_tasks = (
-            db.session.query(
-                func.sum(
-                    cast(func.to_timestamp(TaskHistory.action_text, "HH24:MI:SS"), Time)
-                ),
-                func.count(TaskHistory.action),
-            )
-            .filter(
-                or_(
-                    TaskHistory.action == "LOCKED_FOR_MAPPING",
-                    TaskHistory.action == "AUTO_UNLOCKED_FOR_MAPPING",
-                )
-            )
-            .filter(TaskHistory.project_id == self.id)
-            .one()
-        )
-
-        if total_mapping_tasks > 0:
-            total_mapping_time = total_mapping_time.total_seconds()
-            project_stats.total_mapping_time = total_mapping_time
-            project_stats.average_mapping_time = (
-                total_mapping_time / total_mapping_tasks
-            )
-            project_stats.total_time_spent += total_mapping_time
-
-        total_validation_time, total_validation_tasks = (
-            db.session.query(
-                func.sum(
-                    cast(func.to_timestamp(TaskHistory.action_text, "HH24:MI:SS"), Time)
-                ),
-                func.count(TaskHistory.action),
-            )
-            .filter(
-                or_(
-                    TaskHistory.action == "LOCKED_FOR_VALIDATION",
-                    TaskHistory.action == "AUTO_UNLOCKED_FOR_VALIDATION",
-                )
-            )
-            .filter(TaskHistory.project_id == self.id)
-            .one()
-        )
-
-        if total_validation_tasks > 0:
-            total_validation_time = total_validation_time.total_seconds()
-            project_stats.total_validation_time = total_validation_time
-            project_stats.average_validation_time = (
-                total_validation_time / total_validation_tasks
-            )
-            project_stats.total_time_spent += total_validation_time
-
-        actions = []
-        if project_stats.average_mapping_time <= 0:
-            actions.append(TaskStatus.LOCKED_FOR_MAPPING.name)
-        if project_stats.average_validation_time <= 0:
-            actions.append(TaskStatus.LOCKED_FOR_VALIDATION.name)
-
-        zoom_levels = []
-        # Check that averages are non-zero.
-        if len(actions) != 0:
-            zoom_levels = (
-                Task.query.with_entities(Task.zoom.distinct())
-                .filter(Task.project_id == self.id)
-                .all()
-            )
-            zoom_levels = [z[0] for z in zoom_levels]
-
-        # Validate project has arbitrary tasks.
-        is_square = True
-        if None in zoom_levels:
-            is_square = False
-        sq = (
-            TaskHistory.query.with_entities(
-                Task.zoom,
-                TaskHistory.action,
-                (
-                    cast(func.to_timestamp(TaskHistory.action_text, "HH24:MI:SS"), Time)
-                ).label("ts"),
-            )
-            .filter(Task.is_square == is_square)
-            .filter(TaskHistory.project_id == Task.project_id)
-            .filter(TaskHistory.task_id == Task.id)
-            .filter(TaskHistory.action.in_(actions))
-        )
-        if is_square is True:
-            sq = sq.filter(Task.zoom.in_(zoom_levels))
-
-        sq = sq.subquery()
-
-        nz = (
-            db.session.query(sq.c.zoom, sq.c.action, sq.c.ts)
-            .filter(sq.c.ts > datetime.time(0))
-            .limit(10000)
-            .subquery()
-        )
-
-        if project_stats.average_mapping_time <= 0:
-            mapped_avg = (
-                db.session.query(nz.c.zoom, (func.avg(nz.c.ts)).label("avg"))
-                .filter(nz.c.action == TaskStatus.LOCKED_FOR_MAPPING.name)
-                .group_by(nz.c.zoom)
-                .all()
-            )
-            mapping_time = sum([t.avg.total_seconds() for t in mapped_avg]) / len(
-                mapped_avg
-            )
-            project_stats.average_mapping_time = mapping_time
-
-        if project_stats.average_validation_time <= 0:
-            val_avg = (
-                db.session.query(nz.c.zoom, (func.avg(nz.c.ts)).label("avg"))
-                .filter(nz.c.action == TaskStatus.LOCKED_FOR_VALIDATION.name)
-                .group_by(nz.c.zoom)
-                .all()
-            )
-            validation_time = sum([t.avg.total_seconds() for t in val_avg]) / len(
-                val_avg
-            )
-            project_stats.average_validation_time = validation_time
-
-        time_to_finish_mapping = (
-            self.total_tasks
-            - (self.tasks_mapped + self.tasks_bad_imagery + self.tasks_validated)
-        ) * project_stats.average_mapping_time
-        project_stats.time_to_finish_mapping = time_to_finish_mapping
-        project_stats.time_to_finish_validating = (
-            self.total_tasks - (self.tasks_validated + self.tasks_bad_imagery)
-        ) * project_stats.average_validation_time
-
-        return project_stats
-
     def get_project_summary(self, preferred_locale) -> ProjectSummary:
         """Create Project Summary model for postgis project object"""
         summary = ProjectSummary()
@@ -937,18 +880,14 @@ class Project(db.Model):
 
     @staticmethod
     def get_project_total_contributions(project_id: int) -> int:
-
-        project_contributors_count = (
-            TaskHistory.query.with_entities(TaskHistory.user_id)
-            .filter(
-                TaskHistory.project_id == project_id, TaskHistory.action != "COMMENT"
-            )
-            .distinct(TaskHistory.user_id)
-            .count()
+        """Gets the number of users that contributed to the project, excluding comments"""
+        return (
+            db.session.query(Project.total_contributors)
+            .filter(Project.id == project_id)
+            .scalar()
+            or 0
         )
 
-        return project_contributors_count
-
     def get_aoi_geometry_as_geojson(self):
         """Helper which returns the AOI geometry as a geojson object"""
         aoi_geojson = db.engine.execute(self.geometry.ST_AsGeoJSON()).scalar()
@@ -969,7 +908,7 @@ class Project(db.Model):
         return project_teams
 
     @staticmethod
-    @cached(active_mappers_cache)
+    @active_mappers_cache.cached(partition_by_first_arg=True)
     def get_active_mappers(project_id) -> int:
         """Get count of Locked tasks as a proxy for users who are currently active on the project"""
 
@@ -987,6 +926,33 @@ class Project(db.Model):
             .count()
         )
 
+    @staticmethod
+    def get_active_mappers_for_projects(project_ids: List[int]) -> Dict[int, int]:
+        """Batch version of get_active_mappers, returns the active mappers count keyed by project id"""
+        if len(project_ids) == 0:
+            return {}
+
+        query = (
+            Task.query.with_entities(
+                Task.project_id, func.count(distinct(Task.locked_by)).label("total")
+            )
+            .filter(
+                Task.task_status.in_(
+                    (
+                        TaskStatus.LOCKED_FOR_MAPPING.value,
+                        TaskStatus.LOCKED_FOR_VALIDATION.value,
+                    )
+                )
+            )
+            .filter(Task.project_id.in_(project_ids))
+            .group_by(Task.project_id)
+            .all()
+        )
+        active_mappers = {project_id: 0 for project_id in project_ids}
+        active_mappers.update({p.project_id: p.total for p in query})
+
+        return active_mappers
+
     def _get_project_and_base_dto(self):
         """Populates a project DTO with properties common to all roles"""
         base_dto = ProjectDTO()
@@ -1181,6 +1147,7 @@ class Project(db.Model):
         self.interests = []
         objs = [Interest.get_by_id(i) for i in interests_ids]
         self.interests.extend(objs)
+        EventService.publish(ProjectUpdated(self.id))
         db.session.commit()
 
     @staticmethod
@@ -1200,6 +1167,29 @@ class Project(db.Model):
 
         return campaign_list
 
+    @staticmethod
+    def get_campaigns_for_projects(project_ids: List[int]) -> Dict[int, List]:
+        """Batch version of get_project_campaigns, returns the campaign DTOs keyed by project id"""
+        campaigns = {project_id: [] for project_id in project_ids}
+        if len(project_ids) == 0:
+            return campaigns
+
+        query = (
+            db.session.query(campaign_projects.c.project_id, Campaign.id, Campaign.name)
+            .join(Campaign, Campaign.id == campaign_projects.c.campaign_id)
+            .filter(campaign_projects.c.project_id.in_(project_ids))
+            .order_by(campaign_projects.c.project_id, Campaign.id)
+            .all()
+        )
+        for project_id, campaign_id, campaign_name in query:
+            campaign_dto = CampaignDTO()
+            campaign_dto.id = campaign_id
+            campaign_dto.name = campaign_name
+
+            campaigns[project_id].append(campaign_dto)
+
+        return campaigns
+
 
 # Add index on project geometry
 db.Index("idx_geometry", Project.geometry, postgresql_using="gist")
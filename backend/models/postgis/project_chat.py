@@ -2,6 +2,7 @@ import bleach
 from markdown import markdown
 from flask import current_app
 from backend import db
+from backend.models.postgis.project_stats import ProjectStats
 from backend.models.postgis.user import User
 from backend.models.postgis.utils import timestamp
 from backend.models.dtos.message_dto import ChatMessageDTO, ProjectChatDTO, Pagination
@@ -60,6 +61,7 @@ class ProjectChat(db.Model):
         new_message.message = clean_message
 
         db.session.add(new_message)
+        ProjectStats.record_comment(dto.project_id)
         return new_message
 
     @staticmethod
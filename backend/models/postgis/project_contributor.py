@@ -0,0 +1,106 @@
+from sqlalchemy import text
+from backend import db
+from backend.models.postgis.utils import timestamp
+
+
+class ProjectContributor(db.Model):
+    """
+    Aggregate of the users that contributed to a project, maintained from task history so contributor counts
+    don't need a DISTINCT scan of task_history. The per project count is kept on projects.total_contributors
+    """
+
+    __tablename__ = "project_contributors"
+
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey("projects.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    user_id = db.Column(
+        db.BigInteger,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
+    )
+    first_action_date = db.Column(db.DateTime, nullable=False, default=timestamp)
+    last_action_date = db.Column(db.DateTime, nullable=False, default=timestamp)
+
+    @staticmethod
+    def record_contribution(project_id: int, user_id: int, action_date=None):
+        """
+        Records a contribution of the user to the project, incrementing the project's contributor count the
+        first time the user contributes. Runs in the caller's transaction and doesn't commit
+        """
+        db.session.execute(
+            text(
+                """
+                WITH contributor AS (
+                    INSERT INTO project_contributors AS pc
+                                (project_id, user_id, first_action_date, last_action_date)
+                         VALUES (:project_id, :user_id, :action_date, :action_date)
+                    ON CONFLICT (project_id, user_id)
+                      DO UPDATE SET last_action_date = GREATEST(pc.last_action_date, EXCLUDED.last_action_date)
+                      RETURNING (xmax = 0) AS inserted
+                )
+                UPDATE projects
+                   SET total_contributors = total_contributors + 1
+                  FROM contributor
+                 WHERE projects.id = :project_id
+                   AND contributor.inserted
+                """
+            ),
+            dict(
+                project_id=project_id,
+                user_id=user_id,
+                action_date=action_date or timestamp(),
+            ),
+        )
+
+    @staticmethod
+    def rebuild(project_id: int = None) -> int:
+        """
+        Rebuilds the contributors aggregate and the contributor counts from task history
+        :param project_id: Only rebuild this project, all projects if None
+        :return: Number of projects whose contributor count was updated
+        """
+        params = dict(project_id=project_id)
+        db.session.execute(
+            text(
+                """
+                DELETE FROM project_contributors
+                 WHERE (:project_id IS NULL OR project_id = :project_id)
+                """
+            ),
+            params,
+        )
+        db.session.execute(
+            text(
+                """
+                INSERT INTO project_contributors (project_id, user_id, first_action_date, last_action_date)
+                     SELECT project_id, user_id, MIN(action_date), MAX(action_date)
+                       FROM task_history
+                      WHERE action != 'COMMENT'
+                        AND (:project_id IS NULL OR project_id = :project_id)
+                   GROUP BY project_id, user_id
+                """
+            ),
+            params,
+        )
+        result = db.session.execute(
+            text(
+                """
+                UPDATE projects p
+                   SET total_contributors = COALESCE(c.total, 0)
+                  FROM projects pr
+                  LEFT JOIN (SELECT project_id, COUNT(*) AS total
+                               FROM project_contributors
+                           GROUP BY project_id) c ON c.project_id = pr.id
+                 WHERE p.id = pr.id
+                   AND (:project_id IS NULL OR p.id = :project_id)
+                   AND p.total_contributors IS DISTINCT FROM COALESCE(c.total, 0)
+                """
+            ),
+            params,
+        )
+        db.session.commit()
+        return result.rowcount
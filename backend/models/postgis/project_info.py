@@ -1,6 +1,6 @@
 from flask import current_app
 from sqlalchemy.dialects.postgresql import TSVECTOR
-from typing import List
+from typing import Dict, List, Tuple
 from backend import db
 from backend.models.dtos.project_dto import ProjectInfoDTO
 
@@ -91,6 +91,49 @@ class ProjectInfo(db.Model):
         # Pass thru default_locale in case of partial translation
         return project_info.get_dto(default_locale)
 
+    @staticmethod
+    def get_dtos_for_locale(
+        projects: List[Tuple[int, str]], locale: str
+    ) -> Dict[int, ProjectInfoDTO]:
+        """
+        Batch version of get_dto_for_locale, loads the project info of all projects in a single query
+        :param projects: List of (project_id, default_locale) tuples
+        :param locale: locale requested by user
+        :raises: ValueError if no info found for Default Locale
+        """
+        if len(projects) == 0:
+            return {}
+
+        locales = {locale} | {default_locale for _, default_locale in projects}
+        project_infos = ProjectInfo.query.filter(
+            ProjectInfo.project_id.in_([project_id for project_id, _ in projects]),
+            ProjectInfo.locale.in_(locales),
+        ).all()
+        infos_by_key = {(i.project_id, i.locale): i for i in project_infos}
+
+        project_info_dtos = {}
+        for project_id, default_locale in projects:
+            project_info = infos_by_key.get((project_id, locale))
+            default_info = infos_by_key.get((project_id, default_locale))
+
+            if project_info is None or locale == default_locale:
+                # Either no translation or the default locale, don't worry about empty translations
+                project_info_dtos[project_id] = default_info.get_dto()
+                continue
+
+            if default_info is None:
+                error_message = (
+                    f"BAD DATA: no info for project {project_id}, "
+                    f"locale: {locale}, default {default_locale}"
+                )
+                current_app.logger.critical(error_message)
+                raise ValueError(error_message)
+
+            # Pass thru default_locale in case of partial translation
+            project_info_dtos[project_id] = project_info.get_dto(default_info)
+
+        return project_info_dtos
+
     def get_dto(self, default_locale=ProjectInfoDTO()) -> ProjectInfoDTO:
         """
         Get DTO for current ProjectInfo
@@ -0,0 +1,291 @@
+import datetime
+
+import geojson
+from sqlalchemy import text
+from backend import db
+from backend.models.dtos.project_dto import ProjectStatsDTO
+from backend.models.postgis.utils import NotFound, timestamp
+
+MAPPING_ACTIONS = ("LOCKED_FOR_MAPPING", "AUTO_UNLOCKED_FOR_MAPPING")
+VALIDATION_ACTIONS = ("LOCKED_FOR_VALIDATION", "AUTO_UNLOCKED_FOR_VALIDATION")
+
+
+class ProjectStats(db.Model):
+    """
+    Precomputed statistics of a project, so project stats are a single row read shared by all workers.
+    Counters are updated incrementally in the transactions that write lock durations, mapped projects and
+    chat messages, and are rebuilt from the source tables by refresh
+    """
+
+    __tablename__ = "project_stats"
+
+    project_id = db.Column(
+        db.Integer,
+        db.ForeignKey("projects.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    area = db.Column(db.Float)
+    total_mappers = db.Column(db.Integer, nullable=False, default=0)
+    total_comments = db.Column(db.Integer, nullable=False, default=0)
+    # Lock durations in seconds, and the number of finished locks they were summed from
+    total_mapping_time = db.Column(db.Float, nullable=False, default=0)
+    total_mapping_locks = db.Column(db.Integer, nullable=False, default=0)
+    total_validation_time = db.Column(db.Float, nullable=False, default=0)
+    total_validation_locks = db.Column(db.Integer, nullable=False, default=0)
+    # Averages estimated from tasks of the same size on other projects, used until the project has its own
+    # lock durations. NULL until first needed
+    estimated_mapping_time = db.Column(db.Float)
+    estimated_validation_time = db.Column(db.Float)
+    last_updated = db.Column(db.DateTime, nullable=False, default=timestamp)
+
+    @staticmethod
+    def record_lock_duration(
+        project_id: int, action: str, duration: datetime.timedelta, locks: int = 1
+    ):
+        """
+        Adds finished locks to the project's mapping or validation time. Runs in the caller's transaction
+        and doesn't commit
+        :param action: Task history action of the lock, locked or auto unlocked for mapping or validation
+        :param duration: Duration of each of the locks
+        :param locks: Number of locks of that duration
+        """
+        lock_type = "mapping" if action in MAPPING_ACTIONS else "validation"
+        db.session.execute(
+            text(
+                f"""
+                UPDATE project_stats
+                   SET total_{lock_type}_time = total_{lock_type}_time + :seconds,
+                       total_{lock_type}_locks = total_{lock_type}_locks + :locks,
+                       last_updated = :now
+                 WHERE project_id = :project_id
+                """
+            ),
+            dict(
+                project_id=project_id,
+                seconds=duration.total_seconds() * locks,
+                locks=locks,
+                now=timestamp(),
+            ),
+        )
+
+    @staticmethod
+    def record_mapper(project_id: int):
+        """ Counts a new mapper of the project. Runs in the caller's transaction and doesn't commit """
+        ProjectStats._increment(project_id, "total_mappers")
+
+    @staticmethod
+    def record_comment(project_id: int):
+        """ Counts a new chat message on the project. Runs in the caller's transaction and doesn't commit """
+        ProjectStats._increment(project_id, "total_comments")
+
+    @staticmethod
+    def _increment(project_id: int, counter: str):
+        db.session.execute(
+            text(
+                f"""
+                UPDATE project_stats
+                   SET {counter} = {counter} + 1,
+                       last_updated = :now
+                 WHERE project_id = :project_id
+                """
+            ),
+            dict(project_id=project_id, now=timestamp()),
+        )
+
+    @staticmethod
+    def refresh(project_id: int = None) -> int:
+        """
+        Rebuilds the project statistics from the source tables
+        :param project_id: Only refresh this project, all projects if None
+        :return: Number of projects refreshed
+        """
+        result = db.session.execute(
+            text(
+                """
+                INSERT INTO project_stats
+                            (project_id, area, total_mappers, total_comments,
+                             total_mapping_time, total_mapping_locks,
+                             total_validation_time, total_validation_locks, last_updated)
+                     SELECT p.id,
+                            ST_Area(p.geometry, true) / 1000000,
+                            COALESCE(m.total, 0),
+                            COALESCE(c.total, 0),
+                            COALESCE(EXTRACT(EPOCH FROM l.mapping_time), 0),
+                            COALESCE(l.mapping_locks, 0),
+                            COALESCE(EXTRACT(EPOCH FROM l.validation_time), 0),
+                            COALESCE(l.validation_locks, 0),
+                            :now
+                       FROM projects p
+                       LEFT JOIN (SELECT project_id, COUNT(*) AS total
+                                    FROM (SELECT UNNEST(projects_mapped) AS project_id FROM users) u
+                                   WHERE (:project_id IS NULL OR project_id = :project_id)
+                                GROUP BY project_id) m ON m.project_id = p.id
+                       LEFT JOIN (SELECT project_id, COUNT(*) AS total
+                                    FROM project_chat
+                                   WHERE (:project_id IS NULL OR project_id = :project_id)
+                                GROUP BY project_id) c ON c.project_id = p.id
+                       LEFT JOIN (SELECT project_id,
+                                         SUM(lock_duration) FILTER (WHERE action = ANY(:mapping)) AS mapping_time,
+                                         COUNT(*) FILTER (WHERE action = ANY(:mapping)) AS mapping_locks,
+                                         SUM(lock_duration) FILTER (WHERE action = ANY(:validation))
+                                             AS validation_time,
+                                         COUNT(*) FILTER (WHERE action = ANY(:validation)) AS validation_locks
+                                    FROM task_history
+                                   WHERE lock_duration IS NOT NULL
+                                     AND (:project_id IS NULL OR project_id = :project_id)
+                                GROUP BY project_id) l ON l.project_id = p.id
+                      WHERE (:project_id IS NULL OR p.id = :project_id)
+                ON CONFLICT (project_id)
+                  DO UPDATE SET area = EXCLUDED.area,
+                                total_mappers = EXCLUDED.total_mappers,
+                                total_comments = EXCLUDED.total_comments,
+                                total_mapping_time = EXCLUDED.total_mapping_time,
+                                total_mapping_locks = EXCLUDED.total_mapping_locks,
+                                total_validation_time = EXCLUDED.total_validation_time,
+                                total_validation_locks = EXCLUDED.total_validation_locks,
+                                estimated_mapping_time = NULL,
+                                estimated_validation_time = NULL,
+                                last_updated = EXCLUDED.last_updated
+                """
+            ),
+            dict(
+                project_id=project_id,
+                mapping=list(MAPPING_ACTIONS),
+                validation=list(VALIDATION_ACTIONS),
+                now=timestamp(),
+            ),
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def estimate_lock_times(project_id: int):
+        """
+        Estimates the average mapping and validation time of a project that has no lock durations yet, from
+        the lock durations of tasks of the same zoom levels on all projects, and stores them on its stats
+        """
+        db.session.execute(
+            text(
+                """
+                WITH project_zooms AS (
+                    SELECT DISTINCT zoom FROM tasks WHERE project_id = :project_id
+                ), project_shape AS (
+                    SELECT COALESCE(BOOL_AND(zoom IS NOT NULL), true) AS is_square FROM project_zooms
+                ), samples AS (
+                    SELECT t.zoom, th.action, th.lock_duration
+                      FROM task_history th
+                      JOIN tasks t ON t.project_id = th.project_id AND t.id = th.task_id
+                     CROSS JOIN project_shape s
+                     WHERE th.action IN ('LOCKED_FOR_MAPPING', 'LOCKED_FOR_VALIDATION')
+                       AND th.lock_duration > INTERVAL '0'
+                       AND t.is_square = s.is_square
+                       AND (NOT s.is_square OR t.zoom IN (SELECT zoom FROM project_zooms))
+                     LIMIT 10000
+                ), zoom_averages AS (
+                    SELECT zoom, action, AVG(EXTRACT(EPOCH FROM lock_duration)) AS average
+                      FROM samples
+                  GROUP BY zoom, action
+                )
+                UPDATE project_stats
+                   SET estimated_mapping_time = COALESCE(e.mapping, 0),
+                       estimated_validation_time = COALESCE(e.validation, 0)
+                  FROM (SELECT AVG(average) FILTER (WHERE action = 'LOCKED_FOR_MAPPING') AS mapping,
+                               AVG(average) FILTER (WHERE action = 'LOCKED_FOR_VALIDATION') AS validation
+                          FROM zoom_averages) e
+                 WHERE project_id = :project_id
+                """
+            ),
+            dict(project_id=project_id),
+        )
+        db.session.commit()
+
+    @staticmethod
+    def get_project_stats_row(project_id: int):
+        """ Gets the precomputed stats of the project along with its task counters """
+        return db.session.execute(
+            text(
+                """
+                SELECT ps.*,
+                       p.total_tasks,
+                       p.tasks_mapped,
+                       p.tasks_validated,
+                       p.tasks_bad_imagery,
+                       ST_AsGeoJSON(p.centroid) AS centroid
+                  FROM projects p
+                  LEFT JOIN project_stats ps ON ps.project_id = p.id
+                 WHERE p.id = :project_id
+                """
+            ),
+            dict(project_id=project_id),
+        ).fetchone()
+
+    @staticmethod
+    def get_project_stats_dto(project_id: int) -> ProjectStatsDTO:
+        """
+        Creates the Project Stats DTO from the precomputed stats, refreshing them the first time the project's
+        stats are read
+        :raises NotFound: If the project doesn't exist
+        """
+        from backend.models.postgis.project import Project
+
+        row = ProjectStats.get_project_stats_row(project_id)
+        if row is None:
+            raise NotFound()
+
+        if row.project_id is None:
+            ProjectStats.refresh(project_id)
+            row = ProjectStats.get_project_stats_row(project_id)
+
+        average_mapping_time = 0
+        if row.total_mapping_locks > 0:
+            average_mapping_time = row.total_mapping_time / row.total_mapping_locks
+        average_validation_time = 0
+        if row.total_validation_locks > 0:
+            average_validation_time = (
+                row.total_validation_time / row.total_validation_locks
+            )
+
+        needs_estimate = average_mapping_time <= 0 or average_validation_time <= 0
+        if needs_estimate and row.estimated_mapping_time is None:
+            ProjectStats.estimate_lock_times(project_id)
+            row = ProjectStats.get_project_stats_row(project_id)
+        if average_mapping_time <= 0:
+            average_mapping_time = row.estimated_mapping_time
+        if average_validation_time <= 0:
+            average_validation_time = row.estimated_validation_time
+
+        project_stats = ProjectStatsDTO()
+        project_stats.project_id = project_id
+        project_stats.area = row.area
+        project_stats.total_mappers = row.total_mappers
+        project_stats.total_tasks = row.total_tasks
+        project_stats.total_comments = row.total_comments
+        project_stats.total_mapping_time = row.total_mapping_time
+        project_stats.total_validation_time = row.total_validation_time
+        project_stats.total_time_spent = (
+            row.total_mapping_time + row.total_validation_time
+        )
+        project_stats.average_mapping_time = average_mapping_time
+        project_stats.average_validation_time = average_validation_time
+        for status in ["mapped", "validated", "bad_imagery"]:
+            setattr(
+                project_stats,
+                f"percent_{status}",
+                Project.calculate_tasks_percent(
+                    status,
+                    row.total_tasks,
+                    row.tasks_mapped,
+                    row.tasks_validated,
+                    row.tasks_bad_imagery,
+                ),
+            )
+        project_stats.aoi_centroid = geojson.loads(row.centroid)
+        project_stats.time_to_finish_mapping = (
+            row.total_tasks
+            - (row.tasks_mapped + row.tasks_bad_imagery + row.tasks_validated)
+        ) * average_mapping_time
+        project_stats.time_to_finish_validating = (
+            row.total_tasks - (row.tasks_validated + row.tasks_bad_imagery)
+        ) * average_validation_time
+
+        return project_stats
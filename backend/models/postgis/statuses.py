@@ -158,3 +158,11 @@ class OrganisationType(Enum):
     FREE = 1
     DISCOUNTED = 2
     FULL_FEE = 3
+
+
+class EmailStatus(Enum):
+    """ Describes the delivery status of an email of the outbox """
+
+    PENDING = 0
+    SENT = 1
+    FAILED = 2  # Permanently refused or out of attempts
@@ -2,10 +2,11 @@ import bleach
 import datetime
 import geojson
 import json
+from collections import Counter
 from enum import Enum
 from flask import current_app
-from sqlalchemy.types import Float, Text
-from sqlalchemy import desc, cast, func, distinct
+from sqlalchemy.types import Float, Text, JSON
+from sqlalchemy import desc, cast, func, distinct, text, case
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 from sqlalchemy.orm.session import make_transient
 from geoalchemy2 import Geometry
@@ -31,6 +32,11 @@ from backend.models.postgis.utils import (
     NotFound,
 )
 from backend.models.postgis.task_annotation import TaskAnnotation
+from backend.models.postgis.project_contributor import ProjectContributor
+from backend.models.postgis.user_task_activity import UserTaskActivity
+from backend.models.postgis.project_stats import ProjectStats
+from backend.services.event_service import EventService, TaskStateChanged
+from backend.services.event_stream_service import EventStreamService, project_channel
 
 
 class TaskAction(Enum):
@@ -187,6 +193,9 @@ class TaskHistory(db.Model):
     task_id = db.Column(db.Integer, nullable=False)
     action = db.Column(db.String, nullable=False)
     action_text = db.Column(db.String)
+    # Time the task was locked for, set on lock and auto unlock actions. action_text keeps the HH:MM:SS text
+    # for the API, but it wraps past 24h and can't be aggregated without parsing it
+    lock_duration = db.Column(db.Interval)
     action_date = db.Column(db.DateTime, nullable=False, default=timestamp)
     user_id = db.Column(
         db.BigInteger,
@@ -207,6 +216,22 @@ class TaskHistory(db.Model):
         ),
         db.Index("idx_task_history_composite", "task_id", "project_id"),
         db.Index("idx_task_history_project_id_user_id", "user_id", "project_id"),
+        # Time spent stats sum lock durations per project and action
+        db.Index(
+            "idx_task_history_lock_duration",
+            "project_id",
+            "action",
+            "lock_duration",
+            postgresql_where=db.text("lock_duration IS NOT NULL"),
+        ),
+        # Lock expiry index, only holds locks that are still open so the scheduler can find expired ones cheaply
+        db.Index(
+            "idx_task_history_open_locks",
+            "action_date",
+            postgresql_where=db.text(
+                "action_text IS NULL AND action IN ('LOCKED_FOR_MAPPING', 'LOCKED_FOR_VALIDATION')"
+            ),
+        ),
         {},
     )
 
@@ -288,6 +313,10 @@ class TaskHistory(db.Model):
         last_locked.action_text = (
             (datetime.datetime.min + duration_task_locked).time().isoformat()
         )
+        last_locked.lock_duration = duration_task_locked
+        ProjectStats.record_lock_duration(
+            project_id, last_locked.action, duration_task_locked
+        )
         db.session.commit()
 
     @staticmethod
@@ -312,42 +341,29 @@ class TaskHistory(db.Model):
         dupe.delete()
 
     @staticmethod
-    def update_expired_and_locked_actions(
-        project_id: int, task_id: int, expiry_date: datetime, action_text: str
-    ):
+    def get_projects_with_expired_locks(expiry_date: datetime) -> List[int]:
         """
-        Sets auto unlock state to all not finished actions, that are older then the expiry date.
-        Action is considered as a not finished, when it is in locked state and doesn't have action text
-        :param project_id: Project ID in scope
-        :param task_id: Task in scope
-        :param expiry_date: Action created before this date is treated as expired
-        :param action_text: Text which will be set for all changed actions
-        :return:
+        Gets the IDs of all projects holding a lock that was taken before the expiry date
+        :param expiry_date: Lock taken before this date is treated as expired
+        :return: List of project IDs
         """
-        all_expired = TaskHistory.query.filter(
-            TaskHistory.task_id == task_id,
-            TaskHistory.project_id == project_id,
-            TaskHistory.action_text.is_(None),
-            TaskHistory.action.in_(
-                [
-                    TaskAction.LOCKED_FOR_VALIDATION.name,
-                    TaskAction.LOCKED_FOR_MAPPING.name,
-                ]
-            ),
-            TaskHistory.action_date <= expiry_date,
-        ).all()
-
-        for task_history in all_expired:
-            unlock_action = (
-                TaskAction.AUTO_UNLOCKED_FOR_MAPPING
-                if task_history.action == "LOCKED_FOR_MAPPING"
-                else TaskAction.AUTO_UNLOCKED_FOR_VALIDATION
+        projects = (
+            db.session.query(TaskHistory.project_id)
+            .filter(
+                TaskHistory.action_text.is_(None),
+                TaskHistory.action.in_(
+                    [
+                        TaskAction.LOCKED_FOR_VALIDATION.name,
+                        TaskAction.LOCKED_FOR_MAPPING.name,
+                    ]
+                ),
+                TaskHistory.action_date <= expiry_date,
             )
+            .distinct()
+            .all()
+        )
 
-            task_history.set_auto_unlock_action(unlock_action)
-            task_history.action_text = action_text
-
-        db.session.commit()
+        return [project.project_id for project in projects]
 
     @staticmethod
     def get_all_comments(project_id: int) -> ProjectCommentsDTO:
@@ -506,6 +522,8 @@ class Task(db.Model):
     validated_by = db.Column(
         db.BigInteger, db.ForeignKey("users.id", name="fk_users_validator"), index=True
     )
+    # Task state version of the project when the task last changed
+    state_version = db.Column(db.BigInteger, default=0, server_default="0")
 
     # Mapped objects
     task_history = db.relationship(
@@ -515,20 +533,78 @@ class Task(db.Model):
     lock_holder = db.relationship(User, foreign_keys=[locked_by])
     mapper = db.relationship(User, foreign_keys=[mapped_by])
 
+    __table_args__ = (
+        db.Index("idx_tasks_project_id_state_version", "project_id", "state_version"),
+        # Only holds locked tasks, so mappers online are counted without scanning all the tasks
+        db.Index(
+            "idx_tasks_locked_by",
+            "locked_by",
+            postgresql_where=db.text("locked_by IS NOT NULL"),
+        ),
+        {},
+    )
+
     def create(self):
         """Creates and saves the current model to the DB"""
         db.session.add(self)
+        self.state_version = Task.bump_task_versions(
+            self.project_id, geometry_changed=True
+        )
+        EventService.publish(TaskStateChanged(self.project_id, self.id))
         db.session.commit()
 
     def update(self):
         """Updates the DB with the current state of the Task"""
+        self.state_version = Task.bump_task_versions(self.project_id, task=self)
+        EventService.publish(TaskStateChanged(self.project_id, self.id))
         db.session.commit()
 
     def delete(self):
         """Deletes the current model from the DB"""
         db.session.delete(self)
+        Task.bump_task_versions(self.project_id, geometry_changed=True)
+        EventService.publish(TaskStateChanged(self.project_id, self.id))
         db.session.commit()
 
+    @staticmethod
+    def bump_task_versions(
+        project_id: int, geometry_changed: bool = False, task=None
+    ) -> int:
+        """
+        Increments the task state version of the project so cached task grids are invalidated. When tasks were
+        added or removed the task geometry version is moved to the new state version too.
+        Committed along with the task change, which is pushed to the event streams of the project: with the
+        state of the task if a single task changed, otherwise clients fetch the changes since their cursor.
+        :return: The new task state version, to be stored on the changed tasks
+        """
+        geometry_version = "task_geometry_version"
+        if geometry_changed:
+            geometry_version = "task_state_version + 1"
+        task_state_version = db.session.execute(
+            text(
+                f"""
+                UPDATE projects
+                   SET task_state_version = task_state_version + 1,
+                       task_geometry_version = {geometry_version}
+                 WHERE id = :project_id
+             RETURNING task_state_version
+                """
+            ),
+            dict(project_id=project_id),
+        ).scalar()
+
+        changes = dict(cursor=task_state_version, refetch=geometry_changed)
+        if task is not None:
+            changes["tasks"] = [
+                dict(
+                    taskId=task.id,
+                    taskStatus=TaskStatus(task.task_status).name,
+                    lockedBy=task.locked_by,
+                )
+            ]
+        EventStreamService.publish(project_channel(project_id), "tasks", changes)
+        return task_state_version
+
     @classmethod
     def from_geojson_feature(cls, task_id, task_feature):
         """
@@ -601,46 +677,97 @@ class Task(db.Model):
 
     @staticmethod
     def auto_unlock_tasks(project_id: int):
-        """Unlock all tasks locked for longer than the auto-unlock delta"""
+        """
+        Unlock all tasks locked for longer than the auto-unlock delta.
+        History rows and task locks are rewritten with set based updates, in a single transaction, rather than
+        task by task
+        """
         expiry_delta = Task.auto_unlock_delta()
         lock_duration = (datetime.datetime.min + expiry_delta).time().isoformat()
         expiry_date = datetime.datetime.utcnow() - expiry_delta
 
-        old_tasks = (
-            db.session.query(Task.id)
-            .filter(Task.id == TaskHistory.task_id)
-            .filter(Task.project_id == TaskHistory.project_id)
-            .filter(Task.task_status.in_([1, 3]))
-            .filter(
-                TaskHistory.action.in_(["LOCKED_FOR_VALIDATION", "LOCKED_FOR_MAPPING"])
-            )
-            .filter(TaskHistory.action_text.is_(None))
-            .filter(Task.project_id == project_id)
-            .filter(TaskHistory.action_date <= str(expiry_date))
+        # Mark the expired locks of all still locked tasks as auto unlocked
+        expired_locks_sql = """
+            UPDATE task_history th
+               SET action = CASE th.action
+                                WHEN 'LOCKED_FOR_MAPPING' THEN 'AUTO_UNLOCKED_FOR_MAPPING'
+                                ELSE 'AUTO_UNLOCKED_FOR_VALIDATION'
+                            END,
+                   action_text = :lock_duration,
+                   lock_duration = :lock_interval
+              FROM tasks t
+             WHERE t.project_id = :project_id
+               AND t.task_status IN (:locked_for_mapping, :locked_for_validation)
+               AND th.project_id = t.project_id
+               AND th.task_id = t.id
+               AND th.action IN ('LOCKED_FOR_MAPPING', 'LOCKED_FOR_VALIDATION')
+               AND th.action_text IS NULL
+               AND th.action_date <= :expiry_date
+         RETURNING th.task_id, th.action
+        """
+        unlocked = db.session.execute(
+            text(expired_locks_sql),
+            dict(
+                project_id=project_id,
+                lock_duration=lock_duration,
+                lock_interval=expiry_delta,
+                expiry_date=expiry_date,
+                locked_for_mapping=TaskStatus.LOCKED_FOR_MAPPING.value,
+                locked_for_validation=TaskStatus.LOCKED_FOR_VALIDATION.value,
+            ),
         )
+        unlocked = unlocked.fetchall()
+        task_ids = list({row.task_id for row in unlocked})
 
-        if old_tasks.count() == 0:
+        if len(task_ids) == 0:
             # no tasks older than the delta found, return without further processing
             return
 
-        for old_task in old_tasks:
-            task = Task.get(old_task[0], project_id)
-            task.auto_unlock_expired_tasks(expiry_date, lock_duration)
+        for action, locks in Counter(row.action for row in unlocked).items():
+            ProjectStats.record_lock_duration(project_id, action, expiry_delta, locks)
 
-    def auto_unlock_expired_tasks(self, expiry_date, lock_duration):
-        """Unlock all tasks locked before expiry date. Clears task lock if needed"""
-        TaskHistory.update_expired_and_locked_actions(
-            self.project_id, self.id, expiry_date, lock_duration
+        # Tasks whose most recent lock was auto unlocked go back to the status of their last state change
+        last_status_case = " ".join(
+            f"WHEN '{status.name}' THEN {status.value}" for status in TaskStatus
         )
-
-        last_action = TaskHistory.get_last_locked_or_auto_unlocked_action(
-            self.project_id, self.id
+        clear_locks_sql = f"""
+            UPDATE tasks t
+               SET task_status = COALESCE(last_status.task_status, :ready),
+                   locked_by = NULL,
+                   state_version = :state_version
+              FROM (
+                       SELECT DISTINCT ON (task_id) task_id, action
+                         FROM task_history
+                        WHERE project_id = :project_id
+                          AND task_id = ANY(:task_ids)
+                          AND action IN ('LOCKED_FOR_MAPPING', 'LOCKED_FOR_VALIDATION',
+                                         'AUTO_UNLOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_VALIDATION')
+                        ORDER BY task_id, action_date DESC
+                   ) last_lock
+                   LEFT JOIN (
+                       SELECT DISTINCT ON (task_id) task_id,
+                              CASE action_text {last_status_case} END AS task_status
+                         FROM task_history
+                        WHERE project_id = :project_id
+                          AND task_id = ANY(:task_ids)
+                          AND action = 'STATE_CHANGE'
+                        ORDER BY task_id, action_date DESC
+                   ) last_status ON last_status.task_id = last_lock.task_id
+             WHERE t.project_id = :project_id
+               AND t.id = last_lock.task_id
+               AND last_lock.action IN ('AUTO_UNLOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_VALIDATION')
+        """
+        db.session.execute(
+            text(clear_locks_sql),
+            dict(
+                project_id=project_id,
+                task_ids=task_ids,
+                ready=TaskStatus.READY.value,
+                state_version=Task.bump_task_versions(project_id),
+            ),
         )
-        if last_action.action in [
-            "AUTO_UNLOCKED_FOR_MAPPING",
-            "AUTO_UNLOCKED_FOR_VALIDATION",
-        ]:
-            self.clear_lock()
+        EventService.publish(TaskStateChanged(project_id))
+        db.session.commit()
 
     def is_mappable(self):
         """Determines if task in scope is in suitable state for mapping"""
@@ -681,6 +808,16 @@ class Task(db.Model):
         if mapping_issues is not None:
             history.task_mapping_issues = mapping_issues
 
+        if action != TaskAction.COMMENT:
+            ProjectContributor.record_contribution(self.project_id, user_id)
+        UserTaskActivity.record(
+            user_id,
+            self.project_id,
+            self.id,
+            history.action_text if action == TaskAction.STATE_CHANGE else None,
+            action == TaskAction.COMMENT,
+        )
+
         self.task_history.append(history)
         return history
 
@@ -697,13 +834,11 @@ class Task(db.Model):
         self.update()
 
     def reset_task(self, user_id: int):
-        expiry_delta = Task.auto_unlock_delta()
-        lock_duration = (datetime.datetime.min + expiry_delta).time().isoformat()
         if TaskStatus(self.task_status) in [
             TaskStatus.LOCKED_FOR_MAPPING,
             TaskStatus.LOCKED_FOR_VALIDATION,
         ]:
-            self.record_auto_unlock(lock_duration)
+            self.record_auto_unlock(Task.auto_unlock_delta())
 
         self.set_task_history(TaskAction.STATE_CHANGE, user_id, None, TaskStatus.READY)
         self.mapped_by = None
@@ -725,7 +860,7 @@ class Task(db.Model):
         # Set locked_by to null and status to last status on task
         self.clear_lock()
 
-    def record_auto_unlock(self, lock_duration):
+    def record_auto_unlock(self, lock_duration: datetime.timedelta):
         locked_user = self.locked_by
         last_action = TaskHistory.get_last_locked_action(self.project_id, self.id)
         next_action = (
@@ -738,7 +873,13 @@ class Task(db.Model):
 
         # Add AUTO_UNLOCKED action in the task history
         auto_unlocked = self.set_task_history(action=next_action, user_id=locked_user)
-        auto_unlocked.action_text = lock_duration
+        auto_unlocked.action_text = (
+            (datetime.datetime.min + lock_duration).time().isoformat()
+        )
+        auto_unlocked.lock_duration = lock_duration
+        ProjectStats.record_lock_duration(
+            self.project_id, next_action.name, lock_duration
+        )
         self.update()
 
     def unlock_task(
@@ -809,7 +950,8 @@ class Task(db.Model):
         self.update()
 
     @staticmethod
-    def get_tasks_as_geojson_feature_collection(
+    def filter_tasks_for_geojson(
+        query,
         project_id,
         task_ids_str: str = None,
         order_by: str = None,
@@ -817,48 +959,20 @@ class Task(db.Model):
         status: int = None,
     ):
         """
-        Creates a geoJson.FeatureCollection object for tasks related to the supplied project ID
-        :param project_id: Owning project ID
-        :order_by: sorting option: available values update_date and building_area_diff
-        :status: task status id to filter by
-        :return: geojson.FeatureCollection
+        Applies the task filters and sort order shared by the task geojson queries
+        :param query: Query selecting task columns
+        :raises NotFound: if the project has none of the requested tasks
+        :return: filtered query
         """
-        # subquery = (
-        #     db.session.query(func.max(TaskHistory.action_date))
-        #     .filter(
-        #         Task.id == TaskHistory.task_id,
-        #         Task.project_id == TaskHistory.project_id,
-        #     )
-        #     .correlate(Task)
-        #     .group_by(Task.id)
-        #     .label("update_date")
-        # )
-        query = db.session.query(
-            Task.id,
-            Task.x,
-            Task.y,
-            Task.zoom,
-            Task.is_square,
-            Task.task_status,
-            Task.geometry.ST_AsGeoJSON().label("geojson"),
-            Task.locked_by,
-            # subquery,
-        )
-
         filters = [Task.project_id == project_id]
 
         if task_ids_str:
-            task_ids = map(int, task_ids_str.split(","))
-            tasks = Task.get_tasks(project_id, task_ids)
-            if not tasks or len(tasks) == 0:
-                raise NotFound()
-            else:
-                tasks_filters = [task.id for task in tasks]
-            filters = [Task.project_id == project_id, Task.id.in_(tasks_filters)]
-        else:
-            tasks = Task.get_all_tasks(project_id)
-            if not tasks or len(tasks) == 0:
-                raise NotFound()
+            task_ids = list(map(int, task_ids_str.split(",")))
+            filters.append(Task.id.in_(task_ids))
+
+        # Only fetch an ID, we just need to know there is something to return
+        if db.session.query(Task.id).filter(*filters).first() is None:
+            raise NotFound()
 
         if status:
             filters.append(Task.task_status == status)
@@ -889,6 +1003,48 @@ class Task(db.Model):
         else:
             query = query.filter(*filters)
 
+        return query
+
+    @staticmethod
+    def get_tasks_as_geojson_feature_collection(
+        project_id,
+        task_ids_str: str = None,
+        order_by: str = None,
+        order_by_type: str = "ASC",
+        status: int = None,
+    ):
+        """
+        Creates a geoJson.FeatureCollection object for tasks related to the supplied project ID
+        :param project_id: Owning project ID
+        :order_by: sorting option: available values update_date and building_area_diff
+        :status: task status id to filter by
+        :return: geojson.FeatureCollection
+        """
+        # subquery = (
+        #     db.session.query(func.max(TaskHistory.action_date))
+        #     .filter(
+        #         Task.id == TaskHistory.task_id,
+        #         Task.project_id == TaskHistory.project_id,
+        #     )
+        #     .correlate(Task)
+        #     .group_by(Task.id)
+        #     .label("update_date")
+        # )
+        query = db.session.query(
+            Task.id,
+            Task.x,
+            Task.y,
+            Task.zoom,
+            Task.is_square,
+            Task.task_status,
+            Task.geometry.ST_AsGeoJSON().label("geojson"),
+            Task.locked_by,
+            # subquery,
+        )
+        query = Task.filter_tasks_for_geojson(
+            query, project_id, task_ids_str, order_by, order_by_type, status
+        )
+
         project_tasks = query.all()
 
         tasks_features = []
@@ -911,6 +1067,126 @@ class Task(db.Model):
 
         return geojson.FeatureCollection(tasks_features)
 
+    @staticmethod
+    def get_tasks_geometries_as_geojson(project_id: int) -> dict:
+        """Gets the GeoJSON geometry string of every task of the project, keyed by task ID"""
+        geometries = db.session.query(
+            Task.id, Task.geometry.ST_AsGeoJSON().label("geojson")
+        ).filter(Task.project_id == project_id)
+
+        return {task.id: task.geojson for task in geometries}
+
+    @staticmethod
+    def get_tasks_state(
+        project_id,
+        task_ids_str: str = None,
+        order_by: str = None,
+        order_by_type: str = "ASC",
+        status: int = None,
+    ):
+        """Gets the state of the tasks matching the task geojson filters, without their geometry"""
+        query = db.session.query(
+            Task.id,
+            Task.x,
+            Task.y,
+            Task.zoom,
+            Task.is_square,
+            Task.task_status,
+            Task.locked_by,
+        )
+        query = Task.filter_tasks_for_geojson(
+            query, project_id, task_ids_str, order_by, order_by_type, status
+        )
+
+        return query.all()
+
+    @staticmethod
+    def get_tasks_changed_since_version(project_id: int, since_version: int):
+        """Gets the current state of the tasks that changed after the supplied task state version"""
+        return (
+            db.session.query(Task.id, Task.task_status, Task.locked_by)
+            .filter(Task.project_id == project_id, Task.state_version > since_version)
+            .all()
+        )
+
+    @staticmethod
+    def get_tasks_changed_since_date(project_id: int, since_date: datetime):
+        """Gets the current state of the tasks that had a status or lock change after the supplied date"""
+        changed_tasks = (
+            db.session.query(TaskHistory.task_id)
+            .filter(
+                TaskHistory.project_id == project_id,
+                TaskHistory.action != TaskAction.COMMENT.name,
+                TaskHistory.action_date > since_date,
+            )
+            .distinct()
+            .subquery()
+        )
+        return (
+            db.session.query(Task.id, Task.task_status, Task.locked_by)
+            .filter(Task.project_id == project_id, Task.id == changed_tasks.c.task_id)
+            .all()
+        )
+
+    @staticmethod
+    def stream_tasks_as_geojson_feature_collection(
+        project_id,
+        task_ids_str: str = None,
+        order_by: str = None,
+        order_by_type: str = "ASC",
+        status: int = None,
+        batch_size: int = 1000,
+    ):
+        """
+        Streams a GeoJSON FeatureCollection for tasks related to the supplied project ID.  Each feature is
+        serialised by PostGIS and read through a server side cursor, so the collection is never held in memory.
+        Filters are validated before the generator is returned, so NotFound is raised up front.
+        :param project_id: Owning project ID
+        :order_by: sorting option: available values update_date and building_area_diff
+        :status: task status id to filter by
+        :return: generator yielding the FeatureCollection as utf-8 encoded chunks
+        """
+        task_status_name = case(
+            [(Task.task_status == status.value, status.name) for status in TaskStatus]
+        )
+        feature = func.json_build_object(
+            "type",
+            "Feature",
+            "geometry",
+            cast(Task.geometry.ST_AsGeoJSON(), JSON),
+            "properties",
+            func.json_build_object(
+                "taskId",
+                Task.id,
+                "taskX",
+                Task.x,
+                "taskY",
+                Task.y,
+                "taskZoom",
+                Task.zoom,
+                "taskIsSquare",
+                Task.is_square,
+                "taskStatus",
+                task_status_name,
+                "lockedBy",
+                Task.locked_by,
+            ),
+        )
+        query = db.session.query(cast(feature, Text).label("feature"))
+        query = Task.filter_tasks_for_geojson(
+            query, project_id, task_ids_str, order_by, order_by_type, status
+        )
+
+        def generate():
+            yield b'{"type": "FeatureCollection", "features": ['
+            separator = b""
+            for task in query.yield_per(batch_size):
+                yield separator + task.feature.encode("utf-8")
+                separator = b", "
+            yield b"]}"
+
+        return generate()
+
     @staticmethod
     def get_tasks_as_geojson_feature_collection_no_geom(project_id):
         """
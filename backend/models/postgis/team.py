@@ -14,6 +14,11 @@ from backend.models.postgis.statuses import (
 )
 from backend.models.postgis.user import User
 from backend.models.postgis.utils import NotFound
+from backend.services.event_service import (
+    EventService,
+    MembershipChanged,
+    TeamUpdated,
+)
 
 
 class TeamMembers(db.Model):
@@ -37,11 +42,17 @@ class TeamMembers(db.Model):
     def create(self):
         """ Creates and saves the current model to the DB """
         db.session.add(self)
+        EventService.publish(
+            MembershipChanged(team_id=self.team_id, user_id=self.user_id)
+        )
         db.session.commit()
 
     def delete(self):
         """ Deletes the current model from the DB """
         db.session.delete(self)
+        EventService.publish(
+            MembershipChanged(team_id=self.team_id, user_id=self.user_id)
+        )
         db.session.commit()
 
 
@@ -70,6 +81,9 @@ class Team(db.Model):
     def create(self):
         """ Creates and saves the current model to the DB """
         db.session.add(self)
+        db.session.flush()
+        EventService.publish(TeamUpdated(self.id))
+        EventService.publish(MembershipChanged(team_id=self.id))
         db.session.commit()
 
     @classmethod
@@ -135,11 +149,16 @@ class Team(db.Model):
                 new_team_member.member = user
                 new_team_member.function = TeamMemberFunctions[member["function"]].value
 
+            EventService.publish(MembershipChanged(team_id=self.id))
+
+        EventService.publish(TeamUpdated(self.id))
         db.session.commit()
 
     def delete(self):
         """ Deletes the current model from the DB """
         db.session.delete(self)
+        EventService.publish(TeamUpdated(self.id))
+        EventService.publish(MembershipChanged(team_id=self.id))
         db.session.commit()
 
     def can_be_deleted(self) -> bool:
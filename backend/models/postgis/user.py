@@ -15,6 +15,7 @@ from backend.models.dtos.user_dto import (
 )
 from backend.models.postgis.licenses import License, user_licenses_table
 from backend.models.postgis.project_info import ProjectInfo
+from backend.models.postgis.project_stats import ProjectStats
 from backend.models.postgis.statuses import (
     MappingLevel,
     ProjectStatus,
@@ -219,6 +220,7 @@ class User(db.Model):
         if user.projects_mapped is None:
             user.projects_mapped = []
         user.projects_mapped.append(project_id)
+        ProjectStats.record_mapper(project_id)
         db.session.commit()
 
     @staticmethod
@@ -0,0 +1,73 @@
+import datetime
+
+from sqlalchemy import text
+
+from backend import db
+from backend.models.postgis.statuses import MappingLevel
+from backend.models.postgis.utils import timestamp
+
+
+class UserChangesetCount(db.Model):
+    """
+    Changeset counts of users fetched from the OSM API, with the time they were last checked, so the refresh
+    of mapper levels only asks OSM about users that weren't checked recently and can resume where it stopped
+    """
+
+    __tablename__ = "user_changeset_counts"
+
+    user_id = db.Column(
+        db.BigInteger,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    changeset_count = db.Column(db.Integer, nullable=False)
+    last_checked = db.Column(db.DateTime, nullable=False, default=timestamp)
+
+    @staticmethod
+    def get_users_to_check(checked_before: datetime.datetime) -> list:
+        """
+        Gets the users that can still level up and whose changesets weren't checked since checked_before
+        :return: list of (id, username, mapping_level) rows ordered by id
+        """
+        return db.session.execute(
+            text(
+                """
+                SELECT u.id, u.username, u.mapping_level
+                  FROM users u
+                  LEFT JOIN user_changeset_counts c ON c.user_id = u.id
+                 WHERE u.mapping_level != :advanced
+                   AND (c.last_checked IS NULL OR c.last_checked < :checked_before)
+              ORDER BY u.id
+                """
+            ),
+            dict(advanced=MappingLevel.ADVANCED.value, checked_before=checked_before),
+        ).fetchall()
+
+    @staticmethod
+    def record(changeset_counts: dict):
+        """
+        Stores the changeset counts of the users in a single statement. Runs in the caller's transaction and
+        doesn't commit
+        :param changeset_counts: dict of changeset counts by user id
+        """
+        if not changeset_counts:
+            return
+
+        db.session.execute(
+            text(
+                """
+                INSERT INTO user_changeset_counts (user_id, changeset_count, last_checked)
+                     SELECT UNNEST(CAST(:user_ids AS BIGINT[])),
+                            UNNEST(CAST(:changeset_counts AS INTEGER[])),
+                            :now
+                ON CONFLICT (user_id)
+                  DO UPDATE SET changeset_count = EXCLUDED.changeset_count,
+                                last_checked = EXCLUDED.last_checked
+                """
+            ),
+            dict(
+                user_ids=list(changeset_counts.keys()),
+                changeset_counts=list(changeset_counts.values()),
+                now=timestamp(),
+            ),
+        )
@@ -0,0 +1,156 @@
+from sqlalchemy import text
+from backend import db
+from backend.models.postgis.utils import timestamp
+
+
+class UserTaskActivity(db.Model):
+    """
+    Projection of task history with a row per task a user acted on, maintained on every task history write so
+    the user's tasks can be listed with an index range scan instead of aggregating task_history
+    """
+
+    __tablename__ = "user_task_activity"
+
+    user_id = db.Column(
+        db.BigInteger,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    project_id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, primary_key=True)
+    last_action_date = db.Column(db.DateTime, nullable=False, default=timestamp)
+    # Status the user last set on the task, NULL if the user never changed its status
+    last_action = db.Column(db.String)
+    # Comments on the task from all users, kept on each user's row so it can be listed without a join
+    comment_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.ForeignKeyConstraint(
+            ["task_id", "project_id"],
+            ["tasks.id", "tasks.project_id"],
+            ondelete="CASCADE",
+        ),
+        db.Index(
+            "idx_user_task_activity_last_action_date",
+            "user_id",
+            "last_action_date",
+            "task_id",
+        ),
+        {},
+    )
+
+    @staticmethod
+    def record(
+        user_id: int,
+        project_id: int,
+        task_id: int,
+        new_state: str = None,
+        is_comment: bool = False,
+        action_date=None,
+    ):
+        """
+        Records an action of the user on the task. Runs in the caller's transaction and doesn't commit
+        :param new_state: Name of the status the action set, None if it didn't change the status
+        :param is_comment: The action is a comment, counted on the rows of all the users of the task
+        """
+        params = dict(
+            user_id=user_id,
+            project_id=project_id,
+            task_id=task_id,
+            new_state=new_state,
+            is_comment=is_comment,
+            action_date=action_date or timestamp(),
+        )
+        if is_comment:
+            db.session.execute(
+                text(
+                    """
+                    UPDATE user_task_activity
+                       SET comment_count = comment_count + 1
+                     WHERE project_id = :project_id AND task_id = :task_id
+                    """
+                ),
+                params,
+            )
+        # A new row counts the comments already made on the task, the existing ones were incremented above
+        db.session.execute(
+            text(
+                """
+                INSERT INTO user_task_activity AS a
+                            (user_id, project_id, task_id, last_action_date, last_action, comment_count)
+                     VALUES (:user_id, :project_id, :task_id, :action_date, :new_state,
+                             (SELECT COUNT(*)
+                                FROM task_history
+                               WHERE project_id = :project_id
+                                 AND task_id = :task_id
+                                 AND action = 'COMMENT') + CAST(:is_comment AS INTEGER))
+                ON CONFLICT (user_id, project_id, task_id)
+                  DO UPDATE SET last_action_date = GREATEST(a.last_action_date, EXCLUDED.last_action_date),
+                                last_action = COALESCE(EXCLUDED.last_action, a.last_action)
+                """
+            ),
+            params,
+        )
+
+    @staticmethod
+    def copy_task(project_id: int, from_task_id: int, to_task_id: int):
+        """
+        Copies the activity of a task to another one, along with its task history when a task is split.
+        Runs in the caller's transaction and doesn't commit
+        """
+        db.session.execute(
+            text(
+                """
+                INSERT INTO user_task_activity
+                            (user_id, project_id, task_id, last_action_date, last_action, comment_count)
+                     SELECT user_id, project_id, :to_task_id, last_action_date, last_action, comment_count
+                       FROM user_task_activity
+                      WHERE project_id = :project_id AND task_id = :from_task_id
+                ON CONFLICT (user_id, project_id, task_id) DO NOTHING
+                """
+            ),
+            dict(
+                project_id=project_id, from_task_id=from_task_id, to_task_id=to_task_id
+            ),
+        )
+
+    @staticmethod
+    def rebuild(user_id: int = None) -> int:
+        """
+        Rebuilds the projection from task history
+        :param user_id: Only rebuild the activity of this user, all users if None
+        :return: Number of rows rebuilt
+        """
+        params = dict(user_id=user_id)
+        db.session.execute(
+            text(
+                """
+                DELETE FROM user_task_activity
+                 WHERE (:user_id IS NULL OR user_id = :user_id)
+                """
+            ),
+            params,
+        )
+        result = db.session.execute(
+            text(
+                """
+                INSERT INTO user_task_activity
+                            (user_id, project_id, task_id, last_action_date, last_action, comment_count)
+                     SELECT th.user_id, th.project_id, th.task_id, MAX(th.action_date),
+                            (ARRAY_AGG(th.action_text ORDER BY th.action_date DESC, th.id DESC)
+                                FILTER (WHERE th.action = 'STATE_CHANGE'))[1],
+                            COALESCE(MAX(c.comment_count), 0)
+                       FROM task_history th
+                       LEFT JOIN (SELECT project_id, task_id, COUNT(*) AS comment_count
+                                    FROM task_history
+                                   WHERE action = 'COMMENT'
+                                GROUP BY project_id, task_id) c
+                              ON c.project_id = th.project_id AND c.task_id = th.task_id
+                      WHERE (:user_id IS NULL OR th.user_id = :user_id)
+                   GROUP BY th.user_id, th.project_id, th.task_id
+                """
+            ),
+            params,
+        )
+        db.session.commit()
+        return result.rowcount
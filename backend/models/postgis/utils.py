@@ -1,9 +1,13 @@
+import base64
+import binascii
 import datetime
 import json
 import re
+from dateutil.parser import isoparse
 from flask import current_app
 from geoalchemy2 import Geometry
 from geoalchemy2.functions import GenericFunction
+from sqlalchemy import and_, func, or_, tuple_
 
 
 class NotFound(Exception):
@@ -159,3 +163,149 @@ class DateTimeEncoder(json.JSONEncoder):
             return (datetime.datetime.min + obj).time().isoformat()
         else:
             return super(DateTimeEncoder, self).default(obj)
+
+
+class KeysetPage:
+    """
+    A page of keyset (cursor) paginated results. Mirrors the attributes of Flask-SQLAlchemy's Pagination so it
+    can be used to build the Pagination DTO, page numbers are unknown and the total is only set if requested
+    """
+
+    def __init__(self, items, per_page, next_cursor, has_prev, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.has_next = next_cursor is not None
+        self.has_prev = has_prev
+        self.next_num = None
+        self.prev_num = None
+        self.page = None
+        self.pages = None
+        self.total = total
+
+
+def encode_cursor(sort_value, row_id) -> str:
+    """Encodes the sort value and id of the last row of a page into an opaque cursor"""
+    cursor = json.dumps([sort_value, row_id], cls=DateTimeEncoder)
+    return base64.urlsafe_b64encode(cursor.encode("utf-8")).decode("utf-8")
+
+
+def decode_cursor(cursor: str, sort_column):
+    """
+    Decodes a cursor created by encode_cursor
+    :raises ValueError: if the cursor is malformed
+    :return: tuple of (sort_value, row_id)
+    """
+    try:
+        sort_value, row_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode("utf-8"))
+        )
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor {cursor}")
+
+    try:
+        python_type = sort_column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    if sort_value is not None and python_type is datetime.datetime:
+        sort_value = isoparse(sort_value)
+
+    return sort_value, row_id
+
+
+def keyset_paginate(
+    query,
+    sort_column,
+    id_column,
+    row_key,
+    cursor: str = None,
+    per_page: int = 10,
+    descending: bool = False,
+    count_total: bool = False,
+) -> KeysetPage:
+    """
+    Paginates a query on (sort_column, id_column) with a keyset cursor instead of OFFSET, so deep pages cost
+    the same as the first one and no COUNT query is needed. NULL sort values are ordered like Postgres does,
+    last when ascending and first when descending.
+    :param query: Unordered query to paginate
+    :param id_column: Column identifying the rows, or tuple of the columns when the id is composite
+    :param row_key: Callable returning the (sort_value, id) of a result row, id being a tuple of the values of
+                    the id columns when the id is composite
+    :param cursor: Cursor of the last row of the previous page, None for the first page
+    :param count_total: Also count the total number of rows, which needs the extra COUNT query
+    :raises ValueError: if the cursor is malformed
+    """
+    total = query.order_by(None).count() if count_total else None
+
+    id_columns = id_column if isinstance(id_column, tuple) else (id_column,)
+    if cursor is not None:
+        sort_value, row_id = decode_cursor(cursor, sort_column)
+        if isinstance(id_column, tuple):
+            # Composite ids are compared as row values
+            if not isinstance(row_id, list) or len(row_id) != len(id_column):
+                raise ValueError(f"Invalid cursor {cursor}")
+            id_column, row_id = tuple_(*id_column), tuple_(*row_id)
+        if descending:
+            if sort_value is None:
+                after = or_(
+                    and_(sort_column.is_(None), id_column < row_id),
+                    sort_column.isnot(None),
+                )
+            else:
+                after = or_(
+                    sort_column < sort_value,
+                    and_(sort_column == sort_value, id_column < row_id),
+                )
+        else:
+            if sort_value is None:
+                after = and_(sort_column.is_(None), id_column > row_id)
+            else:
+                after = or_(
+                    sort_column > sort_value,
+                    and_(sort_column == sort_value, id_column > row_id),
+                    sort_column.is_(None),
+                )
+        query = query.filter(after)
+
+    if descending:
+        query = query.order_by(
+            sort_column.desc(), *[column.desc() for column in id_columns]
+        )
+    else:
+        query = query.order_by(
+            sort_column.asc(), *[column.asc() for column in id_columns]
+        )
+
+    # Fetch one extra row to know whether there is a next page
+    items = query.limit(per_page + 1).all()
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        next_cursor = encode_cursor(*row_key(items[-1]))
+
+    return KeysetPage(items, per_page, next_cursor, cursor is not None, total)
+
+
+def count_filtered(query, **conditions) -> dict:
+    """
+    Counts the rows of the query matching each condition in a single scan, with COUNT(*) FILTER (WHERE ...)
+    instead of a COUNT query per condition
+    :param conditions: SQL expression of each counter, None to count all the rows of the query
+    :return: dict of counters by name
+    """
+    counters = [
+        (func.count() if condition is None else func.count().filter(condition)).label(
+            name
+        )
+        for name, condition in conditions.items()
+    ]
+    return query.order_by(None).with_entities(*counters).one()._asdict()
+
+
+def count_by(query, column) -> dict:
+    """
+    Counts the rows of the query by value of the column in a single GROUP BY scan
+    :return: dict of counts by column value, values without rows are left out
+    """
+    rows = query.order_by(None).with_entities(column, func.count()).group_by(column)
+    return dict(rows.all())
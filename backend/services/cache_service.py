@@ -0,0 +1,506 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from functools import partial, wraps
+
+from cachetools import LRUCache, TTLCache
+from flask import current_app, g, has_app_context, has_request_context
+
+# All the caches of the API by namespace
+caches = {}
+cache_backend = None
+cache_backend_lock = threading.Lock()
+
+
+class MemoryCacheBackend:
+    """Keeps the cached values as they are in the memory of each worker"""
+
+    name = "memory"
+    serializes = False
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.stores = {}
+
+    def _get_store(self, cache):
+        store = self.stores.get(cache.namespace)
+        if store is None:
+            # Evictions in other workers aren't seen, so entries are only kept for the local ttl
+            ttl = cache.local_ttl or cache.ttl
+            if ttl:
+                store = TTLCache(maxsize=cache.maxsize, ttl=ttl)
+            else:
+                store = LRUCache(maxsize=cache.maxsize)
+            self.stores[cache.namespace] = store
+        return store
+
+    def get(self, cache, key):
+        with self.lock:
+            return self._get_store(cache).get(key)
+
+    def set(self, cache, key, value):
+        with self.lock:
+            self._get_store(cache)[key] = value
+
+    def delete(self, cache, key):
+        with self.lock:
+            self._get_store(cache).pop(key, None)
+
+    def delete_partition(self, cache, partition):
+        with self.lock:
+            store = self._get_store(cache)
+            for key in [key for key in store.keys() if key[0] == partition]:
+                store.pop(key, None)
+
+    def clear(self, cache):
+        with self.lock:
+            self._get_store(cache).clear()
+
+    def size(self, cache) -> int:
+        with self.lock:
+            return self._get_store(cache).currsize
+
+
+class SharedMemoryCacheBackend:
+    """
+    Keeps the cached values in a SQLite database memory mapped by all the workers of the host. It is kept in
+    /dev/shm by default, so it never touches the disk
+    """
+
+    name = "shared"
+    serializes = True
+    mmap_size = 256 * 1024 * 1024
+    # Expiry of entries of caches without a ttl, which are only evicted by size
+    no_expiry = 10 * 365 * 24 * 3600
+    # Writes of a cache each worker makes between evictions of the entries beyond the size of the cache
+    eviction_interval = 64
+
+    def __init__(self, path: str = None):
+        if path is None:
+            directory = (
+                "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            )
+            path = os.path.join(directory, "tasking-manager-cache.db")
+        self.path = path
+        # A single connection per process, shared by its threads and greenlets
+        self.lock = threading.Lock()
+        self.connection = None
+        self.pid = None
+        # Writes of each cache since its entries beyond the size of the cache were last evicted
+        self.writes = {}
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # Called holding the lock. Connections can't be inherited from the process the worker was forked from
+        if self.connection is not None and self.pid == os.getpid():
+            return self.connection
+
+        connection = sqlite3.connect(
+            self.path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+            """
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS cache_expires ON cache (namespace, expires)"
+        )
+        self.connection = connection
+        self.pid = os.getpid()
+        self.writes = {}
+        return connection
+
+    def _execute(self, sql: str, params: tuple) -> list:
+        with self.lock:
+            return self._get_connection().execute(sql, params).fetchall()
+
+    def get(self, cache, key: str):
+        rows = self._execute(
+            "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires > ?",
+            (cache.namespace, key, time.time()),
+        )
+        return rows[0][0] if rows else None
+
+    def set(self, cache, key: str, value: str):
+        now = time.time()
+        with self.lock:
+            connection = self._get_connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                (cache.namespace, key, value, now + (cache.ttl or self.no_expiry)),
+            )
+            # Expired entries are never read, the entries beyond the size of the cache are evicted every
+            # few writes rather than on each one
+            writes = self.writes.get(cache.namespace, 0) + 1
+            if writes < self.eviction_interval:
+                self.writes[cache.namespace] = writes
+                return
+
+            self.writes[cache.namespace] = 0
+            connection.execute(
+                """
+                DELETE FROM cache
+                 WHERE namespace = ?
+                   AND (expires <= ?
+                        OR key IN (SELECT key FROM cache WHERE namespace = ?
+                                    ORDER BY expires DESC LIMIT -1 OFFSET ?))
+                """,
+                (cache.namespace, now, cache.namespace, cache.maxsize),
+            )
+
+    def delete(self, cache, key: str):
+        self._execute(
+            "DELETE FROM cache WHERE namespace = ? AND key = ?", (cache.namespace, key)
+        )
+
+    def delete_partition(self, cache, partition: str):
+        self._execute(
+            "DELETE FROM cache WHERE namespace = ? AND substr(key, 1, ?) = ?",
+            (cache.namespace, len(partition), partition),
+        )
+
+    def clear(self, cache):
+        self._execute("DELETE FROM cache WHERE namespace = ?", (cache.namespace,))
+
+    def size(self, cache) -> int:
+        return self._execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires > ?",
+            (cache.namespace, time.time()),
+        )[0][0]
+
+
+class RedisCacheBackend:
+    """
+    Keeps the cached values in a Redis server shared by all the hosts. Entries expire with Redis ttls and are
+    evicted by the server's maxmemory policy
+    """
+
+    name = "redis"
+    serializes = True
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def _get_key(self, cache, key: str = "*") -> str:
+        return f"tm:cache:{cache.namespace}:{key}"
+
+    def get(self, cache, key: str):
+        value = self.client.get(self._get_key(cache, key))
+        return None if value is None else value.decode("utf-8")
+
+    def set(self, cache, key: str, value: str):
+        self.client.set(self._get_key(cache, key), value, ex=cache.ttl)
+
+    def delete(self, cache, key: str):
+        self.client.delete(self._get_key(cache, key))
+
+    def delete_partition(self, cache, partition: str):
+        self._delete_matching(self._get_key(cache, f"{partition}*"))
+
+    def clear(self, cache):
+        self._delete_matching(self._get_key(cache))
+
+    def _delete_matching(self, pattern: str):
+        keys = []
+        for key in self.client.scan_iter(match=pattern, count=1000):
+            keys.append(key)
+            if len(keys) == 1000:
+                self.client.delete(*keys)
+                keys = []
+        if keys:
+            self.client.delete(*keys)
+
+    def size(self, cache):
+        # Counting the keys of a namespace needs a scan of the whole keyspace
+        return None
+
+
+class Cache:
+    """
+    A cache of the API, namespaced in the configured cache backend. The shared backends store values as JSON,
+    caches of DTOs give their model class so the DTO can be rebuilt from its primitive.
+    Entries are grouped in partitions, e.g. by project, so they can be evicted together. The local ttl bounds
+    how long entries are kept by the per worker memory backend, where evictions of other workers aren't seen
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        maxsize: int,
+        ttl: int = None,
+        local_ttl: int = None,
+        model=None,
+    ):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.model = model
+        # Hit and miss counters are kept by each worker
+        self.stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        caches[namespace] = self
+
+    def _count(self, counter: str):
+        with self.stats_lock:
+            self.stats[counter] += 1
+
+    def _get_backend_key(self, backend, key, partition=None):
+        if not backend.serializes:
+            return (partition, key)
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return f"{self._get_backend_partition(backend, partition)}{digest}"
+
+    def _get_backend_partition(self, backend, partition):
+        if not backend.serializes:
+            return partition
+        return f"{partition}:"
+
+    def _dumps(self, value) -> str:
+        if self.model is not None:
+            value = value.to_primitive()
+        return json.dumps(value)
+
+    def _loads(self, value: str):
+        value = json.loads(value)
+        if self.model is None:
+            return value
+        dto = self.model()
+        dto.import_data(value, recursive=True, partial=True)
+        return dto
+
+    def get(self, key, partition=None):
+        """Gets the cached value of the key, None if it isn't cached"""
+        backend = CacheService.get_backend()
+        try:
+            value = backend.get(self, self._get_backend_key(backend, key, partition))
+            if value is not None and backend.serializes:
+                value = self._loads(value)
+        except Exception as e:
+            # The API keeps working without its caches if the cache backend is unavailable
+            current_app.logger.warning(f"Cache {self.namespace} GET failed: {str(e)}")
+            value = None
+
+        self._count("misses" if value is None else "hits")
+        return value
+
+    def set(self, key, value, partition=None):
+        """Caches the value of the key. None values aren't cached"""
+        if value is None:
+            return
+
+        backend = CacheService.get_backend()
+        try:
+            if backend.serializes:
+                value = self._dumps(value)
+            backend.set(self, self._get_backend_key(backend, key, partition), value)
+        except Exception as e:
+            current_app.logger.warning(f"Cache {self.namespace} SET failed: {str(e)}")
+
+    def delete(self, key, partition=None):
+        """Evicts the key from the cache"""
+        backend = CacheService.get_backend()
+        try:
+            backend.delete(self, self._get_backend_key(backend, key, partition))
+        except Exception as e:
+            current_app.logger.warning(
+                f"Cache {self.namespace} DELETE failed: {str(e)}"
+            )
+        self._count("invalidations")
+
+    def evict(self, partition):
+        """Evicts all the keys of the partition"""
+        backend = CacheService.get_backend()
+        try:
+            backend.delete_partition(
+                self, self._get_backend_partition(backend, partition)
+            )
+        except Exception as e:
+            current_app.logger.warning(f"Cache {self.namespace} EVICT failed: {str(e)}")
+        self._count("invalidations")
+
+    def clear(self):
+        """Evicts all the keys of the cache"""
+        try:
+            CacheService.get_backend().clear(self)
+        except Exception as e:
+            current_app.logger.warning(f"Cache {self.namespace} CLEAR failed: {str(e)}")
+        self._count("invalidations")
+
+    def get_stats(self) -> dict:
+        """Gets the counters and the size of the cache"""
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats.update(
+            size=CacheService.get_backend().size(self),
+            maxsize=self.maxsize,
+            ttl=self.ttl,
+            local_ttl=self.local_ttl,
+        )
+        return stats
+
+    def cached(self, func=None, partition_by_first_arg: bool = False):
+        """
+        Decorator caching the results of func by its arguments, in the partition of its first argument if
+        partition_by_first_arg is set. The entry of a call can be evicted with func.invalidate(*args, **kwargs)
+        """
+        if func is None:
+            return partial(self.cached, partition_by_first_arg=partition_by_first_arg)
+
+        def get_key(*args, **kwargs):
+            key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+            return key, args[0] if partition_by_first_arg else None
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key, partition = get_key(*args, **kwargs)
+            value = self.get(key, partition)
+            if value is None:
+                value = func(*args, **kwargs)
+                self.set(key, value, partition)
+            return value
+
+        wrapper.cache = self
+        wrapper.invalidate = lambda *args, **kwargs: self.delete(
+            *get_key(*args, **kwargs)
+        )
+        return wrapper
+
+
+class RequestCache:
+    """
+    Values kept for the rest of the request on flask.g, e.g. the users and projects loaded by the services a
+    request calls, so lookups repeated by the request run once. Nothing is kept outside of requests, e.g. by
+    background jobs. Caches are cleared by the events published when their values change
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def _get_store(self):
+        if not has_request_context():
+            return None
+        return g.setdefault("request_caches", {}).setdefault(self.namespace, {})
+
+    def get(self, key):
+        """Gets the value of the key kept by the request, None if it isn't kept"""
+        store = self._get_store()
+        return None if store is None else store.get(key)
+
+    def set(self, key, value):
+        """Keeps the value of the key for the rest of the request. None values aren't kept"""
+        store = self._get_store()
+        if store is not None and value is not None:
+            store[key] = value
+
+    def delete(self, key):
+        """Evicts the key from the cache"""
+        store = self._get_store()
+        if store is not None:
+            store.pop(key, None)
+
+    def clear(self):
+        """Evicts all the keys of the cache"""
+        if has_request_context():
+            g.get("request_caches", {}).pop(self.namespace, None)
+
+    def load_many(self, keys, loader) -> dict:
+        """
+        Gets the values of the keys, loading the keys the request doesn't keep yet with a single call of loader
+        :param loader: Function returning a dict of the values of the keys it is given, without the keys not found
+        :return: dict of the values found by key
+        """
+        values = {}
+        missing_keys = []
+        for key in dict.fromkeys(keys):
+            value = self.get(key)
+            if value is None:
+                missing_keys.append(key)
+            else:
+                values[key] = value
+
+        if missing_keys:
+            loaded_values = loader(missing_keys)
+            for key, value in loaded_values.items():
+                self.set(key, value)
+            values.update(loaded_values)
+        return values
+
+    def cached(self, func):
+        """Decorator keeping the results of func by its arguments for the rest of the request"""
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            value = self.get(key)
+            if value is None:
+                value = func(*args, **kwargs)
+                self.set(key, value)
+            return value
+
+        wrapper.cache = self
+        return wrapper
+
+
+class CacheService:
+    @staticmethod
+    def reset_request_caches():
+        """Drops the values kept by the previous request, as the app context outlives requests in the tests"""
+        g.pop("request_caches", None)
+
+    @staticmethod
+    def create_backend(name: str, config: dict):
+        """Creates the cache backend with the given name"""
+        if name == MemoryCacheBackend.name:
+            return MemoryCacheBackend()
+        if name == SharedMemoryCacheBackend.name:
+            return SharedMemoryCacheBackend(config.get("CACHE_SHARED_PATH"))
+        if name == RedisCacheBackend.name:
+            return RedisCacheBackend(config.get("CACHE_REDIS_URL"))
+
+        raise ValueError(f"Unknown cache backend {name}")
+
+    @staticmethod
+    def get_backend():
+        """Gets the configured cache backend, created by each worker on first use"""
+        global cache_backend
+
+        if cache_backend is None:
+            with cache_backend_lock:
+                if cache_backend is None:
+                    config = current_app.config if has_app_context() else {}
+                    cache_backend = CacheService.create_backend(
+                        config.get("CACHE_BACKEND", MemoryCacheBackend.name), config
+                    )
+        return cache_backend
+
+    @staticmethod
+    def get_cache_stats() -> dict:
+        """Gets the statistics of all the caches of the API"""
+        return {
+            "backend": CacheService.get_backend().name,
+            "caches": {
+                namespace: cache.get_stats() for namespace, cache in caches.items()
+            },
+        }
+
+    @staticmethod
+    def invalidate_all():
+        """Clears all the caches of the API"""
+        for cache in caches.values():
+            cache.clear()
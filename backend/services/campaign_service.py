@@ -16,6 +16,7 @@ from backend.models.postgis.campaign import (
 from backend.models.postgis.utils import NotFound
 from backend.models.postgis.project import Project
 from backend.models.postgis.organisation import Organisation
+from backend.services.event_service import EventService, CampaignUpdated
 from backend.services.organisation_service import OrganisationService
 
 
@@ -77,6 +78,7 @@ class CampaignService:
         campaign = Campaign.query.get(campaign_id)
         project = Project.query.get(project_id)
         project.campaign.remove(campaign)
+        EventService.publish(CampaignUpdated(campaign_id, project_id))
         db.session.commit()
         new_campaigns = CampaignService.get_project_campaigns_as_dto(project_id)
         return new_campaigns
@@ -114,6 +116,7 @@ class CampaignService:
             campaign_id=dto.campaign_id, project_id=dto.project_id
         )
         db.session.execute(statement)
+        EventService.publish(CampaignUpdated(dto.campaign_id, dto.project_id))
         db.session.commit()
         new_campaigns = CampaignService.get_project_campaigns_as_dto(dto.project_id)
         return new_campaigns
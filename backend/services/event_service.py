@@ -0,0 +1,128 @@
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend import db
+
+# Handlers subscribed to each type of event
+subscribers = defaultdict(list)
+
+
+class Event:
+    """Base class of the events published when tasks, projects, teams, organisations and campaigns change"""
+
+    def __eq__(self, other):
+        return type(self) is type(other) and vars(self) == vars(other)
+
+    def __hash__(self):
+        return hash((type(self), tuple(sorted(vars(self).items()))))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({vars(self)})"
+
+
+class TaskStateChanged(Event):
+    """Tasks of the project were locked, unlocked, mapped, validated, split or reset"""
+
+    def __init__(
+        self,
+        project_id: int,
+        task_id: int = None,
+        user_id: int = None,
+        last_state: str = None,
+        new_state: str = None,
+    ):
+        self.project_id = project_id
+        self.task_id = task_id
+        self.user_id = user_id
+        self.last_state = last_state
+        self.new_state = new_state
+
+
+class ProjectUpdated(Event):
+    """The project was created, updated, deleted, or its teams, campaigns or interests changed"""
+
+    def __init__(self, project_id: int, created: bool = False, deleted: bool = False):
+        self.project_id = project_id
+        self.created = created
+        self.deleted = deleted
+
+
+class MembershipChanged(Event):
+    """Members of a team or managers of an organisation were added or removed"""
+
+    def __init__(
+        self, team_id: int = None, organisation_id: int = None, user_id: int = None
+    ):
+        self.team_id = team_id
+        self.organisation_id = organisation_id
+        self.user_id = user_id
+
+
+class TeamUpdated(Event):
+    """The team was created, updated or deleted"""
+
+    def __init__(self, team_id: int):
+        self.team_id = team_id
+
+
+class OrganisationUpdated(Event):
+    """The organisation was created, updated or deleted"""
+
+    def __init__(self, organisation_id: int):
+        self.organisation_id = organisation_id
+
+
+class CampaignUpdated(Event):
+    """The campaign was created, updated or deleted, or assigned to the project when project_id is set"""
+
+    def __init__(self, campaign_id: int, project_id: int = None):
+        self.campaign_id = campaign_id
+        self.project_id = project_id
+
+
+class EventService:
+    @staticmethod
+    def subscribe(*event_types):
+        """Decorator subscribing the handler to the given types of event"""
+
+        def decorator(handler):
+            for event_type in event_types:
+                subscribers[event_type].append(handler)
+            return handler
+
+        return decorator
+
+    @staticmethod
+    def publish(event: Event):
+        """
+        Publishes the event once the current transaction of the session commits, so subscribers never act on
+        changes that are rolled back. Identical events published in the same transaction are delivered once
+        """
+        pending_events = db.session.info.setdefault("pending_events", [])
+        if event not in pending_events:
+            pending_events.append(event)
+
+    @staticmethod
+    def dispatch(event: Event):
+        """Delivers the event to its subscribers. Subscribers run after the commit and can't use the session"""
+        for handler in subscribers[type(event)]:
+            try:
+                handler(event)
+            except Exception as e:
+                current_app.logger.error(
+                    f"Handler {handler.__qualname__} of {event} failed: {str(e)}"
+                )
+
+
+@event.listens_for(Session, "after_commit")
+def dispatch_pending_events(session):
+    for pending_event in session.info.pop("pending_events", []):
+        EventService.dispatch(pending_event)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_pending_events(session):
+    session.info.pop("pending_events", None)
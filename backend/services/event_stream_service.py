@@ -0,0 +1,146 @@
+import json
+import queue
+import select
+import threading
+import time
+from collections import defaultdict
+
+from flask import current_app
+from sqlalchemy import text
+
+from backend import db
+
+# Postgres channel the events are notified on, so every worker gets the events of the others
+EVENT_STREAM_CHANNEL = "tm_events"
+# Seconds between the comments sent to idle streams so proxies keep them open, after which streams are closed
+# and the delay before clients reconnect
+EVENT_STREAM_HEARTBEAT = 15
+EVENT_STREAM_MAX_DURATION = 30 * 60
+EVENT_STREAM_RETRY = 3
+# Events buffered for a slow client before its stream is closed, it catches up when it reconnects
+EVENT_STREAM_QUEUE_SIZE = 100
+
+
+def project_channel(project_id: int) -> str:
+    return f"project:{project_id}"
+
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+class EventBroker:
+    """
+    In process pub/sub of the events received from Postgres, fanning them out to the streams open on this
+    worker. A single connection per worker listens to the events, started with the first stream
+    """
+
+    def __init__(self):
+        self.subscriptions = defaultdict(set)
+        self.lock = threading.Lock()
+        self.listener = None
+        self.listening = threading.Event()
+
+    def subscribe(self, channel: str, app) -> queue.Queue:
+        subscription = queue.Queue()
+        with self.lock:
+            self.subscriptions[channel].add(subscription)
+            if self.listener is None or not self.listener.is_alive():
+                self.listener = threading.Thread(
+                    target=self.listen, args=(app,), daemon=True
+                )
+                self.listener.start()
+        return subscription
+
+    def unsubscribe(self, channel: str, subscription: queue.Queue):
+        with self.lock:
+            self.subscriptions[channel].discard(subscription)
+            if not self.subscriptions[channel]:
+                del self.subscriptions[channel]
+
+    def dispatch(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(message["channel"], ()))
+        for subscription in subscriptions:
+            if subscription.qsize() >= EVENT_STREAM_QUEUE_SIZE:
+                # Closes the stream of a client that doesn't keep up
+                self.unsubscribe(message["channel"], subscription)
+                subscription.put(None)
+            else:
+                subscription.put(message)
+
+    def listen(self, app):
+        """Receives the events notified on Postgres and dispatches them, reconnecting if the connection drops"""
+        while True:
+            connection = None
+            try:
+                with app.app_context():
+                    connection = db.engine.raw_connection()
+                    connection.detach()
+                dbapi_connection = connection.connection
+                dbapi_connection.autocommit = True
+                dbapi_connection.cursor().execute(f"LISTEN {EVENT_STREAM_CHANNEL}")
+                self.listening.set()
+                while True:
+                    if select.select([dbapi_connection], [], [], 60) == ([], [], []):
+                        continue
+                    dbapi_connection.poll()
+                    while dbapi_connection.notifies:
+                        self.dispatch(dbapi_connection.notifies.pop(0).payload)
+            except Exception as e:
+                self.listening.clear()
+                app.logger.error(f"Event stream listener failed: {str(e)}")
+                time.sleep(5)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+
+event_broker = EventBroker()
+
+
+class EventStreamService:
+    @staticmethod
+    def publish(channel: str, event: str, data: dict):
+        """
+        Publishes the event to the streams of the channel on all workers. Notified in the caller's transaction,
+        so it is only delivered if the transaction commits
+        """
+        payload = json.dumps(dict(channel=channel, event=event, data=data))
+        db.session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            dict(channel=EVENT_STREAM_CHANNEL, payload=payload),
+        )
+
+    @staticmethod
+    def stream(channel: str):
+        """
+        Generates the server-sent events of the channel until the client disconnects or the maximum duration
+        of a stream is reached, the client then reconnects
+        """
+        app = current_app._get_current_object()
+
+        def generate():
+            subscription = event_broker.subscribe(channel, app)
+            try:
+                yield f"retry: {EVENT_STREAM_RETRY * 1000}\n\n"
+                closes_at = time.monotonic() + EVENT_STREAM_MAX_DURATION
+                while time.monotonic() < closes_at:
+                    try:
+                        message = subscription.get(timeout=EVENT_STREAM_HEARTBEAT)
+                    except queue.Empty:
+                        yield ": keepalive\n\n"
+                        continue
+                    if message is None:
+                        return
+                    data = json.dumps(message["data"])
+                    yield f"event: {message['event']}\ndata: {data}\n\n"
+            finally:
+                event_broker.unsubscribe(channel, subscription)
+
+        return generate()
@@ -9,6 +9,7 @@ from backend.models.dtos.mapping_dto import TaskDTOs
 from backend.models.postgis.utils import ST_Transform, ST_Area, ST_GeogFromWKB
 from backend.models.postgis.task import Task, TaskStatus, TaskAction
 from backend.models.postgis.project import Project
+from backend.models.postgis.user_task_activity import UserTaskActivity
 from backend.models.postgis.utils import NotFound, InvalidGeoJson
 
 
@@ -219,6 +220,9 @@ class SplitService:
             new_task.task_status = TaskStatus.READY.value
             new_task.create()
             new_task.task_history.extend(original_task.copy_task_history())
+            UserTaskActivity.copy_task(
+                split_task_dto.project_id, original_task.id, new_task.id
+            )
             if new_task.task_history:
                 new_task.clear_task_lock()  # since we just copied the lock
             new_task.set_task_history(
@@ -0,0 +1,35 @@
+import datetime
+
+from flask import current_app
+
+from backend import db
+from backend.models.postgis.task import Task, TaskHistory
+
+
+class LockExpiryService:
+    @staticmethod
+    def get_expiry_date() -> datetime.datetime:
+        """Locks taken before this date are treated as expired"""
+        return datetime.datetime.utcnow() - Task.auto_unlock_delta()
+
+    @staticmethod
+    def unlock_expired_tasks() -> int:
+        """
+        Unlocks every task, across all projects, that has been locked for longer than the auto-unlock delta.
+        Expired locks are found through the open locks index and unlocked one project batch at a time,
+        so a failing project doesn't block the others.
+        :return: Number of projects that had expired locks
+        """
+        expiry_date = LockExpiryService.get_expiry_date()
+        project_ids = TaskHistory.get_projects_with_expired_locks(expiry_date)
+
+        for project_id in project_ids:
+            try:
+                Task.auto_unlock_tasks(project_id)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.critical(
+                    f"Auto unlock failed for project {project_id}: {str(e)}"
+                )
+
+        return len(project_ids)
@@ -136,7 +136,11 @@ class MappingService:
             mapped_task.project_id, mapped_task.task_id, True
         )
         StatsService.update_stats_after_task_state_change(
-            mapped_task.project_id, mapped_task.user_id, last_state, new_state
+            mapped_task.project_id,
+            mapped_task.user_id,
+            last_state,
+            new_state,
+            task_id=mapped_task.task_id,
         )
 
         if mapped_task.comment:
@@ -340,7 +344,12 @@ class MappingService:
         last_action = TaskHistory.get_last_action(project_id, task_id)
 
         StatsService.update_stats_after_task_state_change(
-            project_id, last_action.user_id, current_state, undo_state, "undo"
+            project_id,
+            last_action.user_id,
+            current_state,
+            undo_state,
+            "undo",
+            task_id,
         )
 
         task.unlock_task(
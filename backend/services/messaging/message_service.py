@@ -1,8 +1,6 @@
 import re
-import time
 import datetime
 
-from cachetools import TTLCache, cached
 from typing import List
 from flask import current_app
 from sqlalchemy import text, func
@@ -15,6 +13,7 @@ from backend.models.postgis.message import Message, MessageType, NotFound
 from backend.models.postgis.notification import Notification
 from backend.models.postgis.project import Project
 from backend.models.postgis.task import TaskStatus, TaskAction, TaskHistory
+from backend.models.postgis.utils import keyset_paginate
 from backend.models.postgis.statuses import TeamRoles
 from backend.services.messaging.smtp_service import SMTPService
 from backend.services.messaging.template_service import (
@@ -25,9 +24,6 @@ from backend.services.messaging.template_service import (
 from backend.services.users.user_service import UserService, User
 
 
-message_cache = TTLCache(maxsize=512, ttl=30)
-
-
 class MessageServiceError(Exception):
     """Custom Exception to notify callers an error occurred when handling mapping"""
 
@@ -108,29 +104,46 @@ class MessageService:
 
     @staticmethod
     def send_message_to_all_contributors(project_id: int, message_dto: MessageDTO):
-        """Sends supplied message to all contributors on specified project.  Message all contributors can take
-        over a minute to run, so this method is expected to be called on its own thread"""
-
-        app = (
-            create_app()
-        )  # Because message-all run on background thread it needs it's own app context
-
-        with app.app_context():
-            contributors = Message.get_all_contributors(project_id)
-            message_dto.message = "A message from {} managers:<br/><br/>{}".format(
-                MessageService.get_project_link(project_id),
-                markdown(message_dto.message, output_format="html"),
-            )
+        """Sends supplied message to all contributors on specified project"""
+        contributors = Message.get_all_contributors(project_id)
+        message_dto.project_id = project_id
+        message_dto.message = "A message from {} managers:<br/><br/>{}".format(
+            MessageService.get_project_link(project_id),
+            markdown(message_dto.message, output_format="html"),
+        )
 
-            messages = []
-            for contributor in contributors:
-                message = Message.from_dto(contributor[0], message_dto)
-                message.message_type = MessageType.BROADCAST.value
-                message.project_id = project_id
-                user = UserService.get_user_by_id(contributor[0])
-                messages.append(dict(message=message, user=user))
+        MessageService.broadcast_message(
+            [contributor[0] for contributor in contributors],
+            message_dto,
+            MessageType.BROADCAST,
+        )
 
-            MessageService._push_messages(messages)
+    @staticmethod
+    def broadcast_message(
+        to_user_ids: list, message_dto: MessageDTO, message_type: MessageType
+    ):
+        """
+        Sends the same message to many users at once: the recipients and their notification settings are
+        resolved, the messages stored and the email alerts queued in a few statements whatever the number
+        of recipients
+        """
+        recipients = Message.broadcast(
+            to_user_ids,
+            message_dto.from_user_id,
+            message_dto.subject,
+            message_dto.message,
+            message_type,
+            message_dto.project_id,
+        )
+        SMTPService.send_email_alerts(
+            [(recipient.id, recipient.email_address) for recipient in recipients],
+            UserService.get_user_by_id(message_dto.from_user_id).username,
+            message_dto.project_id,
+            clean_html(message_dto.subject),
+            message_dto.message,
+            message_type.value,
+        )
+        db.session.commit()
 
     @staticmethod
     def _push_messages(messages):
@@ -138,7 +151,8 @@ class MessageService:
             return
 
         messages_objs = []
-        for i, message in enumerate(messages):
+        email_alerts = []
+        for message in messages:
             user = message.get("user")
             obj = message.get("message")
             # Store message in the database only if mentions option are disabled.
@@ -176,27 +190,31 @@ class MessageService:
                 messages_objs.append(obj)
                 continue
             messages_objs.append(obj)
+            email_alerts.append(message)
+
+        # Flush messages to the database, so their ids can be linked from the email alerts
+        if len(messages_objs) > 0:
+            db.session.add_all(messages_objs)
+            db.session.flush()
+            Notification.increment_unread([obj.to_user_id for obj in messages_objs])
+
+        # Email alerts are queued in the same transaction as the messages and sent in the background
+        for message in email_alerts:
+            user = message["user"]
+            obj = message["message"]
             SMTPService.send_email_alert(
                 user.email_address,
                 user.username,
                 user.is_email_verified,
-                message["message"].id,
-                UserService.get_user_by_id(message["message"].from_user_id).username,
-                message["message"].project_id,
-                message["message"].task_id,
-                clean_html(message["message"].subject),
-                message["message"].message,
+                obj.id,
+                UserService.get_user_by_id(obj.from_user_id).username,
+                obj.project_id,
+                obj.task_id,
+                clean_html(obj.subject),
+                obj.message,
                 obj.message_type,
             )
-
-            if i + 1 % 10 == 0:
-                time.sleep(0.5)
-
-        # Flush messages to the database.
-        if len(messages_objs) > 0:
-            db.session.add_all(messages_objs)
-            db.session.flush()
-            db.session.commit()
+        db.session.commit()
 
     @staticmethod
     def send_message_after_comment(
@@ -245,15 +263,15 @@ class MessageService:
 
             task_link = MessageService.get_task_link(project_id, task_id)
             messages = []
+            users = UserService.get_users_by_ids(contributed_users)
             for user_id in contributed_users:
-                try:
-                    user = UserService.get_user_by_id(user_id)
-                    # if user was mentioned, a message has already been sent to them,
-                    # so we can skip
-                    if user.username in usernames:
-                        break
-                except NotFound:
+                user = users.get(user_id)
+                if user is None:
                     continue  # If we can't find the user, keep going no need to fail
+                # if user was mentioned, a message has already been sent to them,
+                # so we can skip
+                if user.username in usernames:
+                    break
 
                 message = Message()
                 message.message_type = MessageType.TASK_COMMENT_NOTIFICATION.value
@@ -430,10 +448,10 @@ class MessageService:
                     project_id, include_chat_section=True
                 )
                 messages = []
+                users = UserService.get_users_by_ids(users_to_notify)
                 for user_id in users_to_notify:
-                    try:
-                        user = UserService.get_user_by_id(user_id)
-                    except NotFound:
+                    user = users.get(user_id)
+                    if user is None:
                         continue  # If we can't find the user, keep going no need to fail
                     message = Message()
                     message.message_type = MessageType.PROJECT_CHAT_NOTIFICATION.value
@@ -480,9 +498,11 @@ class MessageService:
             last_active_users = db.engine.execute(
                 text(query_last_active_users), project_id=project.id
             )
+            recent_user_ids = [r[0] for r in last_active_users]
+            recent_users = UserService.get_users_by_ids(recent_user_ids)
 
-            for recent_user_id in last_active_users:
-                recent_user_details = UserService.get_user_by_id(recent_user_id)
+            for recent_user_id in recent_user_ids:
+                recent_user_details = recent_users[recent_user_id]
                 user_profile_link = MessageService.get_user_profile_link(
                     recent_user_details.username
                 )
@@ -557,7 +577,6 @@ class MessageService:
         return usernames
 
     @staticmethod
-    @cached(message_cache)
     def has_user_new_messages(user_id: int) -> dict:
         """Determines if the user has any unread messages"""
         count = Notification.get_unread_message_count(user_id)
@@ -581,14 +600,17 @@ class MessageService:
         project=None,
         task_id=None,
         status=None,
+        cursor: str = None,
+        count_total: bool = False,
     ):
-        """Get all messages for user"""
+        """
+        Get all messages for user. Pages are selected by page number or, if a cursor is given, with keyset
+        pagination, in which case the total is only counted if count_total is set
+        """
         sort_column = Message.__table__.columns.get(sort_by)
         if sort_column is None:
             sort_column = Message.date
-        sort_column = (
-            sort_column.asc() if sort_direction.lower() == "asc" else sort_column.desc()
-        )
+        descending = sort_direction.lower() != "asc"
         query = Message.query
 
         if project is not None:
@@ -609,11 +631,21 @@ class MessageService:
                 User.username.ilike(from_username + "%")
             )
 
-        results = (
-            query.filter(Message.to_user_id == user_id)
-            .order_by(sort_column)
-            .paginate(page, page_size, True)
-        )
+        query = query.filter(Message.to_user_id == user_id)
+        if cursor is None:
+            order_by = sort_column.desc() if descending else sort_column.asc()
+            results = query.order_by(order_by).paginate(page, page_size, True)
+        else:
+            results = keyset_paginate(
+                query,
+                sort_column,
+                Message.id,
+                lambda message: (getattr(message, sort_column.key), message.id),
+                cursor=cursor or None,
+                per_page=page_size,
+                descending=descending,
+                count_total=count_total,
+            )
         # if results.total == 0:
         #     raise NotFound()
 
@@ -1,13 +1,35 @@
+import datetime
 import smtplib
+import threading
 import urllib.parse
+import uuid
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from itsdangerous import URLSafeTimedSerializer
 from flask import current_app
+
+from backend import db
+from backend.models.postgis.email_outbox import OutboxEmail
+from backend.models.postgis.utils import timestamp
 from backend.services.messaging.template_service import (
     get_template,
     format_username_link,
 )
+from backend.services.users.osm_service import TokenBucket
+
+# Attempts to send an email before it is marked as failed, waiting twice as long after each one
+EMAIL_MAX_ATTEMPTS = 8
+EMAIL_RETRY_DELAY = datetime.timedelta(seconds=30)
+EMAIL_MAX_RETRY_DELAY = datetime.timedelta(hours=2)
+# Time a sender has to send the emails it claimed before other senders can claim them again
+EMAIL_CLAIM_LEASE = datetime.timedelta(minutes=5)
+
+# SMTP connection of the outbox sender, kept open between batches, the number of times in a row it couldn't
+# be opened and the rate limit of the sends
+smtp_connection = None
+smtp_connection_failures = 0
+email_rate_limiter = None
+outbox_sender_lock = threading.Lock()
 
 
 class SMTPService:
@@ -26,6 +48,7 @@ class SMTPService:
 
         subject = "Confirm your email address"
         SMTPService._send_message(to_address, subject, html_template)
+        db.session.commit()
         return True
 
     @staticmethod
@@ -44,6 +67,7 @@ class SMTPService:
 
         subject = "New contact from {name}".format(name=data.get("name"))
         SMTPService._send_message(email_to, subject, message, message)
+        db.session.commit()
 
     @staticmethod
     def send_email_alert(
@@ -64,6 +88,65 @@ class SMTPService:
             return False
 
         current_app.logger.debug(f"Test if email required {to_address}")
+        if not to_address:
+            return False  # Many users will not have supplied email address so return
+
+        html_template = SMTPService._get_email_alert_template(
+            message_id, from_username, project_id, task_id, content, message_type
+        )
+        SMTPService._send_message(to_address, subject, html_template)
+
+        return True
+
+    @staticmethod
+    def send_email_alerts(
+        recipients: list,
+        from_username: str,
+        project_id: int,
+        subject: str,
+        content: str,
+        message_type: int,
+    ):
+        """
+        Queues an email alert of the same message for each recipient, rendering the template once and
+        queueing all the emails in a single statement
+        :param recipients: list of (message_id, email_address) of the message stored for each recipient
+        """
+        if len(recipients) == 0:
+            return
+
+        if current_app.config["EMAIL_FROM_ADDRESS"] is None:
+            raise ValueError("Missing TM_EMAIL_FROM_ADDRESS environment variable")
+
+        # Rendered with a random stand in for the message id, replaced by the message of each recipient
+        message_id_marker = uuid.uuid4().hex
+        html_template = SMTPService._get_email_alert_template(
+            message_id_marker, from_username, project_id, None, content, message_type
+        )
+        if current_app.config["SMTP_SETTINGS"]["host"] is None:
+            current_app.logger.debug(
+                f"Not queueing {len(recipients)} email alerts, no SMTP host set"
+            )
+            return
+
+        OutboxEmail.enqueue_many(
+            [email_address for _, email_address in recipients],
+            subject,
+            [
+                html_template.replace(message_id_marker, str(message_id))
+                for message_id, _ in recipients
+            ],
+        )
+
+    @staticmethod
+    def _get_email_alert_template(
+        message_id: int,
+        from_username: str,
+        project_id: int,
+        task_id: int,
+        content: str,
+        message_type: int,
+    ) -> str:
         from_user_link = f"{current_app.config['APP_BASE_URL']}/users/{from_username}"
         project_link = f"{current_app.config['APP_BASE_URL']}/projects/{project_id}"
         task_link = f"{current_app.config['APP_BASE_URL']}/projects/{project_id}/tasks/?search={task_id}"
@@ -71,8 +154,6 @@ class SMTPService:
             current_app.config["APP_BASE_URL"]
         )
 
-        if not to_address:
-            return False  # Many users will not have supplied email address so return
         message_path = ""
         if message_id is not None:
             message_path = f"/message/{message_id}"
@@ -90,20 +171,34 @@ class SMTPService:
             "CONTENT": format_username_link(content),
             "MESSAGE_TYPE": message_type,
         }
-        html_template = get_template("message_alert_en.html", values)
-        SMTPService._send_message(to_address, subject, html_template)
-
-        return True
+        return get_template("message_alert_en.html", values)
 
     @staticmethod
     def _send_message(
         to_address: str, subject: str, html_message: str, text_message: str = None
     ):
-        """ Helper sends SMTP message """
-        from_address = current_app.config["EMAIL_FROM_ADDRESS"]
-        if from_address is None:
+        """
+        Queues the SMTP message in the outbox, in the caller's transaction. The caller commits and the
+        message is sent by the outbox sender
+        """
+        if current_app.config["EMAIL_FROM_ADDRESS"] is None:
             raise ValueError("Missing TM_EMAIL_FROM_ADDRESS environment variable")
 
+        if current_app.config["SMTP_SETTINGS"]["host"] is None:
+            msg = SMTPService._build_message(
+                to_address, subject, html_message, text_message
+            )
+            current_app.logger.debug(msg.as_string())
+            return
+
+        current_app.logger.debug(f"Queueing email to {to_address}")
+        OutboxEmail.enqueue(to_address, subject, html_message, text_message)
+
+    @staticmethod
+    def _build_message(
+        to_address: str, subject: str, html_message: str, text_message: str = None
+    ) -> MIMEMultipart:
+        from_address = current_app.config["EMAIL_FROM_ADDRESS"]
         msg = MIMEMultipart("alternative")
         msg["Subject"] = subject
         msg["From"] = "{} Tasking Manager <{}>".format(
@@ -117,26 +212,156 @@ class SMTPService:
         if text_message:
             part1 = MIMEText(text_message, "plain")
             msg.attach(part1)
+        return msg
 
-        current_app.logger.debug(f"Sending email via SMTP {to_address}")
+    @staticmethod
+    def send_queued_emails(batch_size: int = 50) -> int:
+        """
+        Sends the emails of the outbox that are due, in batches over a single authenticated SMTP connection
+        that is kept open between runs, at most EMAIL_RATE_LIMIT emails per second. Emails that fail are
+        retried with an exponential backoff, and marked as failed when refused or out of attempts. When the
+        connection can't be opened the emails are put off, without counting an attempt
+        :return: Number of emails sent
+        """
         if current_app.config["SMTP_SETTINGS"]["host"] is None:
-            current_app.logger.debug(msg.as_string())
-        else:
-            sender = SMTPService._init_smtp_client()
-            sender.sendmail(from_address, to_address, msg.as_string())
-            sender.quit()
-        current_app.logger.debug(f"Email sent {to_address}")
+            return 0
+
+        emails_sent = 0
+        with outbox_sender_lock:
+            connected = True
+            while connected:
+                emails = OutboxEmail.claim_due(batch_size, EMAIL_CLAIM_LEASE)
+                if not emails:
+                    break
+
+                sent_ids = []
+                for index, email in enumerate(emails):
+                    connected = SMTPService._connect()
+                    if not connected:
+                        # The emails left wait for the server, backing off while it stays unreachable
+                        backoff = SMTPService._get_backoff(smtp_connection_failures - 1)
+                        OutboxEmail.postpone(
+                            [pending.id for pending in emails[index:]],
+                            timestamp() + backoff,
+                        )
+                        break
+                    if SMTPService._send_queued(email):
+                        sent_ids.append(email.id)
+
+                OutboxEmail.mark_sent(sent_ids)
+                db.session.commit()
+                emails_sent += len(sent_ids)
+                current_app.logger.debug(
+                    f"Sent {len(sent_ids)} of {len(emails)} queued emails"
+                )
+                if len(emails) < batch_size:
+                    break
+
+        return emails_sent
+
+    @staticmethod
+    def _connect() -> bool:
+        """ Opens the SMTP connection of the outbox sender, unless it is still open """
+        global smtp_connection, smtp_connection_failures
+
+        if smtp_connection is not None and SMTPService._is_connected(smtp_connection):
+            return True
+
+        try:
+            smtp_connection = SMTPService._init_smtp_client()
+        except (smtplib.SMTPException, OSError) as e:
+            smtp_connection = None
+            smtp_connection_failures += 1
+            current_app.logger.warning(f"Can't connect to the SMTP server: {str(e)}")
+            return False
+
+        smtp_connection_failures = 0
+        return True
+
+    @staticmethod
+    def _send_queued(email) -> bool:
+        """
+        Sends a claimed email of the outbox over the open connection, recording the failure if it can't be
+        sent. Only 5xx replies refusing the email mark it as failed, other failures are retried
+        """
+        global smtp_connection, email_rate_limiter
+
+        if email_rate_limiter is None:
+            rate = current_app.config["EMAIL_RATE_LIMIT"]
+            email_rate_limiter = TokenBucket(rate, burst=max(1, int(rate)))
+        email_rate_limiter.acquire()
+
+        msg = SMTPService._build_message(
+            email.to_address, email.subject, email.html_message, email.text_message
+        )
+        try:
+            smtp_connection.sendmail(
+                current_app.config["EMAIL_FROM_ADDRESS"],
+                email.to_address,
+                msg.as_string(),
+            )
+            return True
+        except smtplib.SMTPRecipientsRefused as e:
+            OutboxEmail.mark_failed(email.id, str(e))
+        except smtplib.SMTPSenderRefused as e:
+            # Refusing the sender isn't about the email, e.g. the server requires authentication
+            OutboxEmail.mark_failed(
+                email.id, str(e), SMTPService._get_retry_time(email.attempts)
+            )
+        except smtplib.SMTPResponseException as e:
+            if e.smtp_code >= 500:
+                OutboxEmail.mark_failed(email.id, str(e))
+            else:
+                OutboxEmail.mark_failed(
+                    email.id, str(e), SMTPService._get_retry_time(email.attempts)
+                )
+        except (smtplib.SMTPException, OSError) as e:
+            # The connection is dropped and opened again for the next email
+            smtp_connection = None
+            OutboxEmail.mark_failed(
+                email.id, str(e), SMTPService._get_retry_time(email.attempts)
+            )
+
+        current_app.logger.warning(f"Email {email.id} to {email.to_address} not sent")
+        return False
+
+    @staticmethod
+    def _get_retry_time(attempts: int) -> datetime.datetime:
+        """ Gets when to retry an email after its attempts, None once it is out of attempts """
+        if attempts + 1 >= EMAIL_MAX_ATTEMPTS:
+            return None
+        return timestamp() + SMTPService._get_backoff(attempts)
+
+    @staticmethod
+    def _get_backoff(attempts: int) -> datetime.timedelta:
+        """ Gets how long to wait after the attempts, twice as long after each one """
+        return min(EMAIL_RETRY_DELAY * 2 ** attempts, EMAIL_MAX_RETRY_DELAY)
+
+    @staticmethod
+    def _is_connected(connection: smtplib.SMTP) -> bool:
+        """ Checks that the kept open connection wasn't closed by the server """
+        try:
+            return connection.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
 
     @staticmethod
     def _init_smtp_client():
         """ Initialise SMTP client from app settings """
         smtp_settings = current_app.config["SMTP_SETTINGS"]
-        sender = smtplib.SMTP(smtp_settings["host"], port=smtp_settings["smtp_port"])
+        sender = smtplib.SMTP(
+            smtp_settings["host"], port=smtp_settings["smtp_port"], timeout=30
+        )
         if current_app.config["LOG_LEVEL"] == "DEBUG":
             sender.set_debuglevel(1)
-        sender.starttls()
-        if smtp_settings["smtp_user"] and smtp_settings["smtp_password"]:
-            sender.login(smtp_settings["smtp_user"], smtp_settings["smtp_password"])
+        try:
+            if smtp_settings["smtp_starttls"]:
+                sender.starttls()
+            if smtp_settings["smtp_user"] and smtp_settings["smtp_password"]:
+                sender.login(smtp_settings["smtp_user"], smtp_settings["smtp_password"])
+        except (smtplib.SMTPException, OSError):
+            sender.close()
+            raise
 
         return sender
 
@@ -14,13 +14,34 @@ from backend.models.dtos.stats_dto import (
     OrganizationTasksStatsDTO,
 )
 from backend.models.postgis.campaign import campaign_organisations
-from backend.models.postgis.organisation import Organisation
+from backend.models.postgis.organisation import Organisation, organisation_managers
 from backend.models.postgis.project import Project, ProjectInfo
 from backend.models.postgis.task import Task
 from backend.models.postgis.statuses import ProjectStatus, TaskStatus
-from backend.models.postgis.utils import NotFound
+from backend.models.postgis.utils import NotFound, count_by
+from backend.services.cache_service import RequestCache
+from backend.services.event_service import (
+    EventService,
+    MembershipChanged,
+    OrganisationUpdated,
+)
 from backend.services.users.user_service import UserService
 
+# Organisations loaded by the request and the ids of the organisations managed by each user
+organisation_cache = RequestCache("organisations")
+managed_organisations_cache = RequestCache("managed_organisations")
+
+
+@EventService.subscribe(OrganisationUpdated)
+def evict_organisation(event):
+    organisation_cache.delete(event.organisation_id)
+
+
+@EventService.subscribe(MembershipChanged)
+def evict_managed_organisations(event):
+    if event.organisation_id is not None:
+        managed_organisations_cache.clear()
+
 
 class OrganisationServiceError(Exception):
     """Custom Exception to notify callers an error occurred when handling organisations"""
@@ -33,11 +54,14 @@ class OrganisationServiceError(Exception):
 class OrganisationService:
     @staticmethod
     def get_organisation_by_id(organisation_id: int) -> Organisation:
-        org = Organisation.get(organisation_id)
-
+        org = organisation_cache.get(organisation_id)
         if org is None:
-            raise NotFound()
+            org = Organisation.get(organisation_id)
+
+            if org is None:
+                raise NotFound()
 
+            organisation_cache.set(organisation_id, org)
         return org
 
     @staticmethod
@@ -180,49 +204,40 @@ class OrganisationService:
 
     @staticmethod
     def get_organisation_stats(organisation_id: int) -> OrganizationStatsDTO:
-        projects = db.session.query(Project.id, Project.status).filter(
-            Project.organisation_id == organisation_id
+        # Count projects by status and tasks of the published projects by status, in one scan each
+        projects_by_status = count_by(
+            Project.query.filter(Project.organisation_id == organisation_id),
+            Project.status,
         )
-        published_projects = projects.filter(
-            Project.status == ProjectStatus.PUBLISHED.value
+        tasks_by_status = count_by(
+            Task.query.join(Project, Project.id == Task.project_id).filter(
+                Project.organisation_id == organisation_id,
+                Project.status == ProjectStatus.PUBLISHED.value,
+            ),
+            Task.task_status,
         )
-        active_tasks = db.session.query(
-            Task.id, Task.project_id, Task.task_status
-        ).filter(Task.project_id.in_([i.id for i in published_projects.all()]))
 
         # populate projects stats
         projects_dto = OrganizationProjectsStatsDTO()
-        projects_dto.draft = projects.filter(
-            Project.status == ProjectStatus.DRAFT.value
-        ).count()
-        projects_dto.published = published_projects.count()
-        projects_dto.archived = projects.filter(
-            Project.status == ProjectStatus.ARCHIVED.value
-        ).count()
+        projects_dto.draft = projects_by_status.get(ProjectStatus.DRAFT.value, 0)
+        projects_dto.published = projects_by_status.get(
+            ProjectStatus.PUBLISHED.value, 0
+        )
+        projects_dto.archived = projects_by_status.get(ProjectStatus.ARCHIVED.value, 0)
 
         # populate tasks stats
         tasks_dto = OrganizationTasksStatsDTO()
-        tasks_dto.ready = active_tasks.filter(
-            Task.task_status == TaskStatus.READY.value
-        ).count()
-        tasks_dto.locked_for_mapping = active_tasks.filter(
-            Task.task_status == TaskStatus.LOCKED_FOR_MAPPING.value
-        ).count()
-        tasks_dto.mapped = active_tasks.filter(
-            Task.task_status == TaskStatus.MAPPED.value
-        ).count()
-        tasks_dto.locked_for_validation = active_tasks.filter(
-            Task.task_status == TaskStatus.LOCKED_FOR_VALIDATION.value
-        ).count()
-        tasks_dto.validated = active_tasks.filter(
-            Task.task_status == TaskStatus.VALIDATED.value
-        ).count()
-        tasks_dto.invalidated = active_tasks.filter(
-            Task.task_status == TaskStatus.INVALIDATED.value
-        ).count()
-        tasks_dto.badimagery = active_tasks.filter(
-            Task.task_status == TaskStatus.BADIMAGERY.value
-        ).count()
+        tasks_dto.ready = tasks_by_status.get(TaskStatus.READY.value, 0)
+        tasks_dto.locked_for_mapping = tasks_by_status.get(
+            TaskStatus.LOCKED_FOR_MAPPING.value, 0
+        )
+        tasks_dto.mapped = tasks_by_status.get(TaskStatus.MAPPED.value, 0)
+        tasks_dto.locked_for_validation = tasks_by_status.get(
+            TaskStatus.LOCKED_FOR_VALIDATION.value, 0
+        )
+        tasks_dto.validated = tasks_by_status.get(TaskStatus.VALIDATED.value, 0)
+        tasks_dto.invalidated = tasks_by_status.get(TaskStatus.INVALIDATED.value, 0)
+        tasks_dto.badimagery = tasks_by_status.get(TaskStatus.BADIMAGERY.value, 0)
 
         # populate and return main dto
         stats_dto = OrganizationStatsDTO()
@@ -269,14 +284,25 @@ class OrganisationService:
     @staticmethod
     def is_user_an_org_manager(organisation_id: int, user_id: int):
         """Check that the user is an manager for the org"""
+        OrganisationService.get_organisation_by_id(organisation_id)
 
-        org = Organisation.get(organisation_id)
-
-        if org is None:
-            raise NotFound()
-        user = UserService.get_user_by_id(user_id)
+        return organisation_id in OrganisationService.get_managed_organisation_ids(
+            user_id
+        )
 
-        return user in org.managers
+    @staticmethod
+    def get_managed_organisation_ids(user_id: int) -> frozenset:
+        """Gets the ids of the organisations the user is a manager of, loaded once per request"""
+        organisation_ids = managed_organisations_cache.get(user_id)
+        if organisation_ids is None:
+            organisation_ids = frozenset(
+                row.organisation_id
+                for row in db.session.query(organisation_managers.c.organisation_id)
+                .filter(organisation_managers.c.user_id == user_id)
+                .all()
+            )
+            managed_organisations_cache.set(user_id, organisation_ids)
+        return organisation_ids
 
     @staticmethod
     def get_campaign_organisations_as_dto(campaign_id: int, user_id: int):
@@ -0,0 +1,80 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Query counters active on each thread
+local = threading.local()
+
+
+class QueryCounter:
+    """Number of queries run while the counter is active"""
+
+    def __init__(self):
+        self.count = 0
+        self.started = time.perf_counter()
+
+    def start(self):
+        if not hasattr(local, "counters"):
+            local.counters = []
+        local.counters.append(self)
+        return self
+
+    def stop(self):
+        if self in getattr(local, "counters", ()):
+            local.counters.remove(self)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    for counter in getattr(local, "counters", ()):
+        counter.count += 1
+
+
+class ProfilerService:
+    @staticmethod
+    @contextmanager
+    def count_queries():
+        """
+        Counts the queries run on this thread by the block
+        e.g. with ProfilerService.count_queries() as queries: ... then queries.count
+        """
+        counter = QueryCounter().start()
+        try:
+            yield counter
+        finally:
+            counter.stop()
+
+    @staticmethod
+    def start_request():
+        """Starts counting the queries of the request when PROFILE_QUERIES is enabled"""
+        ProfilerService.end_request()
+        if current_app.config.get("PROFILE_QUERIES"):
+            g.query_counter = QueryCounter().start()
+
+    @staticmethod
+    def report_request(response):
+        """Reports the number of queries and the duration of the request in its headers and the log"""
+        counter = g.get("query_counter")
+        if counter is None:
+            return response
+
+        duration = (time.perf_counter() - counter.started) * 1000
+        response.headers["X-Query-Count"] = str(counter.count)
+        response.headers[
+            "Server-Timing"
+        ] = f'db;desc="{counter.count} queries", total;dur={duration:.1f}'
+        current_app.logger.info(
+            f"{request.method} {request.path} ran {counter.count} queries in {duration:.1f}ms"
+        )
+        return response
+
+    @staticmethod
+    def end_request(exception=None):
+        """Stops counting the queries of the request"""
+        counter = g.pop("query_counter", None)
+        if counter is not None:
+            counter.stop()
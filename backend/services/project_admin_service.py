@@ -86,10 +86,8 @@ class ProjectAdminService:
             tasks = draft_project_dto.tasks
         ProjectAdminService._attach_tasks_to_project(draft_project, tasks)
 
-        if draft_project_dto.cloneFromProjectId:
-            draft_project.save()  # Update the clone
-        else:
-            draft_project.create()  # Create the new project
+        # Clones are already in the session, both are created so the new project is counted
+        draft_project.create()
 
         draft_project.set_default_changeset_comment()
         draft_project.set_country_info()
@@ -1,10 +1,11 @@
 from flask import current_app
+from typing import List
 import math
 import geojson
 from geoalchemy2 import shape
-from sqlalchemy import func, distinct, desc, or_, and_
+from sqlalchemy import func, desc, or_, and_, case, cast
+from sqlalchemy.types import JSON, Text
 from shapely.geometry import Polygon, box
-from cachetools import TTLCache, cached
 
 from backend import db
 from backend.api.utils import validate_date_input
@@ -28,19 +29,52 @@ from backend.models.postgis.statuses import (
 )
 from backend.models.postgis.campaign import Campaign
 from backend.models.postgis.organisation import Organisation
-from backend.models.postgis.task import TaskHistory
 from backend.models.postgis.utils import (
     NotFound,
+    keyset_paginate,
     ST_Intersects,
     ST_MakeEnvelope,
     ST_Transform,
     ST_Area,
 )
 from backend.models.postgis.interests import project_interests
+from backend.services.cache_service import Cache
+from backend.services.event_service import (
+    EventService,
+    CampaignUpdated,
+    OrganisationUpdated,
+    ProjectUpdated,
+    TeamUpdated,
+)
 from backend.services.users.user_service import UserService
 
 
-search_cache = TTLCache(maxsize=128, ttl=300)
+# Search results keyed by the normalized search criteria and the permission fingerprint of the user. Cleared
+# whenever a project, organisation, team or campaign changes, the ttl covers task stats shown in the results
+search_cache = Cache(
+    "project_search", maxsize=1024, ttl=300, model=ProjectSearchResultsDTO
+)
+# Map results of a search, keyed like the search cache but without the paging and ordering criteria
+map_results_cache = Cache("project_search_map_results", maxsize=256, ttl=300)
+
+
+@EventService.subscribe(
+    ProjectUpdated, OrganisationUpdated, TeamUpdated, CampaignUpdated
+)
+def evict_search_results(event):
+    search_cache.clear()
+    map_results_cache.clear()
+
+
+# Search criteria that don't change which projects match a search
+MAP_RESULTS_IGNORED_CRITERIA = (
+    "page",
+    "cursor",
+    "count_total",
+    "order_by",
+    "order_by_type",
+    "omit_map_results",
+)
 
 # max area allowed for passed in bbox, calculation shown to help future maintenance
 # client resolution (mpp)* arbitrary large map size on a large screen in pixels * 50% buffer, all squared
@@ -79,6 +113,7 @@ class ProjectSearchService:
                 Project.tasks_validated,
                 Project.status,
                 Project.total_tasks,
+                Project.total_contributors,
                 Project.last_updated,
                 Project.due_date,
                 Project.country,
@@ -115,10 +150,9 @@ class ProjectSearchService:
         return query
 
     @staticmethod
-    def create_result_dto(project, preferred_locale, total_contributors):
-        project_info_dto = ProjectInfo.get_dto_for_locale(
-            project.id, preferred_locale, project.default_locale
-        )
+    def create_result_dto(
+        project, project_info_dto, total_contributors, active_mappers, campaigns
+    ):
         list_dto = ListSearchResultDTO()
         list_dto.project_id = project.id
         list_dto.locale = project_info_dto.locale
@@ -143,81 +177,210 @@ class ProjectSearchService:
             project.tasks_bad_imagery,
         )
         list_dto.status = ProjectStatus(project.status).name
-        list_dto.active_mappers = Project.get_active_mappers(project.id)
+        list_dto.active_mappers = active_mappers
         list_dto.total_contributors = total_contributors
         list_dto.country = project.country
         list_dto.organisation_name = project.organisation_name
         list_dto.organisation_logo = project.organisation_logo
-        list_dto.campaigns = Project.get_project_campaigns(project.id)
+        list_dto.campaigns = campaigns
 
         return list_dto
 
     @staticmethod
-    def get_total_contributions(paginated_results):
-        paginated_projects_ids = [p.id for p in paginated_results]
+    def create_result_dtos(projects, preferred_locale) -> List[ListSearchResultDTO]:
+        """
+        Creates the list DTOs for rows of the search query. Project info, active mappers and campaigns are
+        loaded for all rows at once, so the number of queries doesn't grow with the page size.
+        """
+        project_ids = [p.id for p in projects]
+        project_info_dtos = ProjectInfo.get_dtos_for_locale(
+            [(p.id, p.default_locale) for p in projects], preferred_locale
+        )
+        active_mappers = Project.get_active_mappers_for_projects(project_ids)
+        campaigns = Project.get_campaigns_for_projects(project_ids)
 
-        # We need to make a join to return projects without contributors.
-        project_contributors_count = (
-            Project.query.with_entities(
-                Project.id, func.count(distinct(TaskHistory.user_id)).label("total")
-            )
-            .filter(Project.id.in_(paginated_projects_ids))
-            .outerjoin(
-                TaskHistory,
-                and_(
-                    TaskHistory.project_id == Project.id,
-                    TaskHistory.action != "COMMENT",
-                ),
+        return [
+            ProjectSearchService.create_result_dto(
+                p,
+                project_info_dtos[p.id],
+                p.total_contributors,
+                active_mappers[p.id],
+                campaigns[p.id],
             )
-            .group_by(Project.id)
-            .all()
+            for p in projects
+        ]
+
+    @staticmethod
+    def get_permission_fingerprint(user) -> tuple:
+        """Gets the user attributes that decide which projects the user can see, map and validate"""
+        if user is None:
+            return ("ANONYMOUS",)
+        if user.role == UserRole.ADMIN.value:
+            return (UserRole.ADMIN.name,)
+
+        return (
+            user.role,
+            user.mapping_level,
+            tuple(sorted(t.team_id for t in user.teams)),
+            tuple(sorted(o.id for o in user.organisations)),
         )
 
-        return [p.total for p in project_contributors_count]
+    @staticmethod
+    def get_search_cache_key(
+        search_dto: ProjectSearchDTO, user, ignored_criteria=()
+    ) -> tuple:
+        """
+        Builds the cache key of a search from the normalized search criteria, so equivalent searches share an
+        entry, and the permission fingerprint of the user, so results are never shared across permissions
+        """
+        criteria = []
+        for field, value in search_dto.to_primitive().items():
+            if value is None or value == [] or field in ignored_criteria:
+                continue
+            if isinstance(value, list):
+                value = tuple(sorted(value))
+            criteria.append((field, value))
+
+        return (
+            tuple(sorted(criteria)),
+            ProjectSearchService.get_permission_fingerprint(user),
+        )
 
     @staticmethod
-    @cached(search_cache)
     def search_projects(search_dto: ProjectSearchDTO, user) -> ProjectSearchResultsDTO:
+        """Searches all projects for matches to the criteria provided by the user, using the search cache"""
+        if search_dto.favorited_by or search_dto.mapped_by:
+            # Results depend on the user's own favorites and contributions, which change without any project
+            # changing, so these searches aren't cached
+            return ProjectSearchService._search_projects(search_dto, user)
+
+        key = ProjectSearchService.get_search_cache_key(search_dto, user)
+        results_dto = search_cache.get(key)
+        if results_dto is not None:
+            return results_dto
+
+        results_dto = ProjectSearchService._search_projects(search_dto, user)
+        search_cache.set(key, results_dto)
+
+        return results_dto
+
+    @staticmethod
+    def _search_projects(search_dto: ProjectSearchDTO, user) -> ProjectSearchResultsDTO:
         """Searches all projects for matches to the criteria provided by the user"""
-        all_results, paginated_results = ProjectSearchService._filter_projects(
-            search_dto, user
-        )
-        if paginated_results.total == 0:
-            raise NotFound()
+        query = ProjectSearchService._filter_projects(search_dto, user)
+
+        if search_dto.cursor is None:
+            order_by = search_dto.order_by
+            if search_dto.order_by_type == "DESC":
+                order_by = desc(search_dto.order_by)
+
+            query = query.order_by(order_by).distinct(search_dto.order_by, Project.id)
+            paginated_results = query.paginate(search_dto.page, 14, True)
+            if paginated_results.total == 0:
+                raise NotFound()
+        else:
+            paginated_results = ProjectSearchService._keyset_paginate(query, search_dto)
 
         dto = ProjectSearchResultsDTO()
-        dto.results = [
-            ProjectSearchService.create_result_dto(
-                p,
-                search_dto.preferred_locale,
-                Project.get_project_total_contributions(p[0]),
-            )
-            for p in paginated_results.items
-        ]
+        dto.results = ProjectSearchService.create_result_dtos(
+            paginated_results.items, search_dto.preferred_locale
+        )
         dto.pagination = Pagination(paginated_results)
         if search_dto.omit_map_results:
             return dto
 
-        features = []
-        for project in all_results:
-            # This loop creates a geojson feature collection so you can see all active projects on the map
-            properties = {
-                "projectId": project.id,
-                "priority": ProjectPriority(project.priority).name,
-            }
-            # centroid = project.centroid
-            feature = geojson.Feature(
-                geometry=geojson.loads(project.centroid), properties=properties
-            )
-            features.append(feature)
-        feature_collection = geojson.FeatureCollection(features)
-        dto.map_results = feature_collection
+        # Kept for clients that don't use the map results endpoint yet, the map results are cached separately
+        # so changing page doesn't query them again
+        dto.map_results = geojson.loads(
+            ProjectSearchService.get_projects_map_results(search_dto, user)
+        )
 
         return dto
 
+    @staticmethod
+    def _keyset_paginate(query, search_dto: ProjectSearchDTO):
+        """Paginates the search results with the search cursor, ordering by a projects column and the project id"""
+        sort_column = Project.__table__.columns.get(search_dto.order_by)
+        if sort_column is None:
+            raise ValueError(f"Cursor pagination can't order by {search_dto.order_by}")
+
+        query = query.add_columns(sort_column.label("sort_value")).distinct(
+            sort_column, Project.id
+        )
+        paginated_results = keyset_paginate(
+            query,
+            sort_column,
+            Project.id,
+            lambda project: (project.sort_value, project.id),
+            cursor=search_dto.cursor or None,
+            per_page=14,
+            descending=search_dto.order_by_type == "DESC",
+            count_total=search_dto.count_total,
+        )
+        if len(paginated_results.items) == 0 and not search_dto.cursor:
+            raise NotFound()
+
+        return paginated_results
+
+    @staticmethod
+    def get_projects_map_results(search_dto: ProjectSearchDTO, user) -> str:
+        """
+        Gets the centroids of all the projects matching the search as a serialised GeoJSON FeatureCollection,
+        using the map results cache
+        """
+        if search_dto.favorited_by or search_dto.mapped_by:
+            return ProjectSearchService._get_projects_map_results(search_dto, user)
+
+        key = ProjectSearchService.get_search_cache_key(
+            search_dto, user, MAP_RESULTS_IGNORED_CRITERIA
+        )
+        map_results = map_results_cache.get(key)
+        if map_results is not None:
+            return map_results
+
+        map_results = ProjectSearchService._get_projects_map_results(search_dto, user)
+        map_results_cache.set(key, map_results)
+
+        return map_results
+
+    @staticmethod
+    def _get_projects_map_results(search_dto: ProjectSearchDTO, user) -> str:
+        """Builds the map results FeatureCollection in a single aggregate query"""
+        project_ids = (
+            ProjectSearchService._filter_projects(search_dto, user)
+            .with_entities(Project.id)
+            .subquery()
+        )
+        priority_name = case(
+            [
+                (Project.priority == priority.value, priority.name)
+                for priority in ProjectPriority
+            ]
+        )
+        feature = func.json_build_object(
+            "type",
+            "Feature",
+            "geometry",
+            cast(Project.centroid.ST_AsGeoJSON(), JSON),
+            "properties",
+            func.json_build_object("projectId", Project.id, "priority", priority_name),
+        )
+        feature_collection = func.json_build_object(
+            "type",
+            "FeatureCollection",
+            "features",
+            func.coalesce(func.json_agg(feature), cast("[]", JSON)),
+        )
+
+        return (
+            db.session.query(cast(feature_collection, Text))
+            .filter(Project.id.in_(project_ids))
+            .scalar()
+        )
+
     @staticmethod
     def _filter_projects(search_dto: ProjectSearchDTO, user):
-        """Filters all projects based on criteria provided by user"""
+        """Filters all projects based on criteria provided by user, the returned query isn't ordered"""
 
         query = ProjectSearchService.create_search_query(user)
 
@@ -336,12 +499,6 @@ class ProjectSearchService:
             created_lte = validate_date_input(search_dto.created_lte)
             query = query.filter(Project.created <= created_lte)
 
-        order_by = search_dto.order_by
-        if search_dto.order_by_type == "DESC":
-            order_by = desc(search_dto.order_by)
-
-        query = query.order_by(order_by).distinct(search_dto.order_by, Project.id)
-
         if search_dto.managed_by and user.role != UserRole.ADMIN.value:
             # Get all the projects associated with the user and team.
             orgs_projects_ids = [[p.id for p in u.projects] for u in user.organisations]
@@ -365,18 +522,7 @@ class ProjectSearchService:
             ids = tuple(set(orgs_projects_ids))
             query = query.filter(Project.id.in_(ids))
 
-        all_results = []
-        if not search_dto.omit_map_results:
-            query_result = query
-            query_result.column_descriptions.clear()
-            query_result.add_column(Project.id)
-            query_result.add_column(Project.centroid.ST_AsGeoJSON().label("centroid"))
-            query_result.add_column(Project.priority)
-            all_results = query_result.all()
-
-        paginated_results = query.paginate(search_dto.page, 14, True)
-
-        return all_results, paginated_results
+        return query
 
     @staticmethod
     def filter_by_user_permission(query, user, permission: str):
@@ -1,6 +1,13 @@
-from cachetools import TTLCache, cached
+import hashlib
+import json
+
+from cachetools import LRUCache
 from flask import current_app
-from backend.models.dtos.mapping_dto import TaskDTOs
+from backend.models.dtos.mapping_dto import (
+    TaskDTOs,
+    TaskStateChangeDTO,
+    TaskStateChangesDTO,
+)
 from backend.models.dtos.project_dto import (
     ProjectDTO,
     ProjectSummary,
@@ -13,15 +20,26 @@ from backend.models.dtos.project_dto import (
 
 from backend.models.postgis.organisation import Organisation
 from backend.models.postgis.project import Project, ProjectStatus, MappingLevel
+from backend.models.postgis.project_stats import ProjectStats
 from backend.models.postgis.statuses import (
     MappingNotAllowed,
     ValidatingNotAllowed,
     MappingPermission,
     ValidationPermission,
     TeamRoles,
+    TaskStatus,
 )
 from backend.models.postgis.task import Task, TaskHistory
 from backend.models.postgis.utils import NotFound
+from backend.services.cache_service import Cache, RequestCache
+from backend.services.event_service import (
+    EventService,
+    CampaignUpdated,
+    OrganisationUpdated,
+    ProjectUpdated,
+    TaskStateChanged,
+    TeamUpdated,
+)
 from backend.services.users.user_service import UserService
 from backend.services.project_search_service import ProjectSearchService
 from backend.services.project_admin_service import ProjectAdminService
@@ -29,7 +47,48 @@ from backend.services.team_service import TeamService
 from sqlalchemy import func, or_
 from sqlalchemy.sql.expression import true
 
-summary_cache = TTLCache(maxsize=1024, ttl=600)
+# Project summaries by project, evicted whenever the project, its tasks or the organisation, teams and
+# campaigns it shows change
+summary_cache = Cache(
+    "project_summary",
+    maxsize=1024,
+    ttl=6 * 3600,
+    local_ttl=600,
+    model=ProjectSummary,
+)
+# Serialised task geometries keyed by project and task geometry version, bounded by their size in bytes
+task_geometry_cache = LRUCache(
+    maxsize=256 * 1024 * 1024,
+    getsizeof=lambda geometries: sum(len(g) for g in geometries.values()),
+)
+# Serialised task grids keyed by project, task state version and filters, bounded by their size in bytes
+task_grid_cache = LRUCache(maxsize=64 * 1024 * 1024, getsizeof=len)
+# Projects loaded by the request
+project_cache = RequestCache("projects")
+
+
+@EventService.subscribe(TaskStateChanged, ProjectUpdated)
+def evict_project_summary(event):
+    summary_cache.evict(event.project_id)
+
+
+@EventService.subscribe(ProjectUpdated)
+def evict_deleted_project(event):
+    if event.deleted:
+        project_cache.delete(event.project_id)
+
+
+@EventService.subscribe(CampaignUpdated)
+def evict_campaign_project_summaries(event):
+    if event.project_id is not None:
+        summary_cache.evict(event.project_id)
+    else:
+        summary_cache.clear()
+
+
+@EventService.subscribe(OrganisationUpdated, TeamUpdated)
+def evict_project_summaries(event):
+    summary_cache.clear()
 
 
 class ProjectServiceError(Exception):
@@ -43,10 +102,13 @@ class ProjectServiceError(Exception):
 class ProjectService:
     @staticmethod
     def get_project_by_id(project_id: int) -> Project:
-        project = Project.get(project_id)
+        project = project_cache.get(project_id)
         if project is None:
-            raise NotFound()
+            project = Project.get(project_id)
+            if project is None:
+                raise NotFound()
 
+            project_cache.set(project_id, project)
         return project
 
     @staticmethod
@@ -64,10 +126,6 @@ class ProjectService:
 
         return project
 
-    @staticmethod
-    def auto_unlock_tasks(project_id: int):
-        Task.auto_unlock_tasks(project_id)
-
     @staticmethod
     def delete_tasks(project_id: int, tasks_ids):
         # Validate project exists.
@@ -260,6 +318,145 @@ class ProjectService:
         project = ProjectService.get_project_by_id(project_id)
         return project.tasks_as_geojson(task_ids_str, order_by, order_by_type, status)
 
+    @staticmethod
+    def get_project_tasks_etag(
+        project_id,
+        task_ids_str: str,
+        order_by: str = None,
+        order_by_type: str = "ASC",
+        status: int = None,
+    ) -> str:
+        """Gets an ETag for the project tasks, it only changes when a task of the project changes"""
+        task_state_version, _ = Project.get_task_versions(project_id)
+        filters = f"{task_ids_str}|{order_by}|{order_by_type}|{status}"
+        filters_digest = hashlib.md5(filters.encode("utf-8")).hexdigest()[:8]
+        return f"{project_id}-{task_state_version}-{filters_digest}"
+
+    @staticmethod
+    def get_project_task_geometries(project_id: int, task_geometry_version: int):
+        """Gets the serialised task geometries of the project, cached until tasks are split or deleted"""
+        key = (project_id, task_geometry_version)
+        geometries = task_geometry_cache.get(key)
+        if geometries is None:
+            geometries = Task.get_tasks_geometries_as_geojson(project_id)
+            try:
+                task_geometry_cache[key] = geometries
+            except ValueError:
+                pass  # Too large to be cached
+
+        return geometries
+
+    @staticmethod
+    def get_project_tasks_as_geojson_string(
+        project_id,
+        task_ids_str: str,
+        order_by: str = None,
+        order_by_type: str = "ASC",
+        status: int = None,
+    ) -> str:
+        """
+        Gets the project tasks as a serialised GeoJSON FeatureCollection. Grids are cached by task state
+        version, and geometries by task geometry version, so only task state changes are queried again.
+        """
+        task_state_version, task_geometry_version = Project.get_task_versions(
+            project_id
+        )
+        key = (
+            project_id,
+            task_state_version,
+            task_ids_str,
+            order_by,
+            order_by_type,
+            status,
+        )
+        tasks_geojson = task_grid_cache.get(key)
+        if tasks_geojson is not None:
+            return tasks_geojson
+
+        tasks = Task.get_tasks_state(
+            project_id, task_ids_str, order_by, order_by_type, status
+        )
+        geometries = ProjectService.get_project_task_geometries(
+            project_id, task_geometry_version
+        )
+        if any(task.id not in geometries for task in tasks):
+            # Tasks were split while we were reading them, fetch geometries again without caching them
+            geometries = Task.get_tasks_geometries_as_geojson(project_id)
+
+        features = []
+        for task in tasks:
+            task_properties = json.dumps(
+                dict(
+                    taskId=task.id,
+                    taskX=task.x,
+                    taskY=task.y,
+                    taskZoom=task.zoom,
+                    taskIsSquare=task.is_square,
+                    taskStatus=TaskStatus(task.task_status).name,
+                    lockedBy=task.locked_by,
+                )
+            )
+            features.append(
+                f'{{"type": "Feature", "geometry": {geometries[task.id]}, '
+                f'"properties": {task_properties}}}'
+            )
+
+        tasks_geojson = (
+            '{"type": "FeatureCollection", "features": [' + ", ".join(features) + "]}"
+        )
+        try:
+            task_grid_cache[key] = tasks_geojson
+        except ValueError:
+            pass  # Too large to be cached
+
+        return tasks_geojson
+
+    @staticmethod
+    def get_task_state_changes(
+        project_id: int, since_version: int = None, since_date=None
+    ) -> TaskStateChangesDTO:
+        """
+        Gets the tasks whose status or lock changed since the supplied cursor, either a task state version
+        or a date. With no cursor only the current cursor is returned, for clients to start following changes.
+        """
+        task_state_version, task_geometry_version = Project.get_task_versions(
+            project_id
+        )
+        changes_dto = TaskStateChangesDTO()
+        changes_dto.cursor = task_state_version
+
+        if since_version is not None:
+            # Tasks were added or removed, clients need to fetch the whole grid again
+            changes_dto.refetch = task_geometry_version > since_version
+            tasks = Task.get_tasks_changed_since_version(project_id, since_version)
+        elif since_date is not None:
+            tasks = Task.get_tasks_changed_since_date(project_id, since_date)
+        else:
+            return changes_dto
+
+        for task in tasks:
+            task_dto = TaskStateChangeDTO()
+            task_dto.task_id = task.id
+            task_dto.task_status = TaskStatus(task.task_status).name
+            task_dto.locked_by = task.locked_by
+            changes_dto.tasks.append(task_dto)
+
+        return changes_dto
+
+    @staticmethod
+    def stream_project_tasks(
+        project_id,
+        task_ids_str: str,
+        order_by: str = None,
+        order_by_type: str = "ASC",
+        status: int = None,
+    ):
+        """Gets a generator streaming the project tasks as a GeoJSON FeatureCollection"""
+        ProjectService.exists(project_id)
+        return Task.stream_tasks_as_geojson_feature_collection(
+            project_id, task_ids_str, order_by, order_by_type, status
+        )
+
     @staticmethod
     def get_project_aoi(project_id):
         project = ProjectService.get_project_by_id(project_id)
@@ -473,7 +670,7 @@ class ProjectService:
         return True, "User allowed to validate"
 
     @staticmethod
-    @cached(summary_cache)
+    @summary_cache.cached(partition_by_first_arg=True)
     def get_project_summary(
         project_id: int, preferred_locale: str = "en"
     ) -> ProjectSummary:
@@ -499,15 +696,10 @@ class ProjectService:
         query = ProjectSearchService.create_search_query()
         projects = query.filter(Project.featured == true()).group_by(Project.id).all()
 
-        # Get total contributors.
-        contrib_counts = ProjectSearchService.get_total_contributions(projects)
-        zip_items = zip(projects, contrib_counts)
-
         dto = ProjectSearchResultsDTO()
-        dto.results = [
-            ProjectSearchService.create_result_dto(p, preferred_locale, t)
-            for p, t in zip_items
-        ]
+        dto.results = ProjectSearchService.create_result_dtos(
+            projects, preferred_locale
+        )
 
         return dto
 
@@ -534,11 +726,9 @@ class ProjectService:
         return project.get_project_title(preferred_locale)
 
     @staticmethod
-    @cached(TTLCache(maxsize=1024, ttl=600))
     def get_project_stats(project_id: int) -> ProjectStatsDTO:
         """Gets the project stats DTO"""
-        project = ProjectService.get_project_by_id(project_id)
-        return project.get_project_stats()
+        return ProjectStats.get_project_stats_dto(project_id)
 
     @staticmethod
     def get_project_user_stats(project_id: int, username: str) -> ProjectUserStatsDTO:
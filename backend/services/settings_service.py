@@ -1,13 +1,13 @@
-from cachetools import TTLCache, cached
 from flask import current_app
 from backend.models.dtos.settings_dto import SupportedLanguage, SettingsDTO
+from backend.services.cache_service import Cache
 
-settings_cache = TTLCache(maxsize=4, ttl=300)
+settings_cache = Cache("settings", maxsize=4, ttl=300, model=SettingsDTO)
 
 
 class SettingsService:
     @staticmethod
-    @cached(settings_cache)
+    @settings_cache.cached
     def get_settings():
         """ Gets all settings required by the client """
         settings_dto = SettingsDTO()
@@ -1,8 +1,7 @@
-from cachetools import TTLCache, cached
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import date, timedelta
-from sqlalchemy import func, desc, cast, extract, or_, tuple_
+from sqlalchemy import func, desc, extract, or_, tuple_
 from sqlalchemy.sql.functions import coalesce
-from sqlalchemy.types import Time
 
 from backend import db
 from backend.models.dtos.stats_dto import (
@@ -14,8 +13,6 @@ from backend.models.dtos.stats_dto import (
     ProjectActivityDTO,
     ProjectLastActivityDTO,
     HomePageStatsDTO,
-    OrganizationListStatsDTO,
-    CampaignStatsDTO,
     TaskStats,
     TaskStatsDTO,
     GenderStatsDTO,
@@ -23,19 +20,65 @@ from backend.models.dtos.stats_dto import (
 )
 
 from backend.models.dtos.project_dto import ProjectSearchResultsDTO
-from backend.models.postgis.campaign import Campaign, campaign_projects
-from backend.models.postgis.organisation import Organisation
+from backend.models.postgis.campaign import campaign_projects
+from backend.models.postgis.global_stats import GlobalStats
 from backend.models.postgis.project import Project
+from backend.models.postgis.project_stats import ProjectStats
 from backend.models.postgis.statuses import TaskStatus, MappingLevel, UserGender
 from backend.models.postgis.task import TaskHistory, User, Task, TaskAction
-from backend.models.postgis.utils import timestamp, NotFound  # noqa: F401
+from backend.models.postgis.utils import (  # noqa: F401
+    timestamp,
+    NotFound,
+    count_filtered,
+)
+from backend.services.event_service import (
+    EventService,
+    CampaignUpdated,
+    OrganisationUpdated,
+    ProjectUpdated,
+    TaskStateChanged,
+)
 from backend.services.project_service import ProjectService
 from backend.services.project_search_service import ProjectSearchService
 from backend.services.users.user_service import UserService
 from backend.services.organisation_service import OrganisationService
 from backend.services.campaign_service import CampaignService
 
-homepage_stats_cache = TTLCache(maxsize=4, ttl=30)
+
+def init_project_stats_worker():
+    """ Runs in each process refreshing project stats in parallel, giving it its own app and connections """
+    from backend import create_app
+
+    create_app().app_context().push()
+
+
+def refresh_project_task_counters(first_id: int, last_id: int, dry_run: bool):
+    """ Recounts the task counters of a range of project ids, in the calling or a worker process """
+    return (
+        first_id,
+        last_id,
+        Project.refresh_task_counters(first_id, last_id, dry_run),
+    )
+
+
+@EventService.subscribe(TaskStateChanged)
+def update_global_task_counters(event):
+    if event.new_state is None:
+        # Tasks were locked or unlocked
+        GlobalStats.refresh_mappers_online()
+    elif event.task_id is not None:
+        GlobalStats.record_task_state_change(
+            event.project_id, event.task_id, event.last_state, event.new_state
+        )
+
+
+@EventService.subscribe(ProjectUpdated, OrganisationUpdated, CampaignUpdated)
+def update_global_project_counters(event):
+    # Changes to a project only recount the projects when it is created or deleted, the others are caught by
+    # the scheduled refresh
+    if isinstance(event, ProjectUpdated) and not (event.created or event.deleted):
+        return
+    GlobalStats.refresh_project_counters()
 
 
 class StatsService:
@@ -46,6 +89,7 @@ class StatsService:
         last_state: TaskStatus,
         new_state: TaskStatus,
         action="change",
+        task_id: int = None,
     ):
         """ Update stats when a task has had a state change """
 
@@ -63,6 +107,15 @@ class StatsService:
         )
         UserService.upsert_mapped_projects(user_id, project_id)
         project.last_updated = timestamp()
+        EventService.publish(
+            TaskStateChanged(
+                project_id,
+                task_id,
+                user_id=user_id,
+                last_state=last_state.name,
+                new_state=new_state.name,
+            )
+        )
 
         # Transaction will be saved when task is saved
         return project, user
@@ -159,7 +212,7 @@ class StatsService:
         """ Get all projects ordered by task_history """
 
         rate_func = func.count(TaskHistory.user_id) / extract(
-            "epoch", func.sum(cast(TaskHistory.action_date, Time))
+            "epoch", func.sum(TaskHistory.lock_duration)
         )
 
         query = (
@@ -173,8 +226,7 @@ class StatsService:
                     TaskHistory.action == TaskAction.LOCKED_FOR_VALIDATION.name,
                 )
             )
-            .filter(TaskHistory.action_text is not None)
-            .filter(TaskHistory.action_text != "")
+            .filter(TaskHistory.lock_duration > timedelta(0))
             .group_by(TaskHistory.project_id)
             .order_by(desc("rate"))
             .limit(10)
@@ -183,14 +235,8 @@ class StatsService:
 
         projects_query = ProjectSearchService.create_search_query()
         projects = projects_query.filter(Project.id == query.c.id).all()
-        # Get total contributors.
-        contrib_counts = ProjectSearchService.get_total_contributions(projects)
-        zip_items = zip(projects, contrib_counts)
-
         dto = ProjectSearchResultsDTO()
-        dto.results = [
-            ProjectSearchService.create_result_dto(p, "en", t) for p, t in zip_items
-        ]
+        dto.results = ProjectSearchService.create_result_dtos(projects, "en")
 
         return dto
 
@@ -326,162 +372,81 @@ class StatsService:
         return contrib_dto
 
     @staticmethod
-    @cached(homepage_stats_cache)
     def get_homepage_stats(abbrev=True) -> HomePageStatsDTO:
         """ Get overall TM stats to give community a feel for progress that's being made """
-        dto = HomePageStatsDTO()
-        dto.total_projects = Project.query.with_entities(
-            func.count(Project.id)
-        ).scalar()
-        dto.mappers_online = (
-            Task.query.with_entities(func.count(Task.locked_by.distinct()))
-            .filter(Task.locked_by.isnot(None))
-            .scalar()
-        )
-        dto.total_mappers = User.query.with_entities(func.count(User.id)).scalar()
-        dto.tasks_mapped = (
-            Task.query.with_entities(func.count())
-            .filter(
-                Task.task_status.in_(
-                    (TaskStatus.MAPPED.value, TaskStatus.VALIDATED.value)
-                )
-            )
-            .scalar()
-        )
-        if not abbrev:
-            dto.total_validators = (
-                Task.query.filter(Task.task_status == TaskStatus.VALIDATED.value)
-                .distinct(Task.validated_by)
-                .count()
-            )
-            dto.tasks_validated = Task.query.filter(
-                Task.task_status == TaskStatus.VALIDATED.value
-            ).count()
-
-            dto.total_area = Project.query.with_entities(
-                func.coalesce(func.sum(func.ST_Area(Project.geometry, True) / 1000000))
-            ).scalar()
-
-            dto.total_mapped_area = (
-                Task.query.with_entities(
-                    func.coalesce(func.sum(func.ST_Area(Task.geometry, True) / 1000000))
-                )
-                .filter(Task.task_status == TaskStatus.MAPPED.value)
-                .scalar()
-            )
-
-            dto.total_validated_area = (
-                Task.query.with_entities(
-                    func.coalesce(func.sum(func.ST_Area(Task.geometry, True) / 1000000))
-                )
-                .filter(Task.task_status == TaskStatus.VALIDATED.value)
-                .scalar()
-            )
-
-            unique_campaigns = Campaign.query.with_entities(
-                func.count(Campaign.id)
-            ).scalar()
-
-            linked_campaigns_count = (
-                Campaign.query.join(
-                    campaign_projects, Campaign.id == campaign_projects.c.campaign_id
-                )
-                .with_entities(
-                    Campaign.name, func.count(campaign_projects.c.campaign_id)
-                )
-                .group_by(Campaign.id)
-                .all()
-            )
-
-            subquery = (
-                db.session.query(campaign_projects.c.project_id.distinct())
-                .order_by(campaign_projects.c.project_id)
-                .subquery()
-            )
-            no_campaign_count = (
-                Project.query.with_entities(func.count())
-                .filter(~Project.id.in_(subquery))
-                .scalar()
-            )
-            dto.campaigns = [CampaignStatsDTO(row) for row in linked_campaigns_count]
-            if no_campaign_count:
-                dto.campaigns.append(
-                    CampaignStatsDTO(("Unassociated", no_campaign_count))
-                )
-
-            dto.total_campaigns = unique_campaigns
-            unique_orgs = Organisation.query.with_entities(
-                func.count(Organisation.id)
-            ).scalar()
+        return GlobalStats.get_homepage_stats_dto(abbrev)
 
-            linked_orgs_count = (
-                db.session.query(Organisation.name, func.count(Project.organisation_id))
-                .join(Project.organisation)
-                .group_by(Organisation.id)
-                .all()
-            )
-
-            subquery = (
-                db.session.query(Project.organisation_id.distinct())
-                .order_by(Project.organisation_id)
-                .subquery()
-            )
-            no_org_project_count = (
-                Organisation.query.with_entities(func.count())
-                .filter(~Organisation.id.in_(subquery))
-                .scalar()
-            )
-            dto.organisations = [
-                OrganizationListStatsDTO(row) for row in linked_orgs_count
-            ]
-
-            if no_org_project_count:
-                no_org_proj = OrganizationListStatsDTO(
-                    ("Unassociated", no_org_project_count)
-                )
-                dto.organisations.append(no_org_proj)
-
-            dto.total_organisations = unique_orgs
-        else:
-            # Clear null attributes for abbreviated call
-            clear_attrs = [
-                "total_validators",
-                "tasks_validated",
-                "total_area",
-                "total_mapped_area",
-                "total_validated_area",
-                "campaigns",
-                "total_campaigns",
-                "organisations",
-                "total_organisations",
-            ]
-
-            for attr in clear_attrs:
-                delattr(dto, attr)
+    @staticmethod
+    def refresh_global_stats():
+        """ Rebuilds the homepage counters, catching the changes that aren't published as events """
+        GlobalStats.refresh()
 
-        return dto
+    @staticmethod
+    def update_all_project_stats(
+        chunk_size: int = None, workers: int = 1, dry_run: bool = False, progress=None
+    ) -> list:
+        """
+        Recounts the task counters of all the projects, by ranges of project ids, and rebuilds the project
+        statistics
+        :param chunk_size: Number of project ids recounted per transaction, all projects at once if None
+        :param workers: Number of processes recounting chunks in parallel
+        :param dry_run: Only report the counters that drifted, without updating them
+        :param progress: Called with (chunks done, total chunks, first id, last id, drifted projects) as each
+                         chunk is done
+        :return: Drifted projects, as returned by Project.refresh_task_counters
+        """
+        first_id, last_id = Project.get_id_range()
+        if first_id is None:
+            return []
+
+        chunk_size = chunk_size or last_id - first_id + 1
+        chunks = [
+            (chunk_first_id, min(chunk_first_id + chunk_size - 1, last_id), dry_run)
+            for chunk_first_id in range(first_id, last_id + 1, chunk_size)
+        ]
+        drifted_projects = []
+        for done, (chunk_first_id, chunk_last_id, drifted) in enumerate(
+            StatsService._refresh_chunks(chunks, workers), 1
+        ):
+            drifted_projects.extend(drifted)
+            if progress is not None:
+                progress(done, len(chunks), chunk_first_id, chunk_last_id, drifted)
+
+        if not dry_run:
+            ProjectStats.refresh()
+        return sorted(drifted_projects, key=lambda project: project["project_id"])
 
     @staticmethod
-    def update_all_project_stats():
-        projects = db.session.query(Project.id)
-        for project_id in projects.all():
-            StatsService.update_project_stats(project_id)
+    def _refresh_chunks(chunks: list, workers: int):
+        if workers <= 1:
+            for chunk in chunks:
+                yield refresh_project_task_counters(*chunk)
+            return
+
+        # Forked workers open their own connections, the ones of this process must not be shared with them
+        db.session.remove()
+        db.engine.dispose()
+        with ProcessPoolExecutor(
+            workers, initializer=init_project_stats_worker
+        ) as pool:
+            futures = [
+                pool.submit(refresh_project_task_counters, *chunk) for chunk in chunks
+            ]
+            for future in as_completed(futures):
+                yield future.result()
 
     @staticmethod
     def update_project_stats(project_id: int):
         project = ProjectService.get_project_by_id(project_id)
-        tasks = Task.query.filter(Task.project_id == project_id)
-
-        project.total_tasks = tasks.count()
-        project.tasks_mapped = tasks.filter(
-            Task.task_status == TaskStatus.MAPPED.value
-        ).count()
-        project.tasks_validated = tasks.filter(
-            Task.task_status == TaskStatus.VALIDATED.value
-        ).count()
-        project.tasks_bad_imagery = tasks.filter(
-            Task.task_status == TaskStatus.BADIMAGERY.value
-        ).count()
+        counters = count_filtered(
+            Task.query.filter(Task.project_id == project_id),
+            total_tasks=None,
+            tasks_mapped=Task.task_status == TaskStatus.MAPPED.value,
+            tasks_validated=Task.task_status == TaskStatus.VALIDATED.value,
+            tasks_bad_imagery=Task.task_status == TaskStatus.BADIMAGERY.value,
+        )
+        for counter, value in counters.items():
+            setattr(project, counter, value)
         project.save()
 
     @staticmethod
@@ -490,34 +455,33 @@ class StatsService:
             User.date_registered >= start_date,
             User.date_registered <= end_date,
         )
+        counters = count_filtered(
+            users,
+            total=None,
+            beginner=User.mapping_level == MappingLevel.BEGINNER.value,
+            intermediate=User.mapping_level == MappingLevel.INTERMEDIATE.value,
+            advanced=User.mapping_level == MappingLevel.ADVANCED.value,
+            contributed=User.projects_mapped.isnot(None),
+            email_verified=User.is_email_verified.is_(True),
+            male=User.gender == UserGender.MALE.value,
+            female=User.gender == UserGender.FEMALE.value,
+            self_describe=User.gender == UserGender.SELF_DESCRIBE.value,
+            prefer_not=User.gender == UserGender.PREFER_NOT.value,
+        )
 
         stats_dto = UserStatsDTO()
-        stats_dto.total = users.count()
-        stats_dto.beginner = users.filter(
-            User.mapping_level == MappingLevel.BEGINNER.value
-        ).count()
-        stats_dto.intermediate = users.filter(
-            User.mapping_level == MappingLevel.INTERMEDIATE.value
-        ).count()
-        stats_dto.advanced = users.filter(
-            User.mapping_level == MappingLevel.ADVANCED.value
-        ).count()
-        stats_dto.contributed = users.filter(User.projects_mapped.isnot(None)).count()
-        stats_dto.email_verified = users.filter(
-            User.is_email_verified.is_(True)
-        ).count()
+        stats_dto.total = counters["total"]
+        stats_dto.beginner = counters["beginner"]
+        stats_dto.intermediate = counters["intermediate"]
+        stats_dto.advanced = counters["advanced"]
+        stats_dto.contributed = counters["contributed"]
+        stats_dto.email_verified = counters["email_verified"]
 
         gender_stats = GenderStatsDTO()
-        gender_stats.male = users.filter(User.gender == UserGender.MALE.value).count()
-        gender_stats.female = users.filter(
-            User.gender == UserGender.FEMALE.value
-        ).count()
-        gender_stats.self_describe = users.filter(
-            User.gender == UserGender.SELF_DESCRIBE.value
-        ).count()
-        gender_stats.prefer_not = users.filter(
-            User.gender == UserGender.PREFER_NOT.value
-        ).count()
+        gender_stats.male = counters["male"]
+        gender_stats.female = counters["female"]
+        gender_stats.self_describe = counters["self_describe"]
+        gender_stats.prefer_not = counters["prefer_not"]
 
         stats_dto.genders = gender_stats
         return stats_dto
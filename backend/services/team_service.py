@@ -2,7 +2,7 @@ from flask import current_app
 from sqlalchemy import and_
 from markdown import markdown
 
-from backend import create_app, db
+from backend import db
 from backend.models.dtos.team_dto import (
     TeamDTO,
     NewTeamDTO,
@@ -12,7 +12,7 @@ from backend.models.dtos.team_dto import (
 )
 
 from backend.models.dtos.message_dto import MessageDTO
-from backend.models.postgis.message import Message, MessageType
+from backend.models.postgis.message import MessageType
 from backend.models.postgis.team import Team, TeamMembers
 from backend.models.postgis.project import ProjectTeams
 from backend.models.postgis.project_info import ProjectInfo
@@ -22,10 +22,42 @@ from backend.models.postgis.statuses import (
     TeamVisibility,
     TeamRoles,
 )
+from backend.services.cache_service import RequestCache
+from backend.services.event_service import (
+    EventService,
+    MembershipChanged,
+    ProjectUpdated,
+    TeamUpdated,
+)
 from backend.services.organisation_service import OrganisationService
 from backend.services.users.user_service import UserService
 from backend.services.messaging.message_service import MessageService
 
+# Teams loaded by the request, the teams of each project and the ids of the teams each user is an active
+# member of
+team_cache = RequestCache("teams")
+project_teams_cache = RequestCache("project_teams")
+team_membership_cache = RequestCache("team_memberships")
+
+
+@EventService.subscribe(TeamUpdated)
+def evict_team(event):
+    team_cache.delete(event.team_id)
+    project_teams_cache.clear()
+
+
+@EventService.subscribe(ProjectUpdated)
+def evict_project_teams(event):
+    project_teams_cache.delete(event.project_id)
+
+
+@EventService.subscribe(MembershipChanged)
+def evict_team_memberships(event):
+    if event.user_id is not None:
+        team_membership_cache.delete(event.user_id)
+    elif event.team_id is not None:
+        team_membership_cache.clear()
+
 
 class TeamServiceError(Exception):
     """Custom Exception to notify callers an error occurred when handling teams"""
@@ -351,21 +383,28 @@ class TeamService:
 
     @staticmethod
     def get_project_teams_as_dto(project_id: int) -> TeamsListDTO:
-        """Gets all the teams for a specified project"""
-        project_teams = ProjectTeams.query.filter(
-            ProjectTeams.project_id == project_id
-        ).all()
+        """Gets all the teams for a specified project, loaded once per request"""
+        teams_list_dto = project_teams_cache.get(project_id)
+        if teams_list_dto is not None:
+            return teams_list_dto
+
+        project_teams = (
+            db.session.query(ProjectTeams.team_id, ProjectTeams.role, Team.name)
+            .join(Team, Team.id == ProjectTeams.team_id)
+            .filter(ProjectTeams.project_id == project_id)
+            .all()
+        )
         teams_list_dto = TeamsListDTO()
 
         for project_team in project_teams:
-            team = TeamService.get_team_by_id(project_team.team_id)
             team_dto = ProjectTeamDTO()
             team_dto.team_id = project_team.team_id
-            team_dto.team_name = team.name
+            team_dto.team_name = project_team.name
             team_dto.role = project_team.role
 
             teams_list_dto.teams.append(team_dto)
 
+        project_teams_cache.set(project_id, teams_list_dto)
         return teams_list_dto
 
     @staticmethod
@@ -384,11 +423,14 @@ class TeamService:
         :returns: Team
         :raises: Not Found
         """
-        team = Team.get(team_id)
-
+        team = team_cache.get(team_id)
         if team is None:
-            raise NotFound()
+            team = Team.get(team_id)
+
+            if team is None:
+                raise NotFound()
 
+            team_cache.set(team_id, team)
         return team
 
     @staticmethod
@@ -459,10 +501,6 @@ class TeamService:
     def _get_team_members(team_id: int):
         return TeamMembers.query.filter_by(team_id=team_id).all()
 
-    @staticmethod
-    def _get_active_team_members(team_id: int):
-        return TeamMembers.query.filter_by(team_id=team_id, active=True).all()
-
     @staticmethod
     def activate_team_member(team_id: int, user_id: int):
         member = TeamMembers.query.filter(
@@ -470,6 +508,7 @@ class TeamService:
         ).first()
         member.active = True
         db.session.add(member)
+        EventService.publish(MembershipChanged(team_id=team_id, user_id=user_id))
         db.session.commit()
 
     @staticmethod
@@ -531,45 +570,52 @@ class TeamService:
     def check_team_membership(project_id: int, allowed_roles: list, user_id: int):
         """Given a project and permitted team roles, check user's membership in the team list"""
         teams_dto = TeamService.get_project_teams_as_dto(project_id)
-        teams_allowed = [
-            team_dto for team_dto in teams_dto.teams if team_dto.role in allowed_roles
-        ]
-        user_membership = [
-            team_dto.team_id
-            for team_dto in teams_allowed
-            if TeamService.is_user_an_active_team_member(team_dto.team_id, user_id)
-        ]
-        return len(user_membership) > 0
+        user_team_ids = TeamService.get_active_team_ids(user_id)
+        return any(
+            team_dto.role in allowed_roles and team_dto.team_id in user_team_ids
+            for team_dto in teams_dto.teams
+        )
+
+    @staticmethod
+    def get_active_team_ids(user_id: int) -> frozenset:
+        """Gets the ids of the teams the user is an active member of, loaded once per request"""
+        team_ids = team_membership_cache.get(user_id)
+        if team_ids is None:
+            team_ids = frozenset(
+                row.team_id
+                for row in db.session.query(TeamMembers.team_id)
+                .filter(TeamMembers.user_id == user_id, TeamMembers.active.is_(True))
+                .all()
+            )
+            team_membership_cache.set(user_id, team_ids)
+        return team_ids
 
     @staticmethod
     def send_message_to_all_team_members(
         team_id: int, team_name: str, message_dto: MessageDTO
     ):
-        """Sends supplied message to all contributors in a team.  Message all team members can take
-        over a minute to run, so this method is expected to be called on its own thread"""
-        app = (
-            create_app()
-        )  # Because message-all run on background thread it needs it's own app context
-
-        with app.app_context():
-            team_members = TeamService._get_active_team_members(team_id)
-            sender = UserService.get_user_by_id(message_dto.from_user_id).username
-
-            message_dto.message = (
-                "A message from {}, manager of {} team:<br/><br/>{}".format(
-                    MessageService.get_user_profile_link(sender),
-                    MessageService.get_team_link(team_name, team_id, False),
-                    markdown(message_dto.message, output_format="html"),
-                )
-            )
+        """Sends supplied message to all active members of a team, except the sender"""
+        team_members = (
+            db.session.query(TeamMembers.user_id)
+            .filter(TeamMembers.team_id == team_id, TeamMembers.active.is_(True))
+            .all()
+        )
+        sender = UserService.get_user_by_id(message_dto.from_user_id).username
 
-            messages = []
-            for team_member in team_members:
-                if team_member.user_id != message_dto.from_user_id:
-                    message = Message.from_dto(team_member.user_id, message_dto)
-                    message.message_type = MessageType.TEAM_BROADCAST.value
-                    message.save()
-                    user = UserService.get_user_by_id(team_member.user_id)
-                    messages.append(dict(message=message, user=user))
+        message_dto.message = (
+            "A message from {}, manager of {} team:<br/><br/>{}".format(
+                MessageService.get_user_profile_link(sender),
+                MessageService.get_team_link(team_name, team_id, False),
+                markdown(message_dto.message, output_format="html"),
+            )
+        )
 
-            MessageService._push_messages(messages)
+        MessageService.broadcast_message(
+            [
+                team_member.user_id
+                for team_member in team_members
+                if team_member.user_id != message_dto.from_user_id
+            ],
+            message_dto,
+            MessageType.TEAM_BROADCAST,
+        )
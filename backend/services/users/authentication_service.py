@@ -1,6 +1,11 @@
 import base64
+import calendar
+import hashlib
+import threading
+import time
 import urllib.parse
 
+from cachetools import TTLCache
 from flask import current_app, request, session
 from flask_httpauth import HTTPTokenAuth
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
@@ -14,6 +19,14 @@ from werkzeug import url_quote
 token_auth = HTTPTokenAuth(scheme="Token")
 tm = TMAPIDecorators()
 
+# Seconds a session token is valid for
+SESSION_TOKEN_EXPIRY = 604800
+# Session tokens verified by this worker, by their digest, with the id of their user and their expiry, so
+# requests with a token seen recently skip decoding it and checking its signature. Only the user is kept, the
+# role and other details of the user are read once per request
+verified_tokens = TTLCache(maxsize=10000, ttl=300)
+verified_tokens_lock = threading.Lock()
+
 
 @token_auth.verify_token
 def verify_token(token):
@@ -22,17 +35,28 @@ def verify_token(token):
     if not token:
         return False
 
+    user_id = AuthenticationService.get_verified_token_user(token)
+    if user_id is not None:
+        tm.authenticated_user_id = user_id
+        return user_id
+
     try:
         decoded_token = base64.b64decode(token).decode("utf-8")
     except UnicodeDecodeError:
         current_app.logger.debug(f"Unable to decode token {request.base_url}")
         return False  # Can't decode token, so fail login
 
-    valid_token, user_id = AuthenticationService.is_valid_token(decoded_token, 604800)
+    valid_token, user_id, signed_at = AuthenticationService.is_valid_timed_token(
+        decoded_token, SESSION_TOKEN_EXPIRY
+    )
     if not valid_token:
         current_app.logger.debug(f"Token not valid {request.base_url}")
         return False
 
+    AuthenticationService.add_verified_token(
+        token, user_id, signed_at + SESSION_TOKEN_EXPIRY
+    )
+
     tm.authenticated_user_id = (
         user_id  # Set the user ID on the decorator as a convenience
     )
@@ -159,16 +183,63 @@ class AuthenticationService:
         :param token_expiry: When the token expires in seconds
         :return: True if token is valid, and user_id contained in token
         """
+        is_valid, tokenised_user_id, _ = AuthenticationService.is_valid_timed_token(
+            token, token_expiry
+        )
+        return is_valid, tokenised_user_id
+
+    @staticmethod
+    def is_valid_timed_token(token, token_expiry):
+        """
+        Validates if the supplied token is valid, and hasn't expired, along with the time it was signed at.
+        :param token: Token to check
+        :param token_expiry: When the token expires in seconds
+        :return: True if token is valid, user_id contained in token and the unix time it was signed at
+        """
         entropy = current_app.secret_key if current_app.secret_key else "un1testingmode"
         serializer = URLSafeTimedSerializer(entropy)
 
         try:
-            tokenised_user_id = serializer.loads(token, max_age=token_expiry)
+            tokenised_user_id, signed_at = serializer.loads(
+                token, max_age=token_expiry, return_timestamp=True
+            )
         except SignatureExpired:
             current_app.logger.debug("Token has expired")
-            return False, None
+            return False, None, None
         except BadSignature:
             current_app.logger.debug("Bad Token Signature")
-            return False, None
+            return False, None, None
+
+        return True, tokenised_user_id, calendar.timegm(signed_at.utctimetuple())
+
+    @staticmethod
+    def _get_token_digest(token: str) -> str:
+        # Tokens are kept by their digest so the cache doesn't hold usable tokens
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_verified_token_user(token: str):
+        """
+        Gets the user of a session token recently verified by this worker
+        :return: The user id, None if the token has to be verified
+        """
+        with verified_tokens_lock:
+            verified_token = verified_tokens.get(
+                AuthenticationService._get_token_digest(token)
+            )
+        if verified_token is None:
+            return None
 
-        return True, tokenised_user_id
+        user_id, expires_at = verified_token
+        if expires_at <= time.time():
+            return None
+        return user_id
+
+    @staticmethod
+    def add_verified_token(token: str, user_id: int, expires_at: float):
+        """Keeps the session token verified so the following requests with it skip its verification"""
+        with verified_tokens_lock:
+            verified_tokens[AuthenticationService._get_token_digest(token)] = (
+                user_id,
+                expires_at,
+            )
@@ -1,5 +1,10 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 from flask import current_app
+from requests.adapters import HTTPAdapter
 
 from backend.models.dtos.user_dto import UserOSMDTO
 
@@ -12,6 +17,32 @@ class OSMServiceError(Exception):
             current_app.logger.debug(message)
 
 
+class TokenBucket:
+    """ Thread safe token bucket, allowing rate calls per second on average and bursts of up to burst calls """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ Takes a token, waiting until one is available """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.burst, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
 class OSMService:
     @staticmethod
     def get_osm_details_for_user(user_id: int) -> UserOSMDTO:
@@ -30,6 +61,51 @@ class OSMService:
 
         return OSMService._parse_osm_user_details_response(response.json())
 
+    @staticmethod
+    def get_changeset_counts(
+        user_ids: list, workers: int = 8, rate: float = 10
+    ) -> dict:
+        """
+        Gets the changeset counts of the users from the OSM API, with up to workers requests in flight on a
+        pool of kept alive connections and at most rate requests per second
+        :return: dict of changeset counts by user id, users that couldn't be fetched are left out
+        """
+        osm_server_url = current_app.config["OSM_SERVER_URL"]
+        bucket = TokenBucket(rate, burst=workers)
+        session = requests.Session()
+        session.mount(
+            osm_server_url, HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        )
+
+        def get_user_details(user_id: int):
+            bucket.acquire()
+            try:
+                response = session.get(
+                    f"{osm_server_url}/api/0.6/user/{user_id}.json", timeout=30
+                )
+            except requests.RequestException as e:
+                return user_id, None, str(e)
+            if response.status_code != 200:
+                return user_id, None, f"Status {response.status_code}"
+            return user_id, response.json(), None
+
+        changeset_counts = {}
+        with session, ThreadPoolExecutor(workers) as pool:
+            for user_id, osm_response, error in pool.map(get_user_details, user_ids):
+                try:
+                    if error is not None:
+                        raise OSMServiceError(f"Bad response from OSM: {error}")
+                    osm_details = OSMService._parse_osm_user_details_response(
+                        osm_response
+                    )
+                    changeset_counts[user_id] = osm_details.changeset_count
+                except OSMServiceError:
+                    current_app.logger.debug(
+                        f"Changesets of user {user_id} couldn't be fetched from OSM"
+                    )
+
+        return changeset_counts
+
     @staticmethod
     def _parse_osm_user_details_response(osm_response: dict) -> UserOSMDTO:
         """ Parses the OSM user details response and extracts user info """
@@ -1,8 +1,8 @@
-from cachetools import TTLCache, cached
+from collections import namedtuple
 from flask import current_app
 import datetime
 from sqlalchemy.sql.expression import literal
-from sqlalchemy import func, or_, desc, and_, distinct, cast, Time
+from sqlalchemy import func, or_, desc, and_, distinct, text
 from backend import db
 from backend.models.dtos.project_dto import ProjectFavoritesDTO, ProjectSearchResultsDTO
 from backend.models.dtos.user_dto import (
@@ -20,14 +20,18 @@ from backend.models.dtos.user_dto import (
 from backend.models.dtos.interests_dto import InterestsListDTO, InterestDTO
 from backend.models.postgis.interests import Interest, project_interests
 from backend.models.postgis.message import Message
+from backend.models.postgis.notification import Notification
 from backend.models.postgis.project import Project
 from backend.models.postgis.user import User, UserRole, MappingLevel, UserEmail
+from backend.models.postgis.user_changeset_count import UserChangesetCount
+from backend.models.postgis.user_task_activity import UserTaskActivity
 from backend.models.postgis.task import TaskHistory, TaskAction, Task
 from backend.models.dtos.user_dto import UserTaskDTOs
 from backend.models.dtos.stats_dto import Pagination
 from backend.models.postgis.statuses import TaskStatus, ProjectStatus
-from backend.models.postgis.utils import NotFound
+from backend.models.postgis.utils import NotFound, keyset_paginate, timestamp
 from backend.services.users.osm_service import OSMService, OSMServiceError
+from backend.services.cache_service import Cache, RequestCache
 from backend.services.messaging.smtp_service import SMTPService
 from backend.services.messaging.template_service import (
     get_txt_template,
@@ -35,7 +39,12 @@ from backend.services.messaging.template_service import (
 )
 
 
-user_filter_cache = TTLCache(maxsize=1024, ttl=600)
+user_filter_cache = Cache("user_filter", maxsize=1024, ttl=600, model=UserFilterDTO)
+user_cache = RequestCache("users")
+user_principal_cache = RequestCache("user_principals")
+
+# The role and mapping level of a user, read once per request by the permission checks
+UserPrincipal = namedtuple("UserPrincipal", ["id", "username", "role", "mapping_level"])
 
 
 class UserServiceError(Exception):
@@ -49,13 +58,50 @@ class UserServiceError(Exception):
 class UserService:
     @staticmethod
     def get_user_by_id(user_id: int) -> User:
-        user = User.get_by_id(user_id)
-
+        user = user_cache.get(user_id)
         if user is None:
-            raise NotFound()
+            user = User.get_by_id(user_id)
 
+            if user is None:
+                raise NotFound()
+
+            user_cache.set(user_id, user)
         return user
 
+    @staticmethod
+    def get_users_by_ids(user_ids: list) -> dict:
+        """
+        Gets the users with the given ids, loading the users the request didn't load yet with a single query
+        :return: dict of the users found by id
+        """
+        return user_cache.load_many(
+            user_ids,
+            lambda missing_ids: {
+                user.id: user for user in User.query.filter(User.id.in_(missing_ids))
+            },
+        )
+
+    @staticmethod
+    def get_user_principal(user_id: int) -> UserPrincipal:
+        """
+        Gets the role and mapping level of the user, kept for the rest of the request so the permission checks
+        of a request only load the user once
+        :raises NotFound
+        """
+        principal = user_principal_cache.get(user_id)
+        if principal is None:
+            user = UserService.get_user_by_id(user_id)
+            principal = UserPrincipal(
+                user_id, user.username, user.role, user.mapping_level
+            )
+            user_principal_cache.set(user_id, principal)
+        return principal
+
+    @staticmethod
+    def evict_user_principal(user_id: int):
+        """Evicts the principal of the user kept by the request, after its role or mapping level changed"""
+        user_principal_cache.delete(user_id)
+
     @staticmethod
     def get_user_by_username(username: str) -> User:
         user = User.get_by_username(username)
@@ -236,71 +282,49 @@ class UserService:
         page=1,
         page_size=10,
         sort_by: str = None,
+        cursor: str = None,
+        count_total: bool = False,
     ) -> UserTaskDTOs:
-        base_query = (
-            TaskHistory.query.with_entities(
-                TaskHistory.project_id.label("project_id"),
-                TaskHistory.task_id.label("task_id"),
-                func.max(TaskHistory.action_date).label("max"),
+        """
+        Gets the tasks the user has interacted with, from the user task activity projection. Pages are selected
+        by page number or, if a cursor is given, with keyset pagination, in which case the total is only
+        counted if count_total is set
+        """
+        user_task_dtos = UserTaskDTOs()
+        tasks = (
+            Task.query.join(
+                UserTaskActivity,
+                and_(
+                    Task.id == UserTaskActivity.task_id,
+                    Task.project_id == UserTaskActivity.project_id,
+                ),
+            )
+            .filter(UserTaskActivity.user_id == user_id)
+            .add_columns(
+                UserTaskActivity.last_action_date, UserTaskActivity.comment_count
             )
-            .filter(TaskHistory.user_id == user_id)
-            .group_by(TaskHistory.task_id, TaskHistory.project_id)
         )
 
         if task_status:
-            base_query = base_query.filter(
-                TaskHistory.action_text == TaskStatus[task_status.upper()].name
+            tasks = tasks.filter(
+                UserTaskActivity.last_action == TaskStatus[task_status.upper()].name
             )
 
         if start_date:
-            base_query = base_query.filter(TaskHistory.action_date >= start_date)
+            tasks = tasks.filter(UserTaskActivity.last_action_date >= start_date)
 
         if end_date:
-            base_query = base_query.filter(TaskHistory.action_date <= end_date)
-
-        user_task_dtos = UserTaskDTOs()
-        task_id_list = base_query.subquery()
-
-        comments_query = (
-            TaskHistory.query.with_entities(
-                TaskHistory.project_id,
-                TaskHistory.task_id,
-                func.count(TaskHistory.action).label("count"),
-            )
-            .filter(TaskHistory.action == "COMMENT")
-            .group_by(TaskHistory.task_id, TaskHistory.project_id)
-        ).subquery()
-
-        sq = (
-            db.session.query(
-                func.coalesce(comments_query.c.count, 0).label("comments"), task_id_list
-            )
-            .select_from(task_id_list)
-            .outerjoin(
-                comments_query,
-                (comments_query.c.task_id == task_id_list.c.task_id)
-                & (comments_query.c.project_id == task_id_list.c.project_id),
-            )
-            .subquery()
-        )
-
-        tasks = Task.query.join(
-            sq,
-            and_(
-                Task.id == sq.c.task_id,
-                Task.project_id == sq.c.project_id,
-            ),
-        )
-        tasks = tasks.add_columns("max", "comments")
-
-        if sort_by == "action_date":
-            tasks = tasks.order_by(sq.c.max)
-        elif sort_by == "-action_date":
-            tasks = tasks.order_by(desc(sq.c.max))
-        elif sort_by == "project_id":
-            tasks = tasks.order_by(sq.c.project_id)
-        elif sort_by == "-project_id":
-            tasks = tasks.order_by(desc(sq.c.project_id))
+            tasks = tasks.filter(UserTaskActivity.last_action_date <= end_date)
+
+        if cursor is None:
+            if sort_by == "action_date":
+                tasks = tasks.order_by(UserTaskActivity.last_action_date)
+            elif sort_by == "-action_date":
+                tasks = tasks.order_by(desc(UserTaskActivity.last_action_date))
+            elif sort_by == "project_id":
+                tasks = tasks.order_by(UserTaskActivity.project_id)
+            elif sort_by == "-project_id":
+                tasks = tasks.order_by(desc(UserTaskActivity.project_id))
 
         if project_status:
             tasks = tasks.filter(
@@ -309,9 +333,33 @@ class UserService:
             )
 
         if project_id:
-            tasks = tasks.filter_by(project_id=project_id)
+            tasks = tasks.filter(UserTaskActivity.project_id == project_id)
 
-        results = tasks.paginate(page, page_size, True)
+        if cursor is None:
+            results = tasks.paginate(page, page_size, True)
+        else:
+            sort_by = sort_by or "-action_date"
+            sort_by_project = sort_by.endswith("project_id")
+
+            # Task ids are only unique within a project, ties are broken on both
+            def row_key(row):
+                sort_value = (
+                    row.Task.project_id if sort_by_project else row.last_action_date
+                )
+                return sort_value, (row.Task.project_id, row.Task.id)
+
+            results = keyset_paginate(
+                tasks,
+                UserTaskActivity.project_id
+                if sort_by_project
+                else UserTaskActivity.last_action_date,
+                (UserTaskActivity.project_id, UserTaskActivity.task_id),
+                row_key,
+                cursor=cursor or None,
+                per_page=page_size,
+                descending=sort_by.startswith("-"),
+                count_total=count_total,
+            )
 
         task_list = []
 
@@ -415,27 +463,21 @@ class UserService:
         query = (
             TaskHistory.query.with_entities(
                 func.date_trunc("minute", TaskHistory.action_date).label("trn"),
-                func.max(TaskHistory.action_text).label("tm"),
+                func.max(TaskHistory.lock_duration).label("tm"),
             )
             .filter(TaskHistory.user_id == user.id)
             .filter(TaskHistory.action == "LOCKED_FOR_VALIDATION")
             .group_by("trn")
             .subquery()
         )
-        total_validation_time = db.session.query(
-            func.sum(cast(func.to_timestamp(query.c.tm, "HH24:MI:SS"), Time))
-        ).scalar()
+        total_validation_time = db.session.query(func.sum(query.c.tm)).scalar()
 
         if total_validation_time:
             stats_dto.time_spent_validating = total_validation_time.total_seconds()
             stats_dto.total_time_spent += stats_dto.time_spent_validating
 
         total_mapping_time = (
-            db.session.query(
-                func.sum(
-                    cast(func.to_timestamp(TaskHistory.action_text, "HH24:MI:SS"), Time)
-                )
-            )
+            db.session.query(func.sum(TaskHistory.lock_duration))
             .filter(
                 or_(
                     TaskHistory.action == TaskAction.LOCKED_FOR_MAPPING.name,
@@ -487,7 +529,7 @@ class UserService:
         return User.get_all_users(query)
 
     @staticmethod
-    @cached(user_filter_cache)
+    @user_filter_cache.cached
     def filter_users(username: str, project_id: int, page: int) -> UserFilterDTO:
         """Gets paginated list of users, filtered by username, for autocomplete"""
         return User.filter_users(username, project_id, page)
@@ -495,7 +537,7 @@ class UserService:
     @staticmethod
     def is_user_an_admin(user_id: int) -> bool:
         """Is the user an admin"""
-        user = UserService.get_user_by_id(user_id)
+        user = UserService.get_user_principal(user_id)
         if UserRole(user.role) == UserRole.ADMIN:
             return True
 
@@ -509,14 +551,14 @@ class UserService:
     @staticmethod
     def get_mapping_level(user_id: int):
         """Gets mapping level user is at"""
-        user = UserService.get_user_by_id(user_id)
+        user = UserService.get_user_principal(user_id)
 
         return MappingLevel(user.mapping_level)
 
     @staticmethod
     def is_user_validator(user_id: int) -> bool:
         """Determines if user is a validator"""
-        user = UserService.get_user_by_id(user_id)
+        user = UserService.get_user_principal(user_id)
 
         if UserRole(user.role) in [
             UserRole.ADMIN,
@@ -528,7 +570,7 @@ class UserService:
     @staticmethod
     def is_user_blocked(user_id: int) -> bool:
         """Determines if a user is blocked"""
-        user = UserService.get_user_by_id(user_id)
+        user = UserService.get_user_principal(user_id)
 
         if UserRole(user.role) == UserRole.READ_ONLY:
             return True
@@ -647,15 +689,7 @@ class UserService:
             projs.extend(remaining_projs)
 
         dto = ProjectSearchResultsDTO()
-
-        # Get all total contributions for each paginated project.
-        contrib_counts = ProjectSearchService.get_total_contributions(projs)
-
-        zip_items = zip(projs, contrib_counts)
-
-        dto.results = [
-            ProjectSearchService.create_result_dto(p, "en", t) for p, t in zip_items
-        ]
+        dto.results = ProjectSearchService.create_result_dtos(projs, "en")
 
         return dto
 
@@ -676,7 +710,7 @@ class UserService:
                 + f"Unknown role {role} accepted values are ADMIN, PROJECT_MANAGER, VALIDATOR"
             )
 
-        admin = UserService.get_user_by_id(admin_user_id)
+        admin = UserService.get_user_principal(admin_user_id)
         admin_role = UserRole(admin.role)
 
         if admin_role != UserRole.ADMIN and requested_role == UserRole.ADMIN:
@@ -686,6 +720,8 @@ class UserService:
 
         user = UserService.get_user_by_username(username)
         user.set_user_role(requested_role)
+        # The role is read once per request, so the next request of the user has the new role
+        UserService.evict_user_principal(user.id)
 
     @staticmethod
     def set_user_mapping_level(username: str, level: str) -> User:
@@ -703,6 +739,7 @@ class UserService:
 
         user = UserService.get_user_by_username(username)
         user.set_mapping_level(requested_level)
+        UserService.evict_user_principal(user.id)
 
         return user
 
@@ -749,32 +786,37 @@ class UserService:
         if user_level == MappingLevel.ADVANCED:
             return  # User has achieved highest level, so no need to do further checking
 
-        intermediate_level = current_app.config["MAPPER_LEVEL_INTERMEDIATE"]
-        advanced_level = current_app.config["MAPPER_LEVEL_ADVANCED"]
-
         try:
             osm_details = OSMService.get_osm_details_for_user(user_id)
-            if (
-                osm_details.changeset_count > advanced_level
-                and user.mapping_level != MappingLevel.ADVANCED.value
-            ):
-                user.mapping_level = MappingLevel.ADVANCED.value
-                UserService.notify_level_upgrade(user_id, user.username, "ADVANCED")
-            elif (
-                intermediate_level < osm_details.changeset_count < advanced_level
-                and user.mapping_level != MappingLevel.INTERMEDIATE.value
-            ):
-                user.mapping_level = MappingLevel.INTERMEDIATE.value
-                UserService.notify_level_upgrade(user_id, user.username, "INTERMEDIATE")
         except OSMServiceError:
             # Swallow exception as we don't want to blow up the server for this
             current_app.logger.error("Error attempting to update mapper level")
             return
 
+        new_level = UserService.get_mapping_level_for_changesets(
+            osm_details.changeset_count
+        )
+        if new_level is not None and user.mapping_level != new_level.value:
+            user.mapping_level = new_level.value
+            UserService.evict_user_principal(user_id)
+            UserService.notify_level_upgrade(user_id, user.username, new_level.name)
+
         user.save()
 
     @staticmethod
-    def notify_level_upgrade(user_id: int, username: str, level: str):
+    def get_mapping_level_for_changesets(changeset_count: int) -> MappingLevel:
+        """Gets the level reached with the number of changesets, None if it is below intermediate"""
+        intermediate_level = current_app.config["MAPPER_LEVEL_INTERMEDIATE"]
+        advanced_level = current_app.config["MAPPER_LEVEL_ADVANCED"]
+
+        if changeset_count > advanced_level:
+            return MappingLevel.ADVANCED
+        elif intermediate_level < changeset_count < advanced_level:
+            return MappingLevel.INTERMEDIATE
+        return None
+
+    @staticmethod
+    def get_level_upgrade_message(user_id: int, username: str, level: str) -> Message:
         text_template = get_txt_template("level_upgrade_message_en.txt")
         replace_list = [
             ["[USERNAME]", username],
@@ -787,24 +829,94 @@ class UserService:
         level_upgrade_message.to_user_id = user_id
         level_upgrade_message.subject = "Mapper level upgrade"
         level_upgrade_message.message = text_template
-        level_upgrade_message.save()
+        return level_upgrade_message
 
     @staticmethod
-    def refresh_mapper_level() -> int:
-        """Helper function to run thru all users in the DB and update their mapper level"""
-        users = User.get_all_users_not_paginated()
-        users_updated = 1
+    def notify_level_upgrade(user_id: int, username: str, level: str):
+        UserService.get_level_upgrade_message(user_id, username, level).save()
+
+    @staticmethod
+    def refresh_mapper_level(
+        workers: int = 8,
+        rate: float = 10,
+        max_age: datetime.timedelta = datetime.timedelta(days=7),
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Updates the mapper level of all the users that can still level up, in batches. Changeset counts of
+        each batch are fetched from OSM concurrently, and the counts, level upgrades and upgrade messages of
+        the batch are written with a statement each
+        :param workers: Number of concurrent requests to the OSM API
+        :param rate: Maximum number of requests per second to the OSM API
+        :param max_age: Users whose changesets were checked more recently are skipped
+        :param batch_size: Number of users fetched and updated per transaction
+        :return: Number of users upgraded
+        """
+        users = UserChangesetCount.get_users_to_check(timestamp() - max_age)
         total_users = len(users)
+        users_upgraded = 0
 
-        for user in users:
-            UserService.check_and_update_mapper_level(user.id)
+        for start in range(0, total_users, batch_size):
+            end = min(start + batch_size, total_users)
+            batch = users[start:end]
+            changeset_counts = OSMService.get_changeset_counts(
+                [user.id for user in batch], workers, rate
+            )
+            UserChangesetCount.record(changeset_counts)
+
+            upgrades = []
+            for user in batch:
+                if user.id not in changeset_counts:
+                    continue
+                new_level = UserService.get_mapping_level_for_changesets(
+                    changeset_counts[user.id]
+                )
+                if new_level is not None and user.mapping_level != new_level.value:
+                    upgrades.append((user, new_level))
+            UserService.upgrade_mapper_levels(upgrades)
+            db.session.commit()
+
+            users_upgraded += len(upgrades)
+            print(
+                f"{end} users checked of {total_users}, " f"{users_upgraded} upgraded"
+            )
 
-            if users_updated % 50 == 0:
-                print(f"{users_updated} users updated of {total_users}")
+        return users_upgraded
 
-            users_updated += 1
+    @staticmethod
+    def upgrade_mapper_levels(upgrades: list):
+        """
+        Sets the new mapping level of the users and sends them the upgrade message, with a statement for all
+        the levels and one for all the messages. Runs in the caller's transaction and doesn't commit
+        :param upgrades: list of (user, MappingLevel) of the users to upgrade
+        """
+        if not upgrades:
+            return
 
-        return users_updated
+        db.session.execute(
+            text(
+                """
+                UPDATE users
+                   SET mapping_level = u.mapping_level
+                  FROM (SELECT UNNEST(CAST(:user_ids AS BIGINT[])) AS id,
+                               UNNEST(CAST(:levels AS INTEGER[])) AS mapping_level) u
+                 WHERE users.id = u.id
+                """
+            ),
+            dict(
+                user_ids=[user.id for user, level in upgrades],
+                levels=[level.value for user, level in upgrades],
+            ),
+        )
+        db.session.bulk_save_objects(
+            [
+                UserService.get_level_upgrade_message(
+                    user.id, user.username, level.name
+                )
+                for user, level in upgrades
+            ]
+        )
+        Notification.increment_unread([user.id for user, level in upgrades])
 
     @staticmethod
     def register_user_with_email(user_dto: UserRegisterEmailDTO):
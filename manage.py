@@ -2,20 +2,21 @@ import os
 import warnings
 import base64
 import csv
-import datetime
 
 from flask_migrate import MigrateCommand
 from flask_script import Manager
 from dotenv import load_dotenv
-from backend import create_app, initialise_counters
+from backend import create_app
 from backend.services.users.authentication_service import AuthenticationService
 from backend.services.users.user_service import UserService
 from backend.services.stats_service import StatsService
 from backend.services.interests_service import InterestService
-from backend.models.postgis.utils import NotFound
-from backend.models.postgis.task import Task, TaskHistory
+from backend.services.lock_expiry_service import LockExpiryService
+from backend.services.messaging.smtp_service import SMTPService
+from backend.models.postgis.project_contributor import ProjectContributor
+from backend.models.postgis.user_task_activity import UserTaskActivity
+from backend.models.postgis.utils import NotFound, parse_duration
 
-from sqlalchemy import func
 import atexit
 from apscheduler.schedulers.background import BackgroundScheduler
 
@@ -40,12 +41,6 @@ for key in [
 # Initialise the flask app object
 application = create_app()
 
-# Initialize homepage counters
-try:
-    initialise_counters(application)
-except Exception:
-    warnings.warn("Homepage counters not initialized.")
-
 # Add management commands
 manager = Manager(application)
 
@@ -53,32 +48,59 @@ manager = Manager(application)
 manager.add_command("db", MigrateCommand)
 
 
-# Job runs once every 2 hours
 @manager.command
 def auto_unlock_tasks():
     with application.app_context():
-        # Identify distinct project IDs that were touched in the last 2 hours
-        query = (
-            TaskHistory.query.with_entities(TaskHistory.project_id)
-            .filter(
-                func.DATE(TaskHistory.action_date)
-                > datetime.datetime.utcnow() - datetime.timedelta(minutes=130)
-            )
-            .distinct()
+        # Unlock tasks, across all projects, whose lock has expired
+        projects_unlocked = LockExpiryService.unlock_expired_tasks()
+        application.logger.debug(
+            f"Auto unlocked expired tasks on {projects_unlocked} projects"
         )
-        projects = query.all()
-        # For each project update task history for tasks that were not manually unlocked
-        for project in projects:
-            project_id = project[0]
-            Task.auto_unlock_tasks(project_id)
+
+
+@manager.command
+def refresh_global_stats():
+    with application.app_context():
+        # Rebuild the homepage counters from the source tables
+        StatsService.refresh_global_stats()
+        application.logger.debug("Refreshed homepage stats")
+
+
+@manager.command
+def send_queued_emails():
+    with application.app_context():
+        # Send the emails queued in the outbox
+        emails_sent = SMTPService.send_queued_emails()
+        application.logger.debug(f"Sent {emails_sent} queued emails")
 
 
 # Setup a background cron job
 cron = BackgroundScheduler(daemon=True)
 # Initiate the background thread
-cron.add_job(auto_unlock_tasks, "interval", hours=2)
+cron.add_job(
+    auto_unlock_tasks,
+    "interval",
+    seconds=parse_duration(
+        application.config["TASK_AUTOUNLOCK_CHECK_INTERVAL"]
+    ).total_seconds(),
+)
+cron.add_job(
+    refresh_global_stats,
+    "interval",
+    seconds=parse_duration(
+        application.config["GLOBAL_STATS_REFRESH_INTERVAL"]
+    ).total_seconds(),
+)
+cron.add_job(
+    send_queued_emails,
+    "interval",
+    seconds=parse_duration(application.config["EMAIL_SEND_INTERVAL"]).total_seconds(),
+)
 cron.start()
-application.logger.debug("Initiated background thread to auto unlock tasks")
+application.logger.debug(
+    "Initiated background thread to auto unlock tasks, refresh homepage stats "
+    "and send queued emails"
+)
 
 # Shutdown your cron thread when the application is stopped
 atexit.register(lambda: cron.shutdown(wait=False))
@@ -93,18 +115,76 @@ def gen_token(user_id):
     print(f"Your base64 encoded session token: {b64_token}")
 
 
-@manager.command
-def refresh_levels():
+@manager.option(
+    "-w", "--workers", help="Concurrent requests to the OSM API", type=int, default=8
+)
+@manager.option(
+    "-r", "--rate", help="Requests per second to the OSM API", type=float, default=10
+)
+@manager.option(
+    "-a",
+    "--max_age",
+    help="Skip users checked more recently (e.g. '12h' or '7d')",
+    default="7d",
+)
+def refresh_levels(workers=8, rate=10, max_age="7d"):
     print("Started updating mapper levels...")
-    users_updated = UserService.refresh_mapper_level()
+    users_updated = UserService.refresh_mapper_level(
+        workers, rate, parse_duration(max_age)
+    )
     print(f"Updated {users_updated} user mapper levels")
 
 
-@manager.command
-def refresh_project_stats():
+@manager.option(
+    "-c", "--chunk_size", help="Number of project ids refreshed at once", type=int
+)
+@manager.option(
+    "-w", "--workers", help="Number of processes refreshing chunks", type=int, default=1
+)
+@manager.option(
+    "-d",
+    "--dry_run",
+    help="Only report the task counters that drifted",
+    action="store_true",
+)
+def refresh_project_stats(chunk_size=None, workers=1, dry_run=False):
     print("Started updating project stats...")
-    StatsService.update_all_project_stats()
-    print("Project stats updated")
+
+    def print_progress(done, chunks, first_id, last_id, drifted_projects):
+        print(
+            f"[{done}/{chunks}] Projects {first_id} to {last_id}: "
+            f"{len(drifted_projects)} with drifted task counters"
+        )
+
+    drifted_projects = StatsService.update_all_project_stats(
+        chunk_size, workers, dry_run, print_progress
+    )
+    for project in drifted_projects:
+        drift = ", ".join(
+            f"{counter} {stored} -> {counted}"
+            for counter, (stored, counted) in project.items()
+            if counter != "project_id" and stored != counted
+        )
+        print(f"Project {project['project_id']}: {drift}")
+
+    if dry_run:
+        print(f"{len(drifted_projects)} projects have drifted task counters")
+    else:
+        print(f"Project stats updated, fixed {len(drifted_projects)} projects")
+
+
+@manager.option("-p", "--project_id", help="Only rebuild this project", type=int)
+def rebuild_project_contributors(project_id=None):
+    print("Started rebuilding project contributors...")
+    projects_updated = ProjectContributor.rebuild(project_id)
+    print(f"Updated contributor counts of {projects_updated} projects")
+
+
+@manager.option("-u", "--user_id", help="Only rebuild this user", type=int)
+def rebuild_user_task_activity(user_id=None):
+    print("Started rebuilding user task activity...")
+    rows = UserTaskActivity.rebuild(user_id)
+    print(f"Rebuilt the activity of {rows} user tasks")
 
 
 @manager.command
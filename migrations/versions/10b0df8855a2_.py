@@ -0,0 +1,46 @@
+"""Add the outbox of emails sent in the background
+
+Revision ID: 10b0df8855a2
+Revises: 337292b4963f
+Create Date: 2026-10-17 18:05:12.804417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "10b0df8855a2"
+down_revision = "337292b4963f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("to_address", sa.String(), nullable=False),
+        sa.Column("subject", sa.String(), nullable=False),
+        sa.Column("html_message", sa.String(), nullable=False),
+        sa.Column("text_message", sa.String(), nullable=True),
+        sa.Column("status", sa.Integer(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt", sa.DateTime(), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("created", sa.DateTime(), nullable=False),
+        sa.Column("sent", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "idx_email_outbox_pending",
+        "email_outbox",
+        ["next_attempt"],
+        unique=False,
+        postgresql_where=sa.text("status = 0"),
+    )
+
+
+def downgrade():
+    op.drop_index("idx_email_outbox_pending", table_name="email_outbox")
+    op.drop_table("email_outbox")
@@ -0,0 +1,68 @@
+"""Add project contributors aggregate and backfill it from task history
+
+Revision ID: 22663bca858e
+Revises: 703933a70bd6
+Create Date: 2026-10-17 11:24:37.318402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "22663bca858e"
+down_revision = "703933a70bd6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "project_contributors",
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("first_action_date", sa.DateTime(), nullable=False),
+        sa.Column("last_action_date", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("project_id", "user_id"),
+    )
+    op.create_index(
+        op.f("ix_project_contributors_user_id"),
+        "project_contributors",
+        ["user_id"],
+        unique=False,
+    )
+    op.add_column(
+        "projects",
+        sa.Column(
+            "total_contributors", sa.Integer(), server_default="0", nullable=False
+        ),
+    )
+    op.execute(
+        """
+        INSERT INTO project_contributors (project_id, user_id, first_action_date, last_action_date)
+             SELECT project_id, user_id, MIN(action_date), MAX(action_date)
+               FROM task_history
+              WHERE action != 'COMMENT'
+           GROUP BY project_id, user_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE projects p
+           SET total_contributors = c.total
+          FROM (SELECT project_id, COUNT(*) AS total
+                  FROM project_contributors
+              GROUP BY project_id) c
+         WHERE c.project_id = p.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_column("projects", "total_contributors")
+    op.drop_index(
+        op.f("ix_project_contributors_user_id"), table_name="project_contributors"
+    )
+    op.drop_table("project_contributors")
@@ -0,0 +1,65 @@
+"""Add user task activity projection and backfill it from task history
+
+Revision ID: 23dd3dda8e6c
+Revises: 10b0df8855a2
+Create Date: 2026-10-17 18:52:09.417730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "23dd3dda8e6c"
+down_revision = "10b0df8855a2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_task_activity",
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("task_id", sa.Integer(), nullable=False),
+        sa.Column("last_action_date", sa.DateTime(), nullable=False),
+        sa.Column("last_action", sa.String(), nullable=True),
+        sa.Column("comment_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["task_id", "project_id"],
+            ["tasks.id", "tasks.project_id"],
+            ondelete="CASCADE",
+        ),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "project_id", "task_id"),
+    )
+    op.create_index(
+        "idx_user_task_activity_last_action_date",
+        "user_task_activity",
+        ["user_id", "last_action_date", "task_id"],
+        unique=False,
+    )
+    op.execute(
+        """
+        INSERT INTO user_task_activity
+                    (user_id, project_id, task_id, last_action_date, last_action, comment_count)
+             SELECT th.user_id, th.project_id, th.task_id, MAX(th.action_date),
+                    (ARRAY_AGG(th.action_text ORDER BY th.action_date DESC, th.id DESC)
+                        FILTER (WHERE th.action = 'STATE_CHANGE'))[1],
+                    COALESCE(MAX(c.comment_count), 0)
+               FROM task_history th
+               LEFT JOIN (SELECT project_id, task_id, COUNT(*) AS comment_count
+                            FROM task_history
+                           WHERE action = 'COMMENT'
+                        GROUP BY project_id, task_id) c
+                      ON c.project_id = th.project_id AND c.task_id = th.task_id
+           GROUP BY th.user_id, th.project_id, th.task_id
+        """
+    )
+
+
+def downgrade():
+    op.drop_index(
+        "idx_user_task_activity_last_action_date", table_name="user_task_activity"
+    )
+    op.drop_table("user_task_activity")
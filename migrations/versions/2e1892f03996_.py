@@ -0,0 +1,39 @@
+"""Add task state and task geometry versions to projects
+
+Revision ID: 2e1892f03996
+Revises: a9a58fad8c80
+Create Date: 2026-10-17 10:02:17.583301
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "2e1892f03996"
+down_revision = "a9a58fad8c80"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "projects",
+        sa.Column(
+            "task_state_version", sa.BigInteger(), server_default="0", nullable=False
+        ),
+    )
+    op.add_column(
+        "projects",
+        sa.Column(
+            "task_geometry_version",
+            sa.BigInteger(),
+            server_default="0",
+            nullable=False,
+        ),
+    )
+
+
+def downgrade():
+    op.drop_column("projects", "task_geometry_version")
+    op.drop_column("projects", "task_state_version")
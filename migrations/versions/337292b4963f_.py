@@ -0,0 +1,31 @@
+"""Add a cache of the changeset counts of users fetched from OSM
+
+Revision ID: 337292b4963f
+Revises: 74c26eaab4ae
+Create Date: 2026-10-17 17:23:40.518342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "337292b4963f"
+down_revision = "74c26eaab4ae"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_changeset_counts",
+        sa.Column("user_id", sa.BigInteger(), nullable=False),
+        sa.Column("changeset_count", sa.Integer(), nullable=False),
+        sa.Column("last_checked", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("user_changeset_counts")
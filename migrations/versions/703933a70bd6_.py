@@ -0,0 +1,34 @@
+"""Add task state version to tasks for the task changes feed
+
+Revision ID: 703933a70bd6
+Revises: 2e1892f03996
+Create Date: 2026-10-17 10:41:05.912774
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "703933a70bd6"
+down_revision = "2e1892f03996"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "tasks",
+        sa.Column("state_version", sa.BigInteger(), server_default="0", nullable=True),
+    )
+    op.create_index(
+        "idx_tasks_project_id_state_version",
+        "tasks",
+        ["project_id", "state_version"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("idx_tasks_project_id_state_version", table_name="tasks")
+    op.drop_column("tasks", "state_version")
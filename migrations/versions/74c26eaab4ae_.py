@@ -0,0 +1,95 @@
+"""Add incrementally maintained homepage statistics and backfill them
+
+Revision ID: 74c26eaab4ae
+Revises: f37692b73da2
+Create Date: 2026-10-17 16:41:07.219853
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "74c26eaab4ae"
+down_revision = "f37692b73da2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "global_stats",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("total_projects", sa.Integer(), nullable=False),
+        sa.Column("total_area", sa.Float(), nullable=False),
+        sa.Column("total_mappers", sa.Integer(), nullable=False),
+        sa.Column("mappers_online", sa.Integer(), nullable=False),
+        sa.Column("tasks_mapped", sa.Integer(), nullable=False),
+        sa.Column("tasks_validated", sa.Integer(), nullable=False),
+        sa.Column("total_validators", sa.Integer(), nullable=False),
+        sa.Column("total_mapped_area", sa.Float(), nullable=False),
+        sa.Column("total_validated_area", sa.Float(), nullable=False),
+        sa.Column("total_campaigns", sa.Integer(), nullable=False),
+        sa.Column("total_organisations", sa.Integer(), nullable=False),
+        sa.Column("projects_without_campaign", sa.Integer(), nullable=False),
+        sa.Column("organisations_without_project", sa.Integer(), nullable=False),
+        sa.Column("campaigns", postgresql.JSONB(), nullable=False),
+        sa.Column("organisations", postgresql.JSONB(), nullable=False),
+        sa.Column("last_updated", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "idx_tasks_locked_by",
+        "tasks",
+        ["locked_by"],
+        unique=False,
+        postgresql_where=sa.text("locked_by IS NOT NULL"),
+    )
+    # Task statuses 2 and 4 are MAPPED and VALIDATED
+    op.execute(
+        """
+        INSERT INTO global_stats
+             SELECT 1,
+                    (SELECT COUNT(*) FROM projects),
+                    (SELECT COALESCE(SUM(ST_Area(geometry, true)), 0) / 1000000 FROM projects),
+                    (SELECT COUNT(*) FROM users),
+                    (SELECT COUNT(DISTINCT locked_by) FROM tasks WHERE locked_by IS NOT NULL),
+                    t.tasks_mapped,
+                    t.tasks_validated,
+                    t.total_validators,
+                    t.total_mapped_area,
+                    t.total_validated_area,
+                    (SELECT COUNT(*) FROM campaigns),
+                    (SELECT COUNT(*) FROM organisations),
+                    (SELECT COUNT(*) FROM projects p
+                      WHERE NOT EXISTS (SELECT 1 FROM campaign_projects cp WHERE cp.project_id = p.id)),
+                    (SELECT COUNT(*) FROM organisations o
+                      WHERE NOT EXISTS (SELECT 1 FROM projects p WHERE p.organisation_id = o.id)),
+                    (SELECT COALESCE(jsonb_agg(jsonb_build_array(c.name, c.projects) ORDER BY c.name), '[]')
+                       FROM (SELECT c.name, COUNT(*) AS projects
+                               FROM campaigns c
+                               JOIN campaign_projects cp ON cp.campaign_id = c.id
+                           GROUP BY c.id) c),
+                    (SELECT COALESCE(jsonb_agg(jsonb_build_array(o.name, o.projects) ORDER BY o.name), '[]')
+                       FROM (SELECT o.name, COUNT(*) AS projects
+                               FROM organisations o
+                               JOIN projects p ON p.organisation_id = o.id
+                           GROUP BY o.id) o),
+                    NOW() AT TIME ZONE 'UTC'
+               FROM (SELECT COUNT(*) AS tasks_mapped,
+                            COUNT(*) FILTER (WHERE task_status = 4) AS tasks_validated,
+                            COUNT(DISTINCT validated_by) FILTER (WHERE task_status = 4) AS total_validators,
+                            COALESCE(SUM(ST_Area(geometry, true)) FILTER (WHERE task_status = 2), 0) / 1000000
+                                AS total_mapped_area,
+                            COALESCE(SUM(ST_Area(geometry, true)) FILTER (WHERE task_status = 4), 0) / 1000000
+                                AS total_validated_area
+                       FROM tasks
+                      WHERE task_status IN (2, 4)) t
+        """
+    )
+
+
+def downgrade():
+    op.drop_index("idx_tasks_locked_by", table_name="tasks")
+    op.drop_table("global_stats")
@@ -0,0 +1,32 @@
+"""Add open task locks index used by the lock expiry scheduler
+
+Revision ID: a9a58fad8c80
+Revises: 8a6419f289aa
+Create Date: 2026-10-17 09:12:41.204516
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a9a58fad8c80"
+down_revision = "8a6419f289aa"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "idx_task_history_open_locks",
+        "task_history",
+        ["action_date"],
+        unique=False,
+        postgresql_where=sa.text(
+            "action_text IS NULL AND action IN ('LOCKED_FOR_MAPPING', 'LOCKED_FOR_VALIDATION')"
+        ),
+    )
+
+
+def downgrade():
+    op.drop_index("idx_task_history_open_locks", table_name="task_history")
@@ -0,0 +1,54 @@
+"""Add typed lock duration to task history and backfill it from action_text
+
+Revision ID: d770f1e90732
+Revises: 22663bca858e
+Create Date: 2026-10-17 12:02:49.530117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "d770f1e90732"
+down_revision = "22663bca858e"
+branch_labels = None
+depends_on = None
+
+# task_history is large, backfill it in id ranges so each update stays short
+BATCH_SIZE = 100000
+
+
+def upgrade():
+    op.add_column("task_history", sa.Column("lock_duration", sa.Interval()))
+
+    conn = op.get_bind()
+    max_id = conn.execute(sa.text("SELECT MAX(id) FROM task_history")).scalar() or 0
+    for first_id in range(0, max_id + 1, BATCH_SIZE):
+        conn.execute(
+            sa.text(
+                """
+                UPDATE task_history
+                   SET lock_duration = CAST(action_text AS interval)
+                 WHERE id >= :first_id AND id < :last_id
+                   AND action IN ('LOCKED_FOR_MAPPING', 'LOCKED_FOR_VALIDATION',
+                                  'AUTO_UNLOCKED_FOR_MAPPING', 'AUTO_UNLOCKED_FOR_VALIDATION')
+                   AND action_text ~ '^[0-9]{1,2}:[0-9]{2}:[0-9]{2}(\\.[0-9]+)?$'
+                """
+            ),
+            first_id=first_id,
+            last_id=first_id + BATCH_SIZE,
+        )
+
+    op.create_index(
+        "idx_task_history_lock_duration",
+        "task_history",
+        ["project_id", "action", "lock_duration"],
+        unique=False,
+        postgresql_where=sa.text("lock_duration IS NOT NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index("idx_task_history_lock_duration", table_name="task_history")
+    op.drop_column("task_history", "lock_duration")
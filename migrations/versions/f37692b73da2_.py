@@ -0,0 +1,71 @@
+"""Add precomputed project statistics and backfill them
+
+Revision ID: f37692b73da2
+Revises: d770f1e90732
+Create Date: 2026-10-17 15:02:18.640731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "f37692b73da2"
+down_revision = "d770f1e90732"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "project_stats",
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("area", sa.Float(), nullable=True),
+        sa.Column("total_mappers", sa.Integer(), nullable=False),
+        sa.Column("total_comments", sa.Integer(), nullable=False),
+        sa.Column("total_mapping_time", sa.Float(), nullable=False),
+        sa.Column("total_mapping_locks", sa.Integer(), nullable=False),
+        sa.Column("total_validation_time", sa.Float(), nullable=False),
+        sa.Column("total_validation_locks", sa.Integer(), nullable=False),
+        sa.Column("estimated_mapping_time", sa.Float(), nullable=True),
+        sa.Column("estimated_validation_time", sa.Float(), nullable=True),
+        sa.Column("last_updated", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("project_id"),
+    )
+    op.execute(
+        """
+        INSERT INTO project_stats (project_id, area, total_mappers, total_comments,
+                                   total_mapping_time, total_mapping_locks,
+                                   total_validation_time, total_validation_locks, last_updated)
+             SELECT p.id,
+                    ST_Area(p.geometry, true) / 1000000,
+                    COALESCE(m.total, 0),
+                    COALESCE(c.total, 0),
+                    COALESCE(EXTRACT(EPOCH FROM l.mapping_time), 0),
+                    COALESCE(l.mapping_locks, 0),
+                    COALESCE(EXTRACT(EPOCH FROM l.validation_time), 0),
+                    COALESCE(l.validation_locks, 0),
+                    NOW() AT TIME ZONE 'UTC'
+               FROM projects p
+               LEFT JOIN (SELECT project_id, COUNT(*) AS total
+                            FROM (SELECT UNNEST(projects_mapped) AS project_id FROM users) u
+                        GROUP BY project_id) m ON m.project_id = p.id
+               LEFT JOIN (SELECT project_id, COUNT(*) AS total
+                            FROM project_chat
+                        GROUP BY project_id) c ON c.project_id = p.id
+               LEFT JOIN (SELECT project_id,
+                                 SUM(lock_duration) FILTER (WHERE action ~ '_FOR_MAPPING$') AS mapping_time,
+                                 COUNT(*) FILTER (WHERE action ~ '_FOR_MAPPING$') AS mapping_locks,
+                                 SUM(lock_duration) FILTER (WHERE action ~ '_FOR_VALIDATION$')
+                                     AS validation_time,
+                                 COUNT(*) FILTER (WHERE action ~ '_FOR_VALIDATION$') AS validation_locks
+                            FROM task_history
+                           WHERE lock_duration IS NOT NULL
+                        GROUP BY project_id) l ON l.project_id = p.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("project_stats")
@@ -0,0 +1,38 @@
+"""Backfill the unread message counts of notifications, maintained from now on
+
+Revision ID: fe069dfeda20
+Revises: 23dd3dda8e6c
+Create Date: 2026-10-17 19:21:45.093164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "fe069dfeda20"
+down_revision = "23dd3dda8e6c"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        UPDATE notifications n
+           SET unread_count = (SELECT COUNT(*)
+                                 FROM messages m
+                                WHERE m.to_user_id = n.user_id
+                                  AND m.date > n.date
+                                  AND m.read IS NOT TRUE)
+        """
+    )
+    op.alter_column(
+        "notifications", "unread_count", existing_type=sa.Integer(), nullable=False
+    )
+
+
+def downgrade():
+    op.alter_column(
+        "notifications", "unread_count", existing_type=sa.Integer(), nullable=True
+    )
@@ -0,0 +1,104 @@
+"""
+Benchmark for Task.auto_unlock_tasks
+
+Seeds a project with a large number of expired locks in the test database and times how long the
+auto-unlock takes, along with the number of SQL statements issued. Run from the repository root:
+
+    python scripts/profiler/auto_unlock_benchmark.py --tasks 10000
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from sqlalchemy import event, text  # noqa: E402
+
+from backend import create_app, db  # noqa: E402
+from backend.models.postgis.task import Task  # noqa: E402
+from backend.models.postgis.statuses import TaskStatus  # noqa: E402
+from tests.backend.helpers.test_helpers import create_canned_project  # noqa: E402
+
+
+def seed_expired_locks(project_id: int, user_id: int, number_of_tasks: int):
+    """Clones the first canned task into number_of_tasks tasks locked for mapping before the expiry date"""
+    locked_at = (
+        datetime.datetime.utcnow()
+        - Task.auto_unlock_delta()
+        - datetime.timedelta(hours=1)
+    )
+    params = dict(
+        project_id=project_id,
+        user_id=user_id,
+        first_id=100,
+        last_id=100 + number_of_tasks - 1,
+        locked=TaskStatus.LOCKED_FOR_MAPPING.value,
+        locked_at=locked_at,
+    )
+    db.session.execute(
+        text(
+            """
+            DELETE FROM task_history WHERE project_id = :project_id AND task_id >= :first_id;
+            DELETE FROM tasks WHERE project_id = :project_id AND id >= :first_id;
+            INSERT INTO tasks (id, project_id, x, y, zoom, is_square, geometry, task_status, locked_by)
+                 SELECT g, :project_id, t.x, t.y, t.zoom, t.is_square, t.geometry, :locked, :user_id
+                   FROM generate_series(:first_id, :last_id) g,
+                        tasks t
+                  WHERE t.project_id = :project_id AND t.id = 1;
+            INSERT INTO task_history (project_id, task_id, action, action_date, user_id)
+                 SELECT :project_id, g, 'LOCKED_FOR_MAPPING', :locked_at, :user_id
+                   FROM generate_series(:first_id, :last_id) g;
+            """
+        ),
+        params,
+    )
+    db.session.commit()
+
+
+def run(name: str, unlock, project_id: int):
+    statements = []
+
+    def count_statement(*args):
+        statements.append(1)
+
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    started = time.perf_counter()
+    unlock(project_id)
+    elapsed = time.perf_counter() - started
+    event.remove(db.engine, "before_cursor_execute", count_statement)
+
+    still_locked = Task.query.filter(
+        Task.project_id == project_id,
+        Task.task_status == TaskStatus.LOCKED_FOR_MAPPING.value,
+    ).count()
+    print(
+        f"{name:>10}: {elapsed:8.2f}s {len(statements):8d} statements "
+        f"{still_locked:8d} tasks still locked"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tasks", type=int, default=10000)
+    args = parser.parse_args()
+
+    app = create_app("backend.config.TestEnvironmentConfig")
+    with app.app_context():
+        db.create_all()
+        project, user = create_canned_project()
+        try:
+            for size in sorted({100, 1000, args.tasks}):
+                if size > args.tasks:
+                    continue
+                print(f"{size} expired locks")
+                seed_expired_locks(project.id, user.id, size)
+                run("bulk", Task.auto_unlock_tasks, project.id)
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark for the single pass aggregations of organisation, user and project stats
+
+Seeds the canned project with a large number of tasks in every status in the test database, then times the
+organisation, user and project stats along with the number of SQL statements issued. Run from the repository
+root:
+
+    python scripts/profiler/stats_aggregation_benchmark.py --tasks 100000 --repeat 5
+
+Each stat is also timed with the previous implementation, issuing a COUNT query per counter, on the same
+data set.
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from sqlalchemy import event, text  # noqa: E402
+
+from backend import create_app, db  # noqa: E402
+from backend.models.postgis.organisation import Organisation  # noqa: E402
+from backend.models.postgis.project import Project  # noqa: E402
+from backend.models.postgis.statuses import (  # noqa: E402
+    MappingLevel,
+    ProjectStatus,
+    TaskStatus,
+    UserGender,
+)
+from backend.models.postgis.task import Task  # noqa: E402
+from backend.models.postgis.user import User  # noqa: E402
+from backend.services.organisation_service import OrganisationService  # noqa: E402
+from backend.services.stats_service import StatsService  # noqa: E402
+from tests.backend.helpers.test_helpers import create_canned_project  # noqa: E402
+
+
+def seed_tasks(project_id: int, number_of_tasks: int):
+    """Clones the first canned task into number_of_tasks tasks, spread over all the task statuses"""
+    db.session.execute(
+        text(
+            """
+            DELETE FROM tasks WHERE project_id = :project_id AND id >= :first_id;
+            INSERT INTO tasks (id, project_id, x, y, zoom, is_square, geometry, task_status)
+                 SELECT g, :project_id, t.x, t.y, t.zoom, t.is_square, t.geometry, g % :statuses
+                   FROM generate_series(:first_id, :last_id) g,
+                        tasks t
+                  WHERE t.project_id = :project_id AND t.id = 1;
+            """
+        ),
+        dict(
+            project_id=project_id,
+            first_id=100,
+            last_id=100 + number_of_tasks - 1,
+            statuses=len(TaskStatus) - 1,
+        ),
+    )
+    db.session.commit()
+
+
+def legacy_organisation_stats(organisation_id: int):
+    """A COUNT query per project and task status, as it was done before the single pass version"""
+    projects = db.session.query(Project.id, Project.status).filter(
+        Project.organisation_id == organisation_id
+    )
+    published_projects = projects.filter(
+        Project.status == ProjectStatus.PUBLISHED.value
+    )
+    active_tasks = db.session.query(Task.id, Task.project_id, Task.task_status).filter(
+        Task.project_id.in_([i.id for i in published_projects.all()])
+    )
+    for status in (ProjectStatus.DRAFT, ProjectStatus.ARCHIVED):
+        projects.filter(Project.status == status.value).count()
+    published_projects.count()
+    for status in TaskStatus:
+        if status != TaskStatus.SPLIT:
+            active_tasks.filter(Task.task_status == status.value).count()
+
+
+def legacy_users_statistics(start_date: datetime.date, end_date: datetime.date):
+    """A COUNT query per counter, as it was done before the single pass version"""
+    users = User.query.filter(
+        User.date_registered >= start_date,
+        User.date_registered <= end_date,
+    )
+    users.count()
+    for level in MappingLevel:
+        users.filter(User.mapping_level == level.value).count()
+    users.filter(User.projects_mapped.isnot(None)).count()
+    users.filter(User.is_email_verified.is_(True)).count()
+    for gender in UserGender:
+        users.filter(User.gender == gender.value).count()
+
+
+def legacy_project_stats(project_id: int):
+    """A COUNT query per task status, as it was done before the single pass version"""
+    project = Project.get(project_id)
+    tasks = Task.query.filter(Task.project_id == project_id)
+    project.total_tasks = tasks.count()
+    project.tasks_mapped = tasks.filter(
+        Task.task_status == TaskStatus.MAPPED.value
+    ).count()
+    project.tasks_validated = tasks.filter(
+        Task.task_status == TaskStatus.VALIDATED.value
+    ).count()
+    project.tasks_bad_imagery = tasks.filter(
+        Task.task_status == TaskStatus.BADIMAGERY.value
+    ).count()
+    project.save()
+
+
+def run(name: str, stats, repeat: int):
+    statements = []
+
+    def count_statement(*args):
+        statements.append(1)
+
+    event.listen(db.engine, "before_cursor_execute", count_statement)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        stats()
+    elapsed = (time.perf_counter() - started) / repeat
+    event.remove(db.engine, "before_cursor_execute", count_statement)
+    print(
+        f"{name:>20}: {elapsed * 1000:10.1f}ms {len(statements) // repeat:4d} statements"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app("backend.config.TestEnvironmentConfig")
+    with app.app_context():
+        db.create_all()
+        project, user = create_canned_project()
+        try:
+            project.status = ProjectStatus.PUBLISHED.value
+            organisation = Organisation(name="Benchmark organisation")
+            db.session.add(organisation)
+            db.session.flush()
+            project.organisation_id = organisation.id
+            db.session.commit()
+            seed_tasks(project.id, args.tasks)
+            today = datetime.date.today()
+            last_year = today - datetime.timedelta(days=365)
+            print(f"{args.tasks} tasks")
+
+            run(
+                "organisation",
+                lambda: OrganisationService.get_organisation_stats(organisation.id),
+                args.repeat,
+            )
+            run(
+                "legacy organisation",
+                lambda: legacy_organisation_stats(organisation.id),
+                args.repeat,
+            )
+            run(
+                "users",
+                lambda: StatsService.get_all_users_statistics(last_year, today),
+                args.repeat,
+            )
+            run(
+                "legacy users",
+                lambda: legacy_users_statistics(last_year, today),
+                args.repeat,
+            )
+            run(
+                "project",
+                lambda: StatsService.update_project_stats(project.id),
+                args.repeat,
+            )
+            run("legacy project", lambda: legacy_project_stats(project.id), args.repeat)
+        finally:
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
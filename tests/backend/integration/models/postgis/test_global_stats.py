@@ -0,0 +1,51 @@
+from backend.models.postgis.global_stats import GlobalStats
+from backend.models.postgis.statuses import TaskStatus
+from backend.models.postgis.task import Task
+from tests.backend.base import BaseTestCase
+from tests.backend.helpers.test_helpers import create_canned_project
+
+
+class TestGlobalStats(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_project, self.test_user = create_canned_project()
+
+    def get_counters(self) -> tuple:
+        stats = GlobalStats.query.get(1)
+        GlobalStats.query.session.refresh(stats)
+        return (
+            stats.tasks_mapped,
+            stats.tasks_validated,
+            round(stats.total_mapped_area, 6),
+            round(stats.total_validated_area, 6),
+            stats.mappers_online,
+        )
+
+    def test_homepage_stats_are_refreshed_on_first_read(self):
+        # Act
+        stats = GlobalStats.get_homepage_stats_dto(abbrev=False)
+
+        # Assert
+        self.assertEqual(stats.total_projects, 1)
+        self.assertGreater(stats.tasks_mapped, 0)
+        self.assertGreater(stats.total_area, 0)
+        self.assertEqual(stats.campaigns[-1].campaign, "Unassociated")
+        self.assertIsNotNone(GlobalStats.query.get(1))
+
+    def test_task_state_changes_update_the_counters(self):
+        # Arrange
+        GlobalStats.refresh()
+        task = Task.get(1, self.test_project.id)
+        last_state = TaskStatus(task.task_status)
+
+        # Act
+        task.task_status = TaskStatus.VALIDATED.value
+        task.update()
+        GlobalStats.record_task_state_change(
+            self.test_project.id, task.id, last_state.name, TaskStatus.VALIDATED.name
+        )
+        incremental = self.get_counters()
+
+        # Assert: incremental counters match the ones rebuilt from the source tables
+        GlobalStats.refresh()
+        self.assertEqual(incremental, self.get_counters())
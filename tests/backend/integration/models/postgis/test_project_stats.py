@@ -0,0 +1,78 @@
+import datetime
+
+from backend.models.dtos.message_dto import ChatMessageDTO
+from backend.models.postgis.project_chat import ProjectChat
+from backend.models.postgis.project_stats import ProjectStats
+from backend.models.postgis.task import Task, TaskHistory
+from backend.models.postgis.statuses import TaskStatus
+from backend.models.postgis.user import User
+from backend.models.postgis.utils import NotFound
+from tests.backend.base import BaseTestCase
+from tests.backend.helpers.test_helpers import create_canned_project
+
+
+class TestProjectStats(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_project, self.test_user = create_canned_project()
+
+    def test_project_stats_are_refreshed_on_first_read(self):
+        # Act
+        stats = ProjectStats.get_project_stats_dto(self.test_project.id)
+
+        # Assert
+        self.assertEqual(stats.project_id, self.test_project.id)
+        self.assertEqual(stats.total_tasks, self.test_project.total_tasks)
+        self.assertGreater(stats.area, 0)
+        self.assertEqual(stats.total_mapping_time, 0)
+        self.assertIsNotNone(ProjectStats.query.get(self.test_project.id))
+
+    def test_project_stats_raise_not_found_for_unknown_projects(self):
+        with self.assertRaises(NotFound):
+            ProjectStats.get_project_stats_dto(999999)
+
+    def test_lock_durations_mappers_and_comments_update_project_stats(self):
+        # Arrange
+        project_id = self.test_project.id
+        ProjectStats.refresh(project_id)
+        task = Task.get(2, project_id)
+
+        # Act
+        task.lock_task_for_mapping(self.test_user.id)
+        last_locked = TaskHistory.get_last_locked_action(project_id, task.id)
+        last_locked.action_date = datetime.datetime.utcnow() - datetime.timedelta(
+            minutes=10
+        )
+        task.unlock_task(self.test_user.id, TaskStatus.MAPPED)
+        User.upsert_mapped_projects(self.test_user.id, project_id)
+        chat_dto = ChatMessageDTO()
+        chat_dto.project_id = project_id
+        chat_dto.user_id = self.test_user.id
+        chat_dto.message = "Test"
+        ProjectChat.create_from_dto(chat_dto)
+        ProjectChat.query.session.commit()
+
+        # Assert
+        stats = ProjectStats.query.get(project_id)
+        self.assertEqual(stats.total_mapping_locks, 1)
+        self.assertGreaterEqual(stats.total_mapping_time, 600)
+        self.assertEqual(stats.total_comments, 1)
+
+        # Incremental counters match the ones rebuilt from the source tables
+        incremental = (
+            stats.total_mappers,
+            stats.total_comments,
+            stats.total_mapping_locks,
+            round(stats.total_mapping_time),
+        )
+        ProjectStats.refresh(project_id)
+        stats = ProjectStats.query.get(project_id)
+        self.assertEqual(
+            incremental,
+            (
+                stats.total_mappers,
+                stats.total_comments,
+                stats.total_mapping_locks,
+                round(stats.total_mapping_time),
+            ),
+        )
@@ -0,0 +1,169 @@
+import datetime
+import geojson
+
+from backend.models.postgis.project import Project
+from backend.models.postgis.project_contributor import ProjectContributor
+from backend.models.postgis.task import Task, TaskHistory, TaskAction
+from backend.models.postgis.statuses import TaskStatus
+from backend.models.postgis.utils import NotFound
+from tests.backend.base import BaseTestCase
+from tests.backend.helpers.test_helpers import create_canned_project
+
+
+class TestTask(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_project, self.test_user = create_canned_project()
+
+    def expire_last_lock(self, task: Task):
+        last_locked = TaskHistory.get_last_locked_action(task.project_id, task.id)
+        last_locked.action_date = (
+            datetime.datetime.utcnow()
+            - Task.auto_unlock_delta()
+            - datetime.timedelta(minutes=1)
+        )
+        task.update()
+
+    def test_auto_unlock_tasks_restores_last_status(self):
+        # Arrange
+        mapped_task = Task.get(1, self.test_project.id)
+        mapped_task.set_task_history(
+            TaskAction.STATE_CHANGE, self.test_user.id, None, TaskStatus.MAPPED
+        )
+        mapped_task.lock_task_for_validating(self.test_user.id)
+        self.expire_last_lock(mapped_task)
+
+        ready_task = Task.get(2, self.test_project.id)
+        ready_task.lock_task_for_mapping(self.test_user.id)
+        self.expire_last_lock(ready_task)
+
+        # Act
+        Task.auto_unlock_tasks(self.test_project.id)
+
+        # Assert
+        self.assertEqual(mapped_task.task_status, TaskStatus.MAPPED.value)
+        self.assertIsNone(mapped_task.locked_by)
+        self.assertEqual(ready_task.task_status, TaskStatus.READY.value)
+        self.assertIsNone(ready_task.locked_by)
+
+        last_action = TaskHistory.get_last_locked_or_auto_unlocked_action(
+            self.test_project.id, mapped_task.id
+        )
+        self.assertEqual(
+            last_action.action, TaskAction.AUTO_UNLOCKED_FOR_VALIDATION.name
+        )
+        self.assertIsNotNone(last_action.action_text)
+
+    def test_auto_unlock_tasks_keeps_unexpired_locks(self):
+        # Arrange
+        task = Task.get(2, self.test_project.id)
+        task.lock_task_for_mapping(self.test_user.id)
+
+        # Act
+        Task.auto_unlock_tasks(self.test_project.id)
+
+        # Assert
+        self.assertEqual(task.task_status, TaskStatus.LOCKED_FOR_MAPPING.value)
+        self.assertEqual(task.locked_by, self.test_user.id)
+
+    def test_streamed_feature_collection_matches_feature_collection(self):
+        # Act
+        streamed = b"".join(
+            Task.stream_tasks_as_geojson_feature_collection(self.test_project.id)
+        )
+        feature_collection = Task.get_tasks_as_geojson_feature_collection(
+            self.test_project.id
+        )
+
+        # Assert
+        streamed_collection = geojson.loads(streamed.decode("utf-8"))
+        self.assertIsInstance(streamed_collection, geojson.FeatureCollection)
+        self.assertEqual(
+            sorted(f.properties["taskId"] for f in streamed_collection.features),
+            sorted(f.properties["taskId"] for f in feature_collection.features),
+        )
+        task = next(
+            f for f in streamed_collection.features if f.properties["taskId"] == 1
+        )
+        self.assertEqual(task.properties["taskStatus"], TaskStatus.MAPPED.name)
+
+    def test_streamed_feature_collection_raises_not_found_for_unknown_tasks(self):
+        with self.assertRaises(NotFound):
+            Task.stream_tasks_as_geojson_feature_collection(self.test_project.id, "999")
+
+    def test_task_changes_bump_project_task_versions(self):
+        # Arrange
+        state_version, geometry_version = Project.get_task_versions(
+            self.test_project.id
+        )
+        task = Task.get(2, self.test_project.id)
+
+        # Act
+        task.lock_task_for_mapping(self.test_user.id)
+
+        # Assert
+        new_state_version, new_geometry_version = Project.get_task_versions(
+            self.test_project.id
+        )
+        self.assertGreater(new_state_version, state_version)
+        self.assertEqual(new_geometry_version, geometry_version)
+
+        # Act
+        task.delete()
+
+        # Assert
+        _, new_geometry_version = Project.get_task_versions(self.test_project.id)
+        self.assertGreater(new_geometry_version, geometry_version)
+
+    def test_task_history_maintains_project_contributors(self):
+        # Arrange
+        project_id = self.test_project.id
+        ProjectContributor.rebuild(project_id)
+        self.assertEqual(Project.get_project_total_contributions(project_id), 0)
+        task = Task.get(2, project_id)
+
+        # Act
+        task.set_task_history(TaskAction.COMMENT, self.test_user.id, "Comment")
+        task.update()
+
+        # Assert
+        self.assertEqual(Project.get_project_total_contributions(project_id), 0)
+
+        # Act
+        task.lock_task_for_mapping(self.test_user.id)
+        task.set_task_history(
+            TaskAction.STATE_CHANGE, self.test_user.id, None, TaskStatus.MAPPED
+        )
+        task.update()
+
+        # Assert
+        self.assertEqual(Project.get_project_total_contributions(project_id), 1)
+        self.assertEqual(ProjectContributor.rebuild(project_id), 0)
+
+    def test_unlocking_tasks_records_lock_duration(self):
+        # Arrange
+        task = Task.get(2, self.test_project.id)
+        task.lock_task_for_mapping(self.test_user.id)
+
+        # Act
+        task.unlock_task(self.test_user.id, TaskStatus.MAPPED)
+
+        # Assert
+        last_locked = TaskHistory.query.filter_by(
+            project_id=self.test_project.id,
+            task_id=task.id,
+            action=TaskAction.LOCKED_FOR_MAPPING.name,
+        ).one()
+        self.assertIsNotNone(last_locked.action_text)
+        self.assertGreaterEqual(last_locked.lock_duration, datetime.timedelta(0))
+
+        # Act
+        task.lock_task_for_validating(self.test_user.id)
+        self.expire_last_lock(task)
+        Task.auto_unlock_tasks(self.test_project.id)
+
+        # Assert
+        auto_unlocked = TaskHistory.get_last_locked_or_auto_unlocked_action(
+            self.test_project.id, task.id
+        )
+        self.assertEqual(auto_unlocked.lock_duration, Task.auto_unlock_delta())
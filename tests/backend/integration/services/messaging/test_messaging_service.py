@@ -1,4 +1,15 @@
+import base64
+
+from flask import current_app
+
+from backend.models.dtos.message_dto import MessageDTO
+from backend.models.postgis.email_outbox import OutboxEmail
+from backend.models.postgis.message import Message, MessageType
+from backend.models.postgis.notification import Notification
+from backend.models.postgis.user import User
 from backend.services.messaging.message_service import MessageService
+from backend.services.notification_service import NotificationService
+from backend.services.users.authentication_service import AuthenticationService
 from tests.backend.helpers.test_helpers import create_canned_user
 from tests.backend.base import BaseTestCase
 
@@ -16,3 +27,144 @@ class TestMessageService(BaseTestCase):
 
         # Tidyup
         MessageService.delete_message(message_id, self.test_user.id)
+
+    def test_get_all_messages_with_cursor_pages_through_messages(self):
+        # Arrange
+        self.test_user = create_canned_user()
+        message_ids = [
+            MessageService.send_welcome_message(self.test_user) for _ in range(3)
+        ]
+
+        # Act
+        first_page = MessageService.get_all_messages(
+            self.test_user.id, "en", 1, 2, "date", "desc", cursor=""
+        )
+        second_page = MessageService.get_all_messages(
+            self.test_user.id,
+            "en",
+            1,
+            2,
+            "date",
+            "desc",
+            cursor=first_page.pagination.next_cursor,
+        )
+
+        # Assert
+        self.assertEqual(len(first_page.user_messages), 2)
+        self.assertTrue(first_page.pagination.has_next)
+        self.assertIsNone(first_page.pagination.total)
+        self.assertEqual(len(second_page.user_messages), 1)
+        self.assertFalse(second_page.pagination.has_next)
+        self.assertEqual(
+            sorted(
+                m.message_id
+                for m in first_page.user_messages + second_page.user_messages
+            ),
+            sorted(message_ids),
+        )
+
+        # Tidyup
+        for message_id in message_ids:
+            MessageService.delete_message(message_id, self.test_user.id)
+
+    def test_broadcast_message_respects_notification_settings(self):
+        # Arrange
+        sender = create_canned_user()
+        recipients = []
+        for i, (verified, teams_notifications) in enumerate(
+            [(True, True), (True, False), (False, True)]
+        ):
+            user = User(
+                id=100 + i,
+                username=f"Recipient {i}",
+                mapping_level=1,
+                email_address=f"recipient{i}@example.com",
+                is_email_verified=verified,
+                teams_notifications=teams_notifications,
+            )
+            user.create()
+            recipients.append(user.id)
+        current_app.config["EMAIL_FROM_ADDRESS"] = "tasks@example.com"
+        current_app.config["SMTP_SETTINGS"] = dict(
+            current_app.config["SMTP_SETTINGS"], host="127.0.0.1"
+        )
+        message_dto = MessageDTO()
+        message_dto.from_user_id = sender.id
+        message_dto.subject = "Team news"
+        message_dto.message = "Hello team"
+
+        # Act
+        MessageService.broadcast_message(
+            recipients, message_dto, MessageType.TEAM_BROADCAST
+        )
+
+        # Assert: all members get the message, only the verified one with team alerts on gets an email
+        messages = Message.query.filter(Message.to_user_id.in_(recipients)).all()
+        self.assertEqual(sorted(m.to_user_id for m in messages), recipients)
+        emails = OutboxEmail.query.all()
+        self.assertEqual(
+            [email.to_address for email in emails], ["recipient0@example.com"]
+        )
+        # The email links to the message of its recipient
+        message_id = next(m.id for m in messages if m.to_user_id == recipients[0])
+        self.assertIn(f"/inbox/message/{message_id}", emails[0].html_message)
+
+    def test_unread_count_is_maintained_as_messages_change(self):
+        # Arrange
+        self.test_user = create_canned_user()
+        self.assertEqual(Notification.get_unread_message_count(self.test_user.id), 0)
+
+        # Act
+        message_ids = [
+            MessageService.send_welcome_message(self.test_user) for _ in range(3)
+        ]
+
+        # Assert
+        self.assertEqual(
+            MessageService.has_user_new_messages(self.test_user.id),
+            dict(newMessages=True, unread=3),
+        )
+
+        # Act
+        MessageService.get_message_as_dto(message_ids[0], self.test_user.id)
+        MessageService.get_message_as_dto(message_ids[0], self.test_user.id)
+        MessageService.delete_multiple_messages(message_ids[:2], self.test_user.id)
+
+        # Assert: a message read then deleted is only uncounted once
+        self.assertEqual(Notification.get_unread_message_count(self.test_user.id), 1)
+
+        # Act
+        NotificationService.update(self.test_user.id)
+
+        # Assert
+        self.assertEqual(Notification.get_unread_message_count(self.test_user.id), 0)
+
+    def test_count_unread_api_returns_not_modified(self):
+        # Arrange
+        self.test_user = create_canned_user()
+        token = AuthenticationService.generate_session_token_for_user(self.test_user.id)
+        headers = {
+            "Authorization": "Token "
+            + base64.b64encode(token.encode("utf-8")).decode("utf-8")
+        }
+        url = "/api/v2/notifications/queries/own/count-unread/"
+        response = self.client.get(url, headers=headers)
+        etag = response.headers["ETag"]
+
+        # Act
+        response = self.client.get(
+            url, headers=dict(headers, **{"If-None-Match": etag})
+        )
+
+        # Assert
+        self.assertEqual(response.status_code, 304)
+
+        # Act
+        MessageService.send_welcome_message(self.test_user)
+        response = self.client.get(
+            url, headers=dict(headers, **{"If-None-Match": etag})
+        )
+
+        # Assert
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json["unread"], 1)
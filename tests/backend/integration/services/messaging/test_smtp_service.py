@@ -1,10 +1,63 @@
 import os
+import socketserver
+import threading
 from urllib.parse import urlparse, parse_qs
 
+from flask import current_app
+
+from backend import db
+from backend.models.postgis.email_outbox import OutboxEmail
+from backend.models.postgis.statuses import EmailStatus
+from backend.services.messaging import smtp_service
 from backend.services.messaging.smtp_service import SMTPService
 from tests.backend.base import BaseTestCase
 
 
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubSMTPHandler)
+        self.connections = 0
+        self.messages = []
+
+
+class StubSMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal SMTP server recording the messages it receives, refusing recipients named refused and all the
+    logins
+    """
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode("utf-8"))
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 stub ESMTP")
+        while True:
+            line = self.rfile.readline().decode("utf-8").strip()
+            command = line.split(" ", 1)[0].upper()
+            if not line or command == "QUIT":
+                self.reply("221 Bye")
+                return
+            elif command == "EHLO":
+                self.reply("250-stub")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif command == "AUTH":
+                self.reply("535 Authentication credentials invalid")
+            elif command == "RCPT" and "refused" in line:
+                self.reply("550 No such user")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in iter(self.rfile.readline, b".\r\n"):
+                    data.append(data_line)
+                self.server.messages.append(b"".join(data))
+                self.reply("250 OK")
+            else:
+                self.reply("250 OK")
+
+
 class TestStatsService(BaseTestCase):
     def test_send_verification_mail(self):
 
@@ -69,3 +122,66 @@ class TestStatsService(BaseTestCase):
         self.assertTrue(
             query["token"]
         )  # Token random every time so just check we have something
+
+    def close_smtp_connection(self):
+        if smtp_service.smtp_connection is not None:
+            smtp_service.smtp_connection.quit()
+            smtp_service.smtp_connection = None
+        smtp_service.smtp_connection_failures = 0
+
+    def start_smtp_server(self, smtp_user=None, smtp_password=None):
+        server = StubSMTPServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        self.addCleanup(self.close_smtp_connection)
+        current_app.config["EMAIL_FROM_ADDRESS"] = "tasks@example.com"
+        current_app.config["SMTP_SETTINGS"] = dict(
+            host="127.0.0.1",
+            smtp_port=server.server_address[1],
+            smtp_user=smtp_user,
+            smtp_password=smtp_password,
+            smtp_starttls=False,
+        )
+        return server
+
+    def test_queued_emails_are_sent_over_one_connection(self):
+        # Arrange
+        server = self.start_smtp_server()
+        for to_address in ("one@example.com", "refused@example.com", "two@example.com"):
+            SMTPService._send_message(to_address, "Subject", "<p>Hello</p>")
+        db.session.commit()
+
+        # Act
+        emails_sent = SMTPService.send_queued_emails(batch_size=2)
+
+        # Assert
+        self.assertEqual(emails_sent, 2)
+        self.assertEqual(len(server.messages), 2)
+        self.assertEqual(server.connections, 1)
+        statuses = {
+            email.to_address: EmailStatus(email.status)
+            for email in OutboxEmail.query.all()
+        }
+        self.assertEqual(statuses["one@example.com"], EmailStatus.SENT)
+        self.assertEqual(statuses["two@example.com"], EmailStatus.SENT)
+        self.assertEqual(statuses["refused@example.com"], EmailStatus.FAILED)
+        self.assertEqual(SMTPService.send_queued_emails(), 0)
+
+    def test_queued_emails_are_kept_when_the_login_fails(self):
+        # Arrange
+        server = self.start_smtp_server(smtp_user="tasks", smtp_password="wrong")
+        for to_address in ("one@example.com", "two@example.com"):
+            SMTPService._send_message(to_address, "Subject", "<p>Hello</p>")
+        db.session.commit()
+
+        # Act
+        emails_sent = SMTPService.send_queued_emails()
+
+        # Assert
+        self.assertEqual(emails_sent, 0)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.messages, [])
+        for email in OutboxEmail.query.all():
+            self.assertEqual(EmailStatus(email.status), EmailStatus.PENDING)
+            self.assertEqual(email.attempts, 0)
+            self.assertGreater(email.next_attempt, email.created)
@@ -0,0 +1,44 @@
+import json
+
+from backend.models.postgis.task import Task
+from backend.services.event_stream_service import (
+    EventStreamService,
+    event_broker,
+    project_channel,
+)
+from tests.backend.base import BaseTestCase
+from tests.backend.helpers.test_helpers import create_canned_project
+
+
+class TestEventStreamService(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_project, self.test_user = create_canned_project()
+
+    def test_task_changes_are_streamed_through_postgres(self):
+        # Arrange
+        events = EventStreamService.stream(project_channel(self.test_project.id))
+        self.addCleanup(events.close)
+        next(events)
+        self.assertTrue(event_broker.listening.wait(10))
+
+        # Act
+        Task.get(2, self.test_project.id).lock_task_for_mapping(self.test_user.id)
+
+        # Assert
+        event = next(events)
+        while event.startswith(":"):
+            event = next(events)
+        name, data = event.strip().split("\n")
+        changes = json.loads(data.split("data: ", 1)[1])
+        self.assertEqual(name, "event: tasks")
+        self.assertEqual(
+            changes["tasks"],
+            [
+                dict(
+                    taskId=2,
+                    taskStatus="LOCKED_FOR_MAPPING",
+                    lockedBy=self.test_user.id,
+                )
+            ],
+        )
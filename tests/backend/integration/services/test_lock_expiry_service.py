@@ -0,0 +1,50 @@
+import datetime
+
+from backend.models.postgis.task import Task, TaskHistory, TaskAction
+from backend.models.postgis.statuses import TaskStatus
+from backend.services.lock_expiry_service import LockExpiryService
+from tests.backend.base import BaseTestCase
+from tests.backend.helpers.test_helpers import create_canned_project
+
+
+class TestLockExpiryService(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_project, self.test_user = create_canned_project()
+
+    def lock_task(self, task_id: int, locked_at: datetime.datetime) -> Task:
+        task = Task.get(task_id, self.test_project.id)
+        task.lock_task_for_mapping(self.test_user.id)
+        last_locked = TaskHistory.get_last_locked_action(self.test_project.id, task_id)
+        last_locked.action_date = locked_at
+        task.update()
+        return task
+
+    def test_unlock_expired_tasks_unlocks_expired_locks(self):
+        # Arrange
+        locked_at = LockExpiryService.get_expiry_date() - datetime.timedelta(hours=1)
+        task = self.lock_task(2, locked_at)
+
+        # Act
+        projects_unlocked = LockExpiryService.unlock_expired_tasks()
+
+        # Assert
+        self.assertEqual(projects_unlocked, 1)
+        self.assertEqual(task.task_status, TaskStatus.READY.value)
+        self.assertIsNone(task.locked_by)
+        last_action = TaskHistory.get_last_locked_or_auto_unlocked_action(
+            self.test_project.id, task.id
+        )
+        self.assertEqual(last_action.action, TaskAction.AUTO_UNLOCKED_FOR_MAPPING.name)
+
+    def test_unlock_expired_tasks_ignores_fresh_locks(self):
+        # Arrange
+        task = self.lock_task(2, datetime.datetime.utcnow())
+
+        # Act
+        projects_unlocked = LockExpiryService.unlock_expired_tasks()
+
+        # Assert
+        self.assertEqual(projects_unlocked, 0)
+        self.assertEqual(task.task_status, TaskStatus.LOCKED_FOR_MAPPING.value)
+        self.assertEqual(task.locked_by, self.test_user.id)
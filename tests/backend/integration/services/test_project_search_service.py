@@ -1,13 +1,18 @@
+import geojson
 import json
 from backend.services.project_search_service import ProjectSearchService
 from backend.services.users.user_service import UserService
 from backend.models.postgis.project import ProjectInfo, Project
 from shapely.geometry import Polygon
 from unittest.mock import patch
-from backend.models.dtos.project_dto import ProjectSearchBBoxDTO
+from backend.models.dtos.project_dto import ProjectSearchBBoxDTO, ProjectSearchDTO
+from backend.models.postgis.statuses import ProjectPriority
 from backend.models.postgis.user import User
 from tests.backend.base import BaseTestCase
-from tests.backend.helpers.test_helpers import get_canned_json
+from tests.backend.helpers.test_helpers import (
+    get_canned_json,
+    create_canned_project,
+)
 
 
 class TestProjectSearchService(BaseTestCase):
@@ -110,3 +115,59 @@ class TestProjectSearchService(BaseTestCase):
 
         # assert
         self.assertAlmostEqual(expected, 28276407740.2797, places=3)
+
+    def test_create_result_dtos_matches_per_project_helpers(self):
+        # Arrange
+        test_project, _ = create_canned_project()
+        projects = (
+            ProjectSearchService.create_search_query()
+            .filter(Project.id == test_project.id)
+            .all()
+        )
+
+        # Act
+        results = ProjectSearchService.create_result_dtos(projects, "en")
+
+        # Assert
+        self.assertEqual(len(results), 1)
+        result = results[0]
+        project_info = ProjectInfo.get_dto_for_locale(
+            test_project.id, "en", test_project.default_locale
+        )
+        self.assertEqual(result.project_id, test_project.id)
+        self.assertEqual(result.name, project_info.name)
+        self.assertEqual(
+            result.active_mappers, Project.get_active_mappers(test_project.id)
+        )
+        self.assertEqual(
+            result.total_contributors,
+            Project.get_project_total_contributions(test_project.id),
+        )
+        self.assertEqual(
+            len(result.campaigns),
+            len(Project.get_project_campaigns(test_project.id)),
+        )
+
+    def test_create_result_dtos_returns_empty_list_for_no_projects(self):
+        self.assertEqual(ProjectSearchService.create_result_dtos([], "en"), [])
+
+    def test_get_projects_map_results_returns_centroids(self):
+        # Arrange
+        test_project, test_user = create_canned_project()
+        search_dto = ProjectSearchDTO(dict(page=1, created_by=test_user.id))
+
+        # Act
+        map_results = geojson.loads(
+            ProjectSearchService.get_projects_map_results(search_dto, test_user)
+        )
+
+        # Assert
+        self.assertIsInstance(map_results, geojson.FeatureCollection)
+        self.assertEqual(
+            [f.properties["projectId"] for f in map_results.features],
+            [test_project.id],
+        )
+        self.assertEqual(
+            map_results.features[0].properties["priority"],
+            ProjectPriority(test_project.priority).name,
+        )
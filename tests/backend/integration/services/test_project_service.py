@@ -0,0 +1,141 @@
+import base64
+
+import geojson
+
+from backend.models.postgis.task import Task
+from backend.services.profiler_service import ProfilerService
+from backend.services.project_service import ProjectService
+from backend.services.users.authentication_service import AuthenticationService
+from tests.backend.base import BaseTestCase
+from tests.backend.helpers.test_helpers import create_canned_project
+
+
+class TestProjectService(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.test_project, self.test_user = create_canned_project()
+
+    def test_tasks_geojson_string_matches_feature_collection(self):
+        # Act
+        tasks_json = ProjectService.get_project_tasks_as_geojson_string(
+            self.test_project.id, None
+        )
+        feature_collection = Task.get_tasks_as_geojson_feature_collection(
+            self.test_project.id
+        )
+
+        # Assert
+        features = sorted(
+            geojson.loads(tasks_json).features, key=lambda f: f.properties["taskId"]
+        )
+        expected_features = sorted(
+            feature_collection.features, key=lambda f: f.properties["taskId"]
+        )
+        self.assertEqual(features, expected_features)
+
+    def test_tasks_etag_changes_when_a_task_changes(self):
+        # Arrange
+        etag = ProjectService.get_project_tasks_etag(self.test_project.id, None)
+        self.assertEqual(
+            etag, ProjectService.get_project_tasks_etag(self.test_project.id, None)
+        )
+
+        # Act
+        Task.get(2, self.test_project.id).lock_task_for_mapping(self.test_user.id)
+
+        # Assert
+        self.assertNotEqual(
+            etag, ProjectService.get_project_tasks_etag(self.test_project.id, None)
+        )
+        tasks = geojson.loads(
+            ProjectService.get_project_tasks_as_geojson_string(
+                self.test_project.id, "2"
+            )
+        )
+        self.assertEqual(tasks.features[0].properties["lockedBy"], self.test_user.id)
+
+    def test_tasks_etag_api_returns_not_modified(self):
+        # Arrange
+        url = f"/api/v2/projects/{self.test_project.id}/tasks/?as_file=false"
+        response = self.client.get(url)
+        etag = response.headers["ETag"]
+
+        # Act
+        response = self.client.get(url, headers={"If-None-Match": etag})
+
+        # Assert
+        self.assertEqual(response.status_code, 304)
+
+    def test_task_state_changes_returns_changed_tasks(self):
+        # Arrange
+        cursor = ProjectService.get_task_state_changes(self.test_project.id).cursor
+
+        # Act
+        Task.get(2, self.test_project.id).lock_task_for_mapping(self.test_user.id)
+        changes = ProjectService.get_task_state_changes(
+            self.test_project.id, since_version=cursor
+        )
+
+        # Assert
+        self.assertGreater(changes.cursor, cursor)
+        self.assertFalse(changes.refetch)
+        self.assertEqual([task.task_id for task in changes.tasks], [2])
+        self.assertEqual(changes.tasks[0].task_status, "LOCKED_FOR_MAPPING")
+        self.assertEqual(changes.tasks[0].locked_by, self.test_user.id)
+
+        # Nothing changed since the new cursor
+        changes = ProjectService.get_task_state_changes(
+            self.test_project.id, since_version=changes.cursor
+        )
+        self.assertEqual(len(changes.tasks), 0)
+
+    def test_task_state_changes_asks_for_refetch_after_tasks_deleted(self):
+        # Arrange
+        cursor = ProjectService.get_task_state_changes(self.test_project.id).cursor
+
+        # Act
+        Task.get(3, self.test_project.id).delete()
+        changes = ProjectService.get_task_state_changes(
+            self.test_project.id, since_version=cursor
+        )
+
+        # Assert
+        self.assertTrue(changes.refetch)
+
+    def test_permission_checks_load_users_and_projects_once_per_request(self):
+        # Arrange
+        ProjectService.is_user_permitted_to_map(self.test_project.id, self.test_user.id)
+
+        # Act
+        with ProfilerService.count_queries() as queries:
+            allowed, _ = ProjectService.is_user_permitted_to_map(
+                self.test_project.id, self.test_user.id
+            )
+
+        # Assert: only the tasks locked by the user are queried again
+        self.assertTrue(allowed)
+        self.assertLessEqual(queries.count, 1)
+
+    def test_lock_and_unlock_apis_report_their_query_count(self):
+        # Arrange
+        self.client.application.config["PROFILE_QUERIES"] = True
+        token = AuthenticationService.generate_session_token_for_user(self.test_user.id)
+        headers = {
+            "Authorization": "Token "
+            + base64.b64encode(token.encode("utf-8")).decode("utf-8")
+        }
+        url = f"/api/v2/projects/{self.test_project.id}/tasks/actions"
+
+        # Act
+        lock_response = self.client.post(f"{url}/lock-for-mapping/2/", headers=headers)
+        unlock_response = self.client.post(
+            f"{url}/unlock-after-mapping/2/",
+            headers=headers,
+            json={"status": "MAPPED"},
+        )
+
+        # Assert
+        self.assertEqual(lock_response.status_code, 200)
+        self.assertEqual(unlock_response.status_code, 200)
+        self.assertGreater(int(lock_response.headers["X-Query-Count"]), 0)
+        self.assertGreater(int(unlock_response.headers["X-Query-Count"]), 0)
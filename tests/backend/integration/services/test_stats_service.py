@@ -1,3 +1,7 @@
+import datetime
+
+from backend.models.postgis.statuses import TaskStatus
+from backend.models.postgis.task import Task
 from backend.services.stats_service import StatsService
 from tests.backend.base import BaseTestCase
 from tests.backend.helpers.test_helpers import create_canned_project
@@ -17,3 +21,64 @@ class TestStatsService(BaseTestCase):
         self.assertGreaterEqual(stats.mappers_online, 0)
         self.assertGreater(stats.tasks_mapped, 0)
         self.assertGreater(stats.total_mappers, 0)
+
+    def test_update_project_stats_counts_tasks_by_status(self):
+        # Arrange
+        tasks = Task.query.filter(Task.project_id == self.test_project.id)
+        self.test_project.tasks_mapped = 0
+        self.test_project.tasks_validated = 0
+
+        # Act
+        StatsService.update_project_stats(self.test_project.id)
+
+        # Assert
+        self.assertEqual(self.test_project.total_tasks, tasks.count())
+        self.assertEqual(
+            self.test_project.tasks_mapped,
+            tasks.filter(Task.task_status == TaskStatus.MAPPED.value).count(),
+        )
+        self.assertEqual(
+            self.test_project.tasks_validated,
+            tasks.filter(Task.task_status == TaskStatus.VALIDATED.value).count(),
+        )
+
+    def test_all_users_statistics_are_counted_by_level_and_gender(self):
+        # Arrange
+        self.test_user.date_registered = datetime.datetime.utcnow()
+        self.test_user.save()
+        today = datetime.date.today()
+
+        # Act
+        stats = StatsService.get_all_users_statistics(
+            today - datetime.timedelta(days=1), today + datetime.timedelta(days=1)
+        )
+
+        # Assert
+        self.assertEqual(stats.total, 1)
+        self.assertEqual(stats.beginner + stats.intermediate + stats.advanced, 1)
+        self.assertEqual(stats.genders.male + stats.genders.female, 0)
+
+    def test_update_all_project_stats_reports_and_fixes_drift(self):
+        # Arrange
+        total_tasks = self.test_project.total_tasks
+        self.test_project.total_tasks = total_tasks + 5
+        self.test_project.save()
+        progress = []
+
+        # Act
+        drift = StatsService.update_all_project_stats(
+            chunk_size=1, dry_run=True, progress=lambda *args: progress.append(args)
+        )
+
+        # Assert
+        self.assertEqual(len(drift), 1)
+        self.assertEqual(drift[0]["project_id"], self.test_project.id)
+        self.assertEqual(drift[0]["total_tasks"], (total_tasks + 5, total_tasks))
+        self.assertEqual(len(progress), 1)
+        self.assertEqual(self.test_project.total_tasks, total_tasks + 5)
+
+        # Act
+        StatsService.update_all_project_stats()
+
+        # Assert
+        self.assertEqual(StatsService.update_all_project_stats(dry_run=True), [])
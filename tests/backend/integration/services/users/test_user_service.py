@@ -1,5 +1,10 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
 
+from flask import current_app
+
 from tests.backend.base import BaseTestCase
 from backend.services.users.user_service import (
     UserService,
@@ -14,6 +19,35 @@ from tests.backend.helpers.test_helpers import (
     get_canned_user,
 )
 from backend.models.postgis.message import Message
+from backend.models.postgis.statuses import TaskStatus
+from backend.models.postgis.task import Task, TaskAction
+from backend.models.postgis.user_task_activity import UserTaskActivity
+from backend.models.postgis.user_changeset_count import UserChangesetCount
+from backend.models.postgis.utils import timestamp
+
+# Changeset counts of the users served by the stub OSM API, users missing from it get a 404
+STUB_CHANGESET_COUNTS = {101: 10, 102: 300, 103: 900}
+
+
+class StubOSMHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        user_id = int(self.path.split("/")[-1].replace(".json", ""))
+        if user_id not in STUB_CHANGESET_COUNTS:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = json.dumps(
+            {"user": {"changesets": {"count": STUB_CHANGESET_COUNTS[user_id]}}}
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
 
 
 class TestAuthenticationService(BaseTestCase):
@@ -77,3 +111,71 @@ class TestAuthenticationService(BaseTestCase):
 
         # Assert
         self.assertTrue(test_user.mapping_level, MappingLevel.INTERMEDIATE.value)
+
+    def test_refresh_mapper_level_fetches_changesets_from_osm(self):
+        # Arrange
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubOSMHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        current_app.config["OSM_SERVER_URL"] = f"http://127.0.0.1:{server.server_port}"
+        for user_id in (101, 102, 103, 104):
+            user = User()
+            user.id = user_id
+            user.username = f"Test user {user_id}"
+            user.mapping_level = MappingLevel.BEGINNER.value
+            user.create()
+
+        # Act
+        users_upgraded = UserService.refresh_mapper_level(workers=2, batch_size=3)
+
+        # Assert
+        self.assertEqual(users_upgraded, 2)
+        self.assertEqual(
+            User.get_by_id(102).mapping_level, MappingLevel.INTERMEDIATE.value
+        )
+        self.assertEqual(User.get_by_id(103).mapping_level, MappingLevel.ADVANCED.value)
+        self.assertEqual(Message.query.filter(Message.to_user_id == 103).count(), 1)
+        self.assertEqual(UserChangesetCount.query.count(), 3)
+
+        # Act: users checked recently are skipped, users OSM didn't answer for are retried
+        self.assertEqual(UserService.refresh_mapper_level(), 0)
+        self.assertEqual(
+            [user.id for user in UserChangesetCount.get_users_to_check(timestamp())],
+            [101, 102, 104],
+        )
+
+    def test_get_tasks_dto_lists_user_task_activity(self):
+        # Arrange
+        project, user = create_canned_project()
+        commenter = User(id=105, username="Commenter", mapping_level=1)
+        commenter.create()
+        task = Task.get(2, project.id)
+        task.lock_task_for_mapping(user.id)
+        task.set_task_history(TaskAction.STATE_CHANGE, user.id, None, TaskStatus.MAPPED)
+        task.set_task_history(TaskAction.COMMENT, commenter.id, "Looks good")
+        task.update()
+
+        # Act
+        tasks = UserService.get_tasks_dto(user.id, sort_by="-action_date", cursor="")
+        mapped_tasks = UserService.get_tasks_dto(user.id, task_status="mapped")
+        validated_tasks = UserService.get_tasks_dto(user.id, task_status="validated")
+
+        # Assert
+        self.assertEqual([t.task_id for t in tasks.user_tasks], [2])
+        self.assertEqual(tasks.user_tasks[0].comments_number, 1)
+        self.assertEqual([t.task_id for t in mapped_tasks.user_tasks], [2])
+        self.assertEqual(validated_tasks.user_tasks, [])
+
+        # Assert: the projection matches the one rebuilt from task history
+        activity = sorted(
+            (a.user_id, a.task_id, a.last_action, a.comment_count)
+            for a in UserTaskActivity.query.all()
+        )
+        UserTaskActivity.rebuild()
+        self.assertEqual(
+            activity,
+            sorted(
+                (a.user_id, a.task_id, a.last_action, a.comment_count)
+                for a in UserTaskActivity.query.all()
+            ),
+        )
@@ -1,3 +1,4 @@
+import datetime
 import geojson
 from backend.models.postgis.task import (
     InvalidGeoJson,
@@ -6,6 +7,9 @@ from backend.models.postgis.task import (
     TaskAction,
     TaskHistory,
 )
+from backend.models.postgis.project_contributor import ProjectContributor
+from backend.models.postgis.project_stats import ProjectStats
+from backend.models.postgis.user_task_activity import UserTaskActivity
 from backend.models.postgis.statuses import TaskStatus
 from unittest.mock import patch, MagicMock
 
@@ -65,7 +69,11 @@ class TestTask(BaseTestCase):
         with self.assertRaises(InvalidData):
             Task.from_geojson_feature(1, invalid_properties)
 
-    def test_lock_task_for_mapping_adds_locked_history(self):
+    @patch.object(UserTaskActivity, "record")
+    @patch.object(ProjectContributor, "record_contribution")
+    def test_lock_task_for_mapping_adds_locked_history(
+        self, mock_record_contribution, mock_record_activity
+    ):
         # Arrange
         test_task = Task()
 
@@ -76,6 +84,29 @@ class TestTask(BaseTestCase):
         self.assertEqual(
             TaskAction.LOCKED_FOR_MAPPING.name, test_task.task_history[0].action
         )
+        mock_record_contribution.assert_called_with(test_task.project_id, 123454)
+        mock_record_activity.assert_called_with(
+            123454, test_task.project_id, test_task.id, None, False
+        )
+
+    @patch.object(UserTaskActivity, "record")
+    @patch.object(ProjectContributor, "record_contribution")
+    def test_comment_is_not_recorded_as_contribution(
+        self, mock_record_contribution, mock_record_activity
+    ):
+        # Arrange
+        test_task = Task()
+
+        # Act
+        test_task.set_task_history(
+            action=TaskAction.COMMENT, user_id=123454, comment="Nice work"
+        )
+
+        # Assert
+        mock_record_contribution.assert_not_called()
+        mock_record_activity.assert_called_with(
+            123454, test_task.project_id, test_task.id, None, True
+        )
 
     def test_cant_add_task_if_not_supplied_feature_type(self):
         # Arrange
@@ -151,6 +182,7 @@ class TestTask(BaseTestCase):
         # Assert
         self.assertEqual(instructions, "Foo is replaced by bar")
 
+    @patch.object(ProjectStats, "record_lock_duration")
     @patch.object(TaskHistory, "get_last_status")
     @patch.object(TaskHistory, "get_last_locked_action")
     @patch.object(Task, "set_task_history")
@@ -161,6 +193,7 @@ class TestTask(BaseTestCase):
         mock_set_task_history,
         mock_get_last_action,
         mock_get_last_status,
+        mock_record_lock_duration,
     ):
         mock_history = MagicMock()
         mock_last_action = MagicMock()
@@ -171,12 +204,18 @@ class TestTask(BaseTestCase):
 
         test_task = Task()
         test_task.locked_by = "testuser"
-        lock_duration = "02:00"
+        test_task.project_id = 1
+        lock_duration = datetime.timedelta(days=7, hours=2)
         test_task.record_auto_unlock(lock_duration)
 
         mock_set_task_history.assert_called_with(
             action=TaskAction.AUTO_UNLOCKED_FOR_MAPPING, user_id="testuser"
         )
-        self.assertEqual(mock_history.action_text, lock_duration)
+        self.assertEqual(mock_history.action_text, "02:00:00")
+        # Locks longer than a day keep their whole duration, only the text wraps
+        self.assertEqual(mock_history.lock_duration, lock_duration)
+        mock_record_lock_duration.assert_called_with(
+            1, TaskAction.AUTO_UNLOCKED_FOR_MAPPING.name, lock_duration
+        )
         self.assertEqual(test_task.locked_by, None)
         mock_last_action.delete.assert_called()
@@ -0,0 +1,30 @@
+import datetime
+
+from backend.models.postgis.message import Message
+from backend.models.postgis.utils import encode_cursor, decode_cursor
+from tests.backend.base import BaseTestCase
+
+
+class TestUtils(BaseTestCase):
+    def test_cursor_round_trips_datetime_sort_values(self):
+        # Arrange
+        date = datetime.datetime(2020, 5, 17, 10, 30, 15, 123456)
+
+        # Act
+        cursor = encode_cursor(date, 42)
+
+        # Assert
+        self.assertEqual(decode_cursor(cursor, Message.date), (date, 42))
+
+    def test_cursor_round_trips_null_sort_values(self):
+        cursor = encode_cursor(None, 42)
+        self.assertEqual(decode_cursor(cursor, Message.project_id), (None, 42))
+
+    def test_invalid_cursor_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            decode_cursor("not a cursor", Message.date)
+
+    def test_cursor_round_trips_composite_ids(self):
+        date = datetime.datetime(2020, 5, 17, 10, 30, 15)
+        cursor = encode_cursor(date, (3, 7))
+        self.assertEqual(decode_cursor(cursor, Message.date), (date, [3, 7]))
@@ -0,0 +1,219 @@
+import os
+import tempfile
+from datetime import datetime
+from unittest.mock import patch
+
+from flask_sqlalchemy import Pagination as PaginatedResult
+
+from backend.models.dtos.campaign_dto import CampaignDTO
+from backend.models.dtos.project_dto import (
+    ListSearchResultDTO,
+    ProjectSearchResultsDTO,
+    ProjectSummary,
+)
+from backend.models.dtos.settings_dto import SettingsDTO, SupportedLanguage
+from backend.models.dtos.stats_dto import HomePageStatsDTO, Pagination
+from backend.models.dtos.user_dto import ProjectParticipantUser, UserFilterDTO
+from backend.services.cache_service import (
+    Cache,
+    CacheService,
+    MemoryCacheBackend,
+    RequestCache,
+    SharedMemoryCacheBackend,
+    caches,
+)
+
+# Import the services declaring the caches of DTOs
+from backend.services import (  # noqa: F401
+    project_search_service,
+    project_service,
+    settings_service,
+)
+from backend.services.users import user_service  # noqa: F401
+from tests.backend.base import BaseTestCase
+
+
+class TestCacheService(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+
+    def get_count(self, project_id: int) -> int:
+        self.calls.append(project_id)
+        return project_id * 2
+
+    def test_cached_function_is_only_called_on_misses(self):
+        # Arrange
+        cache = Cache("test_memory", maxsize=16, ttl=60)
+        get_count = cache.cached(self.get_count)
+
+        with patch.object(
+            CacheService, "get_backend", return_value=MemoryCacheBackend()
+        ):
+            # Act
+            first = get_count(1)
+            second = get_count(1)
+            get_count.invalidate(1)
+            third = get_count(1)
+
+            # Assert
+            self.assertEqual((first, second, third), (2, 2, 2))
+            self.assertEqual(self.calls, [1, 1])
+            stats = cache.get_stats()
+            self.assertEqual(stats["hits"], 1)
+            self.assertEqual(stats["misses"], 2)
+            self.assertEqual(stats["invalidations"], 1)
+            self.assertEqual(stats["size"], 1)
+
+    def test_request_cache_keeps_values_until_the_next_request(self):
+        # Arrange
+        cache = RequestCache("test_request")
+        get_count = cache.cached(self.get_count)
+
+        # Act
+        first = get_count(1)
+        second = get_count(1)
+        CacheService.reset_request_caches()
+        third = get_count(1)
+
+        # Assert
+        self.assertEqual((first, second, third), (2, 2, 2))
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_request_cache_loads_missing_keys_in_one_call(self):
+        # Arrange
+        cache = RequestCache("test_request_batch")
+        cache.set(1, "one")
+        loads = []
+
+        def load(keys):
+            loads.append(keys)
+            return {key: str(key) for key in keys if key != 4}
+
+        # Act
+        values = cache.load_many([1, 2, 3, 2, 4], load)
+        cached_values = cache.load_many([2, 3], load)
+
+        # Assert
+        self.assertEqual(values, {1: "one", 2: "2", 3: "3"})
+        self.assertEqual(cached_values, {2: "2", 3: "3"})
+        self.assertEqual(loads, [[2, 3, 4]])
+
+    def test_invalidations_keep_working_when_the_backend_fails(self):
+        # Arrange
+        cache = Cache("test_failing", maxsize=16, ttl=60)
+        backend = MemoryCacheBackend()
+        error = ConnectionError("Cache backend unavailable")
+
+        with patch.object(CacheService, "get_backend", return_value=backend):
+            with patch.object(backend, "delete", side_effect=error), patch.object(
+                backend, "delete_partition", side_effect=error
+            ), patch.object(backend, "clear", side_effect=error):
+                # Act
+                cache.delete(1)
+                cache.evict(1)
+                cache.clear()
+
+            # Assert
+            self.assertEqual(cache.get_stats()["invalidations"], 3)
+
+    def test_shared_memory_backend_rebuilds_dtos_and_is_shared(self):
+        # Arrange
+        path = os.path.join(tempfile.mkdtemp(), "cache.db")
+        cache = Cache("test_shared", maxsize=2, ttl=60, model=HomePageStatsDTO)
+        dto = HomePageStatsDTO()
+        dto.mappers_online = 3
+        dto.total_projects = 10
+
+        with patch.object(
+            CacheService, "get_backend", return_value=SharedMemoryCacheBackend(path)
+        ):
+            cache.set("homepage", dto)
+
+        # Act: a backend with its own connection to the store, as another worker has
+        backend = SharedMemoryCacheBackend(path)
+        backend.eviction_interval = 3
+        with patch.object(CacheService, "get_backend", return_value=backend):
+            cached_dto = cache.get("homepage")
+            for key in range(2):
+                cache.set(key, dto)
+            size_before_eviction = cache.get_stats()["size"]
+            cache.set(2, dto)
+            size = cache.get_stats()["size"]
+            cache.clear()
+            cleared_dto = cache.get(0)
+
+        # Assert
+        self.assertIsInstance(cached_dto, HomePageStatsDTO)
+        self.assertEqual(cached_dto.to_primitive(), dto.to_primitive())
+        self.assertEqual(size_before_eviction, 3)
+        self.assertEqual(size, 2)
+        self.assertIsNone(cleared_dto)
+
+    def get_cached_dtos(self) -> dict:
+        """Populated DTOs of each model cached by the API"""
+        campaign = CampaignDTO(dict(id=1, name="Campaign"))
+        pagination = Pagination(PaginatedResult(None, 1, 14, 20, []))
+
+        search_results = ProjectSearchResultsDTO()
+        search_results.results = [
+            ListSearchResultDTO(
+                dict(
+                    project_id=1,
+                    locale="en",
+                    name="Project",
+                    mapper_level="BEGINNER",
+                    priority="HIGH",
+                    campaigns=[campaign],
+                    last_updated=datetime(2020, 1, 1),
+                )
+            )
+        ]
+        search_results.map_results = dict(type="FeatureCollection", features=[])
+        search_results.pagination = pagination
+
+        user_filter = UserFilterDTO()
+        user_filter.usernames = ["mapper"]
+        user_filter.users = [
+            ProjectParticipantUser(
+                dict(username="mapper", project_id=1, is_participant=True)
+            )
+        ]
+        user_filter.pagination = pagination
+
+        summary = ProjectSummary()
+        summary.project_id = 1
+        summary.created = datetime(2020, 1, 1)
+        summary.campaigns = [campaign]
+        summary.percent_mapped = 50
+
+        settings = SettingsDTO()
+        settings.mapper_level_advanced = "500"
+        settings.supported_languages = [
+            SupportedLanguage(dict(code="en", language="English"))
+        ]
+
+        return {
+            ProjectSearchResultsDTO: search_results,
+            UserFilterDTO: user_filter,
+            ProjectSummary: summary,
+            SettingsDTO: settings,
+        }
+
+    def test_cached_dtos_are_rebuilt_from_their_primitive(self):
+        # Arrange
+        dtos = self.get_cached_dtos()
+
+        for cache in caches.values():
+            # Skip the caches of the tests
+            if cache.model is None or cache.namespace.startswith("test_"):
+                continue
+            self.assertIn(cache.model, dtos)
+            dto = dtos[cache.model]
+
+            # Act
+            cached_dto = cache._loads(cache._dumps(dto))
+
+            # Assert
+            self.assertIsInstance(cached_dto, cache.model)
+            self.assertEqual(cached_dto.to_primitive(), dto.to_primitive())
@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+from backend import db
+from backend.services.cache_service import CacheService, MemoryCacheBackend
+from backend.services.event_service import (
+    EventService,
+    ProjectUpdated,
+    TaskStateChanged,
+    subscribers,
+)
+from backend.services.project_service import summary_cache
+from tests.backend.base import BaseTestCase
+
+
+class TestEventService(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.received = []
+        subscribers[ProjectUpdated].append(self.received.append)
+
+    def tearDown(self):
+        subscribers[ProjectUpdated].remove(self.received.append)
+        super().tearDown()
+
+    def test_events_are_dispatched_once_after_commit(self):
+        # Act
+        EventService.publish(ProjectUpdated(1))
+        EventService.publish(ProjectUpdated(1))
+
+        # Assert
+        self.assertEqual(self.received, [])
+
+        # Act
+        db.session.commit()
+
+        # Assert
+        self.assertEqual(self.received, [ProjectUpdated(1)])
+
+    def test_events_are_discarded_on_rollback(self):
+        # Act
+        EventService.publish(ProjectUpdated(1))
+        db.session.rollback()
+        db.session.commit()
+
+        # Assert
+        self.assertEqual(self.received, [])
+
+    def test_task_state_changes_evict_the_project_summary(self):
+        with patch.object(
+            CacheService, "get_backend", return_value=MemoryCacheBackend()
+        ):
+            # Arrange
+            summary_cache.set("en", {"projectId": 1}, partition=1)
+            summary_cache.set("en", {"projectId": 2}, partition=2)
+
+            # Act
+            EventService.publish(TaskStateChanged(1, 10))
+            db.session.commit()
+
+            # Assert
+            self.assertIsNone(summary_cache.get("en", partition=1))
+            self.assertIsNotNone(summary_cache.get("en", partition=2))
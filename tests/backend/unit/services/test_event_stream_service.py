@@ -0,0 +1,48 @@
+import json
+from unittest.mock import patch
+
+from backend.services.event_stream_service import (
+    EVENT_STREAM_QUEUE_SIZE,
+    EventBroker,
+    EventStreamService,
+    event_broker,
+)
+from tests.backend.base import BaseTestCase
+
+
+def payload(channel: str, unread: int) -> str:
+    return json.dumps(dict(channel=channel, event="messages", data=dict(unread=unread)))
+
+
+@patch.object(EventBroker, "listen")
+class TestEventStreamService(BaseTestCase):
+    def test_events_are_streamed_to_the_subscribers_of_the_channel(self, mock_listen):
+        # Arrange
+        events = EventStreamService.stream("user:1")
+        self.assertTrue(next(events).startswith("retry:"))
+
+        # Act
+        event_broker.dispatch(payload("user:2", 5))
+        event_broker.dispatch(payload("user:1", 3))
+
+        # Assert
+        self.assertEqual(next(events), 'event: messages\ndata: {"unread": 3}\n\n')
+
+        # Act
+        events.close()
+
+        # Assert
+        self.assertNotIn("user:1", event_broker.subscriptions)
+
+    def test_stream_of_a_slow_client_is_closed(self, mock_listen):
+        # Arrange
+        events = EventStreamService.stream("user:1")
+        next(events)
+
+        # Act
+        for unread in range(EVENT_STREAM_QUEUE_SIZE + 1):
+            event_broker.dispatch(payload("user:1", unread))
+
+        # Assert: the buffered events are sent, then the stream ends for the client to reconnect
+        self.assertEqual(len(list(events)), EVENT_STREAM_QUEUE_SIZE)
+        self.assertNotIn("user:1", event_broker.subscriptions)
@@ -1,4 +1,5 @@
 from backend.models.dtos.project_dto import ProjectSearchDTO
+from backend.models.postgis.statuses import UserRole
 from backend.models.postgis.user import User
 from backend.services.project_search_service import ProjectSearchService
 from tests.backend.base import BaseTestCase
@@ -35,3 +36,39 @@ class TestProjectService(BaseTestCase):
         search_dto.validate()
 
         self.assertIsNotNone(ProjectSearchService.search_projects(search_dto, user))
+
+    def test_search_cache_key_ignores_order_of_list_criteria(self):
+        # Arrange
+        user = User(id=3488526)
+        first_dto = ProjectSearchDTO(
+            dict(page=1, mapping_types=["ROADS", "BUILDINGS"], text_search="flood")
+        )
+        second_dto = ProjectSearchDTO(
+            dict(page=1, mapping_types=["BUILDINGS", "ROADS"], text_search="flood")
+        )
+
+        # Act / Assert
+        self.assertEqual(
+            ProjectSearchService.get_search_cache_key(first_dto, user),
+            ProjectSearchService.get_search_cache_key(second_dto, user),
+        )
+
+    def test_search_cache_key_is_scoped_to_user_permissions(self):
+        # Arrange
+        search_dto = ProjectSearchDTO(dict(page=1))
+        admin = User(id=1, role=UserRole.ADMIN.value)
+        mapper = User(id=2, role=UserRole.MAPPER.value)
+
+        # Act
+        anonymous_key = ProjectSearchService.get_search_cache_key(search_dto, None)
+        admin_key = ProjectSearchService.get_search_cache_key(search_dto, admin)
+        mapper_key = ProjectSearchService.get_search_cache_key(search_dto, mapper)
+
+        # Assert
+        self.assertEqual(len({anonymous_key, admin_key, mapper_key}), 3)
+        self.assertEqual(
+            admin_key,
+            ProjectSearchService.get_search_cache_key(
+                search_dto, User(id=3, role=UserRole.ADMIN.value)
+            ),
+        )
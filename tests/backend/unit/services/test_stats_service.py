@@ -1,4 +1,12 @@
-from backend.services.stats_service import StatsService, TaskStatus
+from unittest.mock import patch
+
+from backend.models.postgis.global_stats import GlobalStats
+from backend.services.event_service import CampaignUpdated, ProjectUpdated
+from backend.services.stats_service import (
+    StatsService,
+    TaskStatus,
+    update_global_project_counters,
+)
 from backend.models.postgis.project import Project
 from backend.models.postgis.user import User
 from tests.backend.base import BaseTestCase
@@ -202,3 +210,19 @@ class TestStatsService(BaseTestCase):
         self.assertEqual(test_admin.tasks_mapped, 0)
         self.assertEqual(test_admin.tasks_validated, 0)
         self.assertEqual(test_admin.tasks_invalidated, 0)
+
+    @patch.object(GlobalStats, "refresh_project_counters")
+    def test_projects_are_only_recounted_when_created_or_deleted(self, mock_refresh):
+        # Act
+        update_global_project_counters(ProjectUpdated(1))
+
+        # Assert
+        mock_refresh.assert_not_called()
+
+        # Act
+        update_global_project_counters(ProjectUpdated(1, created=True))
+        update_global_project_counters(ProjectUpdated(1, deleted=True))
+        update_global_project_counters(CampaignUpdated(1, 1))
+
+        # Assert
+        self.assertEqual(mock_refresh.call_count, 3)
@@ -1,3 +1,4 @@
+import base64
 from unittest.mock import patch
 from urllib.parse import urlparse, parse_qs
 
@@ -7,6 +8,8 @@ from backend.services.users.authentication_service import (
     UserService,
     NotFound,
     MessageService,
+    verified_tokens,
+    verify_token,
 )
 from backend.services.messaging.smtp_service import SMTPService
 from tests.backend.base import BaseTestCase
@@ -86,3 +89,33 @@ class TestAuthenticationService(BaseTestCase):
         # Assert
         self.assertTrue(is_valid)
         self.assertEqual(email_address, test_email)
+
+    def test_verified_session_token_is_not_verified_again(self):
+        # Arrange
+        self.addCleanup(verified_tokens.clear)
+        session_token = AuthenticationService.generate_session_token_for_user(777)
+        token = base64.b64encode(session_token.encode("utf-8")).decode("utf-8")
+
+        # Act
+        with patch.object(
+            AuthenticationService,
+            "is_valid_timed_token",
+            wraps=AuthenticationService.is_valid_timed_token,
+        ) as mock_is_valid_token:
+            first_user_id = verify_token(token)
+            second_user_id = verify_token(token)
+
+        # Assert
+        self.assertEqual(first_user_id, 777)
+        self.assertEqual(second_user_id, 777)
+        mock_is_valid_token.assert_called_once()
+        self.assertNotIn(token, verified_tokens)
+
+    def test_invalid_session_token_is_not_kept(self):
+        # Arrange
+        self.addCleanup(verified_tokens.clear)
+        token = base64.b64encode(b"not-a-token").decode("utf-8")
+
+        # Act / Assert
+        self.assertFalse(verify_token(token))
+        self.assertIsNone(AuthenticationService.get_verified_token_user(token))
@@ -1,4 +1,10 @@
-from backend.services.users.osm_service import OSMService, OSMServiceError
+import time
+
+from backend.services.users.osm_service import (
+    OSMService,
+    OSMServiceError,
+    TokenBucket,
+)
 from tests.backend.base import BaseTestCase
 
 from tests.backend.helpers.test_helpers import get_canned_simplified_osm_user_details
@@ -23,3 +29,15 @@ class TestOSMService(BaseTestCase):
         # Act / Assert
         with self.assertRaises(OSMServiceError):
             OSMService._parse_osm_user_details_response(osm_response, "wont-find")
+
+    def test_token_bucket_limits_the_rate_after_the_burst(self):
+        # Arrange
+        bucket = TokenBucket(rate=50, burst=5)
+        started = time.monotonic()
+
+        # Act
+        for _ in range(10):
+            bucket.acquire()
+
+        # Assert: the burst is immediate, the 5 other tokens take 1/50s each
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
@@ -25,6 +25,41 @@ class TestUserService(BaseTestCase):
         # Act / Assert
         self.assertTrue(UserService.is_user_validator(123))
 
+    @patch.object(UserService, "get_user_by_id")
+    def test_user_is_loaded_once_per_request_by_permission_checks(self, mock_user):
+        # Arrange
+        stub_user = User()
+        stub_user.role = UserRole.ADMIN.value
+        mock_user.return_value = stub_user
+
+        # Act
+        is_admin = UserService.is_user_an_admin(123)
+        is_validator = UserService.is_user_validator(123)
+        is_blocked = UserService.is_user_blocked(123)
+
+        # Assert
+        self.assertTrue(is_admin)
+        self.assertTrue(is_validator)
+        self.assertFalse(is_blocked)
+        mock_user.assert_called_once_with(123)
+
+    @patch.object(UserService, "get_user_by_id")
+    def test_evicted_user_principal_is_loaded_again(self, mock_user):
+        # Arrange
+        stub_user = User()
+        stub_user.role = UserRole.ADMIN.value
+        mock_user.return_value = stub_user
+        UserService.is_user_an_admin(123)
+
+        # Act
+        stub_user.role = UserRole.READ_ONLY.value
+        UserService.evict_user_principal(123)
+
+        # Assert
+        self.assertFalse(UserService.is_user_an_admin(123))
+        self.assertTrue(UserService.is_user_blocked(123))
+        self.assertEqual(mock_user.call_count, 2)
+
     def test_unknown_role_raise_error_when_setting_role(self):
         # Act / Assert
         with self.assertRaises(UserServiceError):